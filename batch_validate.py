@@ -0,0 +1,413 @@
+# =========================================
+# Synapse Tutor – Validação em lote (JSONL)
+# =========================================
+# Reauditoria de muitos documentos sem a interface Streamlit:
+# - extração de texto + validação rígida num pool de processos (CPU);
+# - validação semântica num pool assíncrono limitado (vários documentos em
+#   voo, cada um com seus shards concorrentes; ver async_semantic.py);
+# - uma linha JSON por documento, gravada assim que ele termina (ordem de
+#   conclusão), com scores, itens e tempos de cada etapa;
+# - o próprio arquivo de saída é o checkpoint: com --resume, documentos já
+#   gravados com status "ok" são pulados; vale a última linha de cada id e
+#   o arquivo é compactado (uma linha por id) antes e depois da retomada.
+#
+# Entrada:
+#   - diretório: arquivos .txt/.md/.pdf/.docx/.xlsx (recursivo); o artefato vem de
+#     --artefato ou do caminho (pasta "ETP/", arquivo "tr_2023_001.pdf"...);
+#   - manifesto .jsonl ({"path": ..., "artefato": ..., "id": opcional}) ou
+#     .csv (colunas path, artefato e id opcional); caminhos relativos ao manifesto.
+#   - com --journey, manifesto com a coluna "journey": os documentos de uma
+#     mesma jornada (DFD → ETP → TR) são validados juntos (journey_validator),
+#     com os fatos das etapas anteriores no prompt e as verificações de
+#     coerência entre eles; uma linha por jornada.
+#
+# Uso:
+#   python batch_validate.py historico/ -o auditoria.jsonl --workers 8 --concurrency 4
+#   python batch_validate.py manifesto.csv -o auditoria.jsonl --resume
+#   python batch_validate.py historico/ -o rigido.jsonl --no-semantic
+#   python batch_validate.py jornadas.csv -o jornadas.jsonl --journey
+#
+# Cliente LLM conforme llm_backend.get_backend() (SYNAPSE_LLM_BACKEND=replay
+# roda offline a partir de tests/cassettes); todos os documentos compartilham
+# o mesmo pool de conexões (llm_pool), resumido ao final.
+# =========================================
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent
+SUPPORTED_EXTENSIONS = {".txt", ".md", ".pdf", ".docx", ".xlsx"}
+CHECKLIST_DIR = REPO_ROOT / "knowledge" / "validators"
+# fsync do checkpoint a cada N linhas (flush vai a cada linha)
+FSYNC_EVERY = 50
+
+
+# -------------------------------
+# Entrada
+# -------------------------------
+def known_artefatos():
+    """Artefatos com checklist YAML (knowledge/validators/{slug}_checklist*.yml)."""
+    slugs = {p.name.split("_checklist")[0] for p in CHECKLIST_DIR.glob("*_checklist*.yml")}
+    # mais longos primeiro: CONTRATO_TECNICO antes de CONTRATO
+    return sorted((s.upper() for s in slugs), key=len, reverse=True)
+
+
+def infer_artefato(path, artefatos):
+    """Artefato pelo nome das pastas (da mais próxima) ou pelo prefixo do arquivo."""
+    for part in reversed(path.parts[:-1]):
+        if part.upper().replace(" ", "_") in artefatos:
+            return part.upper().replace(" ", "_")
+    stem = path.stem.upper().replace(" ", "_").replace("-", "_")
+    for art in artefatos:
+        if stem == art or stem.startswith(art + "_"):
+            return art
+    return None
+
+
+def iter_jobs(source, artefato=None):
+    """(id, caminho, artefato) de cada documento do diretório ou manifesto."""
+    source = Path(source)
+    artefatos = known_artefatos()
+    if source.is_dir():
+        for fp in sorted(source.rglob("*")):
+            if fp.is_file() and fp.suffix.lower() in SUPPORTED_EXTENSIONS:
+                rel = fp.relative_to(source)
+                yield rel.as_posix(), fp, (artefato or infer_artefato(rel, artefatos))
+        return
+
+    base = source.parent
+    for row in read_manifest(source):
+        fp = Path(row["path"])
+        fp = fp if fp.is_absolute() else base / fp
+        art = (row.get("artefato") or artefato or infer_artefato(Path(row["path"]), artefatos) or "").upper()
+        yield str(row.get("id") or row["path"]), fp, (art or None)
+
+
+def read_manifest(source):
+    """Linhas do manifesto .csv ou .jsonl."""
+    if source.suffix.lower() == ".csv":
+        with open(source, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f))
+    with open(source, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def iter_journeys(source, artefato=None):
+    """(id da jornada, {etapa: caminho}) do manifesto, na ordem da primeira linha de cada jornada."""
+    source = Path(source)
+    if source.is_dir():
+        raise ValueError("--journey exige um manifesto (.jsonl/.csv) com a coluna journey")
+    artefatos = known_artefatos()
+    journeys = {}
+    for row in read_manifest(source):
+        journey = str(row.get("journey") or "").strip()
+        if not journey:
+            raise ValueError(f"linha sem journey no manifesto: {row}")
+        fp = Path(row["path"])
+        fp = fp if fp.is_absolute() else source.parent / fp
+        stage = (row.get("artefato") or artefato or infer_artefato(Path(row["path"]), artefatos) or "").upper()
+        journeys.setdefault(journey, {})[stage] = fp
+    yield from journeys.items()
+
+
+class _FileUpload:
+    """Arquivo do disco com a interface usada por extract_text_from_uploads."""
+
+    def __init__(self, path):
+        self.name = str(path)
+        self._path = path
+
+    def read(self):
+        return self._path.read_bytes()
+
+
+# -------------------------------
+# Etapa de CPU (pool de processos)
+# -------------------------------
+def extract_and_rigid(path, artefato):
+    """Executa no processo filho: extração + rígido. Devolve texto, resultado e tempos (ms)."""
+    from utils.upload_extractor import extract_text_from_uploads
+    from knowledge.validators.validator_engine import rigid_validate
+
+    t0 = time.perf_counter()
+    text = extract_text_from_uploads([_FileUpload(Path(path))])
+    t1 = time.perf_counter()
+    rigid_score, rigid_result = rigid_validate(text, artefato) if text else (0.0, [])
+    t2 = time.perf_counter()
+    return {
+        "text": text,
+        "rigid_score": rigid_score,
+        "rigid_result": rigid_result,
+        "extract_ms": round((t1 - t0) * 1000, 1),
+        "rigid_ms": round((t2 - t1) * 1000, 1),
+    }
+
+
+# -------------------------------
+# Checkpoint
+# -------------------------------
+def latest_records(output):
+    """
+    Último registro de cada id, na ordem da primeira gravação (linhas
+    inválidas, de uma queda no meio da escrita, são ignoradas).
+    """
+    records = {}
+    if not output.exists():
+        return records
+    with open(output, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(rec, dict):
+                records[rec.get("id")] = rec
+    return records
+
+
+def completed_ids(output):
+    """Ids cuja última linha tem status "ok"."""
+    return {doc_id for doc_id, rec in latest_records(output).items() if rec.get("status") == "ok"}
+
+
+def compact_output(output):
+    """Regrava o checkpoint com uma linha por id (a última), de forma atômica."""
+    if not output.exists():
+        return
+    tmp = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for rec in latest_records(output).values():
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, output)
+
+
+class JsonlWriter:
+    """Acrescenta uma linha por documento; flush a cada linha e fsync periódico."""
+
+    def __init__(self, output, append):
+        output.parent.mkdir(parents=True, exist_ok=True)
+        if append and output.exists() and output.stat().st_size:
+            with open(output, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                broken = f.read(1) != b"\n"
+        else:
+            broken = False
+        self._f = open(output, "a" if append else "w", encoding="utf-8")
+        if broken:
+            self._f.write("\n")  # linha cortada pela queda anterior fica isolada
+        self._pending = 0
+
+    def write(self, record):
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self._pending += 1
+        if self._pending >= FSYNC_EVERY:
+            os.fsync(self._f.fileno())
+            self._pending = 0
+
+    def close(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+
+# -------------------------------
+# Orquestração
+# -------------------------------
+async def run_batch(jobs, writer, client, workers, concurrency, shard_concurrency=None, verbose=True):
+    from knowledge.validators.async_semantic import SemanticEvaluationError
+    from knowledge.validators.validator_engine import asemantic_validate, load_checklist, score_semantic_result
+
+    loop = asyncio.get_running_loop()
+    # documentos em voo (limita a memória com milhares de arquivos)
+    window = asyncio.Semaphore(workers * 2 + concurrency)
+    semantic_slots = asyncio.Semaphore(concurrency)
+    stats = {"ok": 0, "partial": 0, "error": 0}
+
+    async def process(pool, doc_id, path, artefato):
+        t0 = time.perf_counter()
+        record = {"id": doc_id, "path": str(path), "artefato": artefato}
+        timings = {}
+        try:
+            if not artefato:
+                raise ValueError("artefato não informado nem identificável pelo caminho")
+            stage = await loop.run_in_executor(pool, extract_and_rigid, str(path), artefato)
+            text = stage.pop("text")
+            if not text.strip():
+                raise ValueError("nenhum texto extraído")
+            timings.update(extract_ms=stage.pop("extract_ms"), rigid_ms=stage.pop("rigid_ms"))
+            record.update(chars=len(text), **stage)
+
+            semantic_score, semantic_result, status = 0.0, [], "ok"
+            if client is not None:
+                checklist = load_checklist(artefato)
+                t1 = time.perf_counter()
+                try:
+                    async with semantic_slots:
+                        semantic_score, semantic_result = await asemantic_validate(
+                            text, artefato, checklist, client, concurrency=shard_concurrency)
+                except SemanticEvaluationError as e:
+                    # vereditos obtidos ficam; o erro vai no registro (status "partial")
+                    semantic_result = e.partial
+                    semantic_score = score_semantic_result(semantic_result, len(checklist))
+                    record["error"] = str(e)
+                timings["semantic_ms"] = round((time.perf_counter() - t1) * 1000, 1)
+                if len(semantic_result) < len(checklist):
+                    status = "partial"  # reprocessado no --resume
+            record.update(semantic_score=semantic_score, semantic_result=semantic_result, status=status)
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        timings["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        record["timings"] = timings
+        writer.write(record)
+        stats[record["status"]] += 1
+        if verbose:
+            extra = record.get("error") or f"rígido {record.get('rigid_score', 0):.1f} | semântico {record.get('semantic_score', 0):.1f}"
+            print(f"[{record['status']:<7}] {doc_id} ({artefato or '?'}) – {extra}")
+
+    async def guarded(pool, job):
+        try:
+            await process(pool, *job)
+        finally:
+            window.release()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tasks = []
+            for job in jobs:
+                await window.acquire()
+                tasks.append(asyncio.create_task(guarded(pool, job)))
+            await asyncio.gather(*tasks)
+    finally:
+        # AsyncOpenAI compartilhado por todos os documentos deste loop (llm_pool)
+        from knowledge.validators.llm_pool import aclose_async_clients, pool_stats
+
+        if verbose:
+            for p in pool_stats():
+                if p["requests"]:
+                    print(f"🔌 pool {p['kind']}: {p['requests']} requisições, {p['connections_opened']} conexões "
+                          f"abertas (pico {p['peak_active']} ativas, HTTP/2={'sim' if p['http2'] else 'não'})")
+        await aclose_async_clients()
+    return stats
+
+
+def process_journey(journey_id, paths, client):
+    """Uma jornada (validate_journey): etapas, fatos e coerência; registro resumido por etapa."""
+    from utils.upload_extractor import extract_text_from_uploads
+    from knowledge.validators.journey_validator import validate_journey
+
+    t0 = time.perf_counter()
+    record = {"id": journey_id, "paths": {stage: str(fp) for stage, fp in paths.items()}}
+    try:
+        if "" in paths:
+            raise ValueError("artefato não informado nem identificável pelo caminho")
+        docs = {stage: extract_text_from_uploads([_FileUpload(fp)]) for stage, fp in paths.items()}
+        empty = sorted(stage for stage, text in docs.items() if not text.strip())
+        if empty:
+            raise ValueError(f"nenhum texto extraído: {', '.join(empty)}")
+        result = validate_journey(docs, client, journey_id=journey_id)
+        stages = {}
+        status = "ok"
+        for stage, payload in result["stages"].items():
+            stages[stage] = {k: payload.get(k) for k in ("rigid_score", "semantic_score", "semantic_result")}
+            if payload.get("semantic_error"):
+                stages[stage]["semantic_error"] = payload["semantic_error"]
+                status = "partial"  # reprocessada no --resume
+        record.update(stages=stages, facts=result["facts"], consistency=result["consistency"], status=status)
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["timings"] = {"total_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    return record
+
+
+def run_journeys(journeys, writer, client, concurrency, verbose=True):
+    """Jornadas em paralelo (cada uma já valida as suas etapas em paralelo); gravação na thread principal."""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    stats = {"ok": 0, "partial": 0, "error": 0}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="synapse-batch-journey") as pool:
+        futures = [pool.submit(process_journey, journey_id, paths, client) for journey_id, paths in journeys]
+        for future in as_completed(futures):
+            record = future.result()
+            writer.write(record)
+            stats[record["status"]] += 1
+            if verbose:
+                divergent = sum(1 for c in record.get("consistency") or [] if c["status"] != "ok")
+                extra = record.get("error") or " | ".join(
+                    f"{stage} {s['rigid_score']:.1f}/{s['semantic_score']:.1f}" for stage, s in record["stages"].items()
+                ) + f" | {divergent} divergência(s)"
+                print(f"[{record['status']:<7}] jornada {record['id']} – {extra}")
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Validação em lote do Synapse.IA (saída JSONL)")
+    ap.add_argument("source", help="diretório de documentos ou manifesto (.jsonl/.csv)")
+    ap.add_argument("-o", "--output", type=Path, default=Path("exports/batch/auditoria.jsonl"))
+    ap.add_argument("--artefato", help="artefato de todos os documentos (padrão: inferido do caminho)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="processos de extração/rígido")
+    ap.add_argument("--concurrency", type=int, default=4, help="documentos (com --journey, jornadas) na etapa semântica ao mesmo tempo")
+    ap.add_argument("--shard-concurrency", type=int, default=None,
+                    help="chamadas simultâneas por documento (padrão: SYNAPSE_SEMANTIC_CONCURRENCY)")
+    ap.add_argument("--resume", action="store_true", help="pula documentos já gravados com status ok")
+    ap.add_argument("--no-semantic", action="store_true", help="só extração e rígido (sem LLM)")
+    ap.add_argument("--journey", action="store_true",
+                    help="manifesto com coluna journey: valida DFD/ETP/TR de cada jornada juntos")
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args(argv)
+
+    # checklists são localizados por caminho relativo (knowledge/validators/...);
+    # os processos filhos herdam o diretório
+    source = Path(args.source).resolve()
+    output = args.output.resolve()
+    os.chdir(REPO_ROOT)
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+    artefato = args.artefato.strip().upper() if args.artefato else None
+    if args.resume:
+        compact_output(output)  # tentativas anteriores do mesmo id não se acumulam
+    done = completed_ids(output) if args.resume else set()
+    if args.journey:
+        jobs = [job for job in iter_journeys(source, artefato) if job[0] not in done]
+    else:
+        jobs = [job for job in iter_jobs(source, artefato) if job[0] not in done]
+
+    client = None
+    if not args.no_semantic:
+        from knowledge.validators.llm_backend import get_backend
+        client = get_backend()
+
+    unit = "jornada(s)" if args.journey else "documento(s)"
+    print(f"📦 {len(jobs)} {unit} a validar" + (f" ({len(done)} já concluídos)" if done else ""))
+    writer = JsonlWriter(output, append=args.resume)
+    t0 = time.perf_counter()
+    try:
+        if args.journey:
+            stats = run_journeys(jobs, writer, client, max(1, args.concurrency), verbose=not args.quiet)
+        else:
+            stats = asyncio.run(run_batch(jobs, writer, client, max(1, args.workers), max(1, args.concurrency),
+                                          args.shard_concurrency, verbose=not args.quiet))
+    finally:
+        writer.close()
+        if args.resume:
+            compact_output(output)
+    elapsed = time.perf_counter() - t0
+    rate = len(jobs) / elapsed if elapsed > 0 else 0.0
+    print(f"✅ {datetime.now():%H:%M:%S} – ok={stats['ok']} parcial={stats['partial']} erro={stats['error']} "
+          f"em {elapsed:.1f}s ({rate:.1f} {'jornadas' if args.journey else 'doc'}/s) → {output}")
+    return 1 if stats["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
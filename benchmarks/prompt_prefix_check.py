@@ -0,0 +1,221 @@
+# =========================================
+# Synapse Tutor – Verificação da estabilidade do prefixo dos prompts
+# =========================================
+# O cache de prompt do provedor só reaproveita um prefixo idêntico byte a
+# byte (a partir de ~1024 tokens). Para cada construtor de prompt:
+#   - vNext (_build_messages): sistema + checklist/guia/schema fixos;
+#   - engine (_semantic_request): cada shard do checklist de cada artefato;
+#   - validadores por artefato (semantic_validate_<artefato>), capturando as
+#     mensagens com um client de gravação (sem rede, cache semântico desligado);
+# monta as mensagens para dois documentos diferentes e verifica que:
+#   1) duas montagens com o mesmo documento são idênticas (determinismo);
+#   2) tudo antes do bloco do documento é idêntico entre os documentos;
+#   3) o bloco do documento está na última mensagem e o prefixo não contém
+#      nada do documento.
+# Relata os tokens do prefixo estável (e se atingem o mínimo do cache).
+#
+# Uso (a partir da raiz do repositório):
+#   python -m benchmarks.prompt_prefix_check            # sai com código 1 se algum prefixo variar
+#   python -m benchmarks.prompt_prefix_check --usage    # + cached_tokens registrados (servidor falso)
+# =========================================
+
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+os.chdir(REPO_ROOT)
+# chamadas gravadas não podem vir do cache semântico
+os.environ["SYNAPSE_SEMANTIC_CACHE"] = "0"
+
+from knowledge.validators import validator_engine as engine  # noqa: E402
+from knowledge.validators.async_semantic import plan_shards  # noqa: E402
+from knowledge.validators.context_packer import estimate_tokens  # noqa: E402
+import validator_engine_vNext as vnext  # noqa: E402
+
+KB_ROOT = REPO_ROOT / "knowledge_base"
+CACHE_MIN_TOKENS = 1024
+SENTINELS = ("SENTINELA-DOC-A", "SENTINELA-DOC-B")
+
+ARTEFATOS = ["DFD", "ETP", "TR", "EDITAL", "CONTRATO", "CONTRATO_TECNICO", "ITF", "FISCALIZACAO",
+             "MAPA_RISCOS", "OBRAS", "PCA", "PESQUISA_PRECOS"]
+
+
+# -------------------------------
+# Documentos
+# -------------------------------
+def _documents():
+    """Dois documentos reais e diferentes da base, marcados com sentinelas."""
+    files = sorted((KB_ROOT / "ETP").rglob("*.txt"))[:2]
+    texts = [f.read_text(encoding="utf-8", errors="ignore")[:12000] for f in files]
+    while len(texts) < 2:
+        texts.append("Estudo técnico preliminar de exemplo. " * 200)
+    return [f"{s}\n{t}\n{s}" for s, t in zip(SENTINELS, texts)]
+
+
+def _flatten(messages):
+    return "".join(f"<{m['role']}>\n{m['content']}\n" for m in messages)
+
+
+# -------------------------------
+# Construtores
+# -------------------------------
+def vnext_calls(artefato, doc):
+    kb_text, _ = vnext._gather_kb_snippets(artefato, topk=12, max_chars=9000, query=doc)
+    return [vnext._build_messages(artefato, doc, kb_text)]
+
+
+def engine_calls(artefato, doc):
+    itens, build_messages = engine._semantic_request(doc, engine.load_checklist(artefato), artefato)
+    return [build_messages(shard) for shard in plan_shards(itens, engine._SEMANTIC_PARAMS["max_tokens"])]
+
+
+class _RecordingClient:
+    """client.chat.completions.create que só grava as mensagens (resposta vazia)."""
+
+    def __init__(self):
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.base_url = "gravacao"
+
+    def _create(self, **kwargs):
+        self.calls.append(kwargs["messages"])
+        msg = SimpleNamespace(content='{"itens": []}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=msg, finish_reason="stop")], usage=None)
+
+
+def validator_calls(artefato, doc):
+    slug = artefato.lower()
+    try:
+        module = importlib.import_module(f"knowledge.validators.{slug}_semantic_validator")
+    except ImportError as exc:
+        print(f"{'validador':<10} {artefato:<17} ignorado ({exc})")
+        return []
+    fn = getattr(module, f"semantic_validate_{slug}", None)
+    if fn is None:
+        return []
+    client = _RecordingClient()
+    try:
+        fn(doc, client)
+    except Exception as exc:
+        # resposta vazia pode não passar na validação do módulo; as mensagens já foram gravadas
+        if not client.calls:
+            print(f"{'validador':<10} {artefato:<17} ignorado ({type(exc).__name__}: {exc})")
+    return client.calls
+
+
+# marcador do início do bloco que depende do documento
+BUILDERS = [
+    ("vnext", vnext_calls, "=== CONTEXTO DE REFERÊNCIA"),
+    ("engine", engine_calls, '\nDOCUMENTO:\n"""'),
+    ("validador", validator_calls, None),
+]
+
+
+def _dynamic_start(flat, marker):
+    if marker is not None:
+        return flat.find(marker)
+    # validadores por artefato: "DOCUMENTO (ETP):" / "Documento (DFD):"
+    return min([i for i in (flat.find("DOCUMENTO ("), flat.find("Documento (")) if i >= 0], default=-1)
+
+
+# -------------------------------
+# Verificação
+# -------------------------------
+def check(builder, artefato, build, marker, docs):
+    calls_a = build(artefato, docs[0])
+    if not calls_a:
+        return None  # validador sem LLM (regras locais) ou indisponível neste ambiente
+    again = build(artefato, docs[0])
+    calls_b = build(artefato, docs[1])
+    problems = []
+    if [_flatten(m) for m in again] != [_flatten(m) for m in calls_a]:
+        problems.append("montagem não determinística")
+    if len(calls_b) != len(calls_a):
+        problems.append(f"nº de chamadas varia com o documento ({len(calls_a)} × {len(calls_b)})")
+
+    prefix_tokens = []
+    for k, (ma, mb) in enumerate(zip(calls_a, calls_b)):
+        fa, fb = _flatten(ma), _flatten(mb)
+        ia, ib = _dynamic_start(fa, marker), _dynamic_start(fb, marker)
+        if ia < 0 or ib < 0:
+            problems.append(f"chamada {k}: bloco do documento não encontrado")
+            continue
+        if fa[:ia] != fb[:ib]:
+            cut = len(os.path.commonprefix([fa[:ia], fb[:ib]]))
+            problems.append(f"chamada {k}: prefixo varia a partir do caractere {cut}: {fa[cut:cut + 60]!r}")
+        if any(s in fa[:ia] for s in SENTINELS):
+            problems.append(f"chamada {k}: conteúdo do documento antes do bloco do documento")
+        if _dynamic_start(_flatten(ma[-1:]), marker) < 0:
+            problems.append(f"chamada {k}: documento fora da última mensagem")
+        prefix_tokens.append(estimate_tokens(fa[:ia]))
+
+    return {
+        "builder": builder,
+        "artefato": artefato,
+        "calls": len(calls_a),
+        "prefix_tokens": min(prefix_tokens) if prefix_tokens else 0,
+        "problems": problems,
+    }
+
+
+def run_usage_check():
+    """
+    Duas validações semânticas do mesmo artefato com documentos diferentes
+    contra o servidor falso: a segunda deve ter cached_tokens > 0 (usage_log).
+    """
+    if importlib.util.find_spec("openai") is None:
+        print("--usage: openai não instalado, verificação de uso ignorada")
+        return True
+    from knowledge.validators.llm_call import usage_log
+    from knowledge.validators.llm_pool import get_llm_client
+    from tests.fake_llm_server import FakeLLMServer
+
+    docs = _documents()
+    with FakeLLMServer(latency=0.0, content="[]") as srv:
+        client = get_llm_client(api_key="fake", base_url=srv.base_url)
+        for doc in docs:
+            engine.semantic_validate(doc, "ETP", engine.load_checklist("ETP"), client)
+    log = usage_log()
+    for entry in log:
+        print(f"  prompt={entry['prompt_tokens']:6d}  cached={entry['cached_tokens']:6d}  model={entry['model']}")
+    second = log[len(log) // 2:]
+    return any(e["cached_tokens"] > 0 for e in second)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Verifica que os prompts têm prefixo estável por artefato")
+    ap.add_argument("--usage", action="store_true",
+                    help="também chama o servidor falso e mostra os cached_tokens registrados")
+    args = ap.parse_args(argv)
+
+    docs = _documents()
+    failures = 0
+    for builder, build, marker in BUILDERS:
+        for artefato in (["ETP"] if builder == "vnext" else ARTEFATOS):
+            r = check(builder, artefato, build, marker, docs)
+            if r is None:
+                continue
+            status = "ok" if not r["problems"] else "FALHA"
+            cache = "cacheável" if r["prefix_tokens"] >= CACHE_MIN_TOKENS else f"< {CACHE_MIN_TOKENS} tokens"
+            print(f"{builder:<10} {artefato:<17} chamadas={r['calls']:<3} prefixo={r['prefix_tokens']:6d} tokens "
+                  f"({cache})  {status}")
+            for p in r["problems"]:
+                print(f"    - {p}")
+            failures += bool(r["problems"])
+
+    if args.usage and not run_usage_check():
+        print("--usage: nenhuma resposta com cached_tokens > 0")
+        failures += 1
+    print(f"\n{failures} construtor(es) com prefixo instável" if failures else "\nPrefixos estáveis.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
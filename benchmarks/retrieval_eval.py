@@ -0,0 +1,146 @@
+# =========================================
+# Synapse Tutor – Avaliação da recuperação na knowledge_base (BM25 × vetorial)
+# =========================================
+# Para cada recuperador (knowledge/retrieval: kb_index e vector_index) mede:
+#   - recall@k na amostra rotulada (benchmarks/retrieval_labels.json):
+#     acerto se algum dos k primeiros trechos vem de um arquivo relevante;
+#   - recall@k de item conhecido: a consulta é um fragmento (~300 caracteres)
+#     de um trecho sorteado do armazém; acerto se o próprio trecho está no top-k
+#     (ou um trecho do mesmo arquivo, já que a deduplicação pode tê-lo unido);
+#   - latência por consulta (p50/p95) e, no vetorial, vazão em lote
+#     (search_batch: um produto de matrizes para todas as consultas).
+#
+# Uso (a partir da raiz do repositório):
+#   python -m benchmarks.retrieval_eval
+#   python -m benchmarks.retrieval_eval --k 10 --known 200 --output benchmarks/results/retrieval.json
+#
+# O vetorial sai como "skipped" se o numpy não estiver instalado.
+# =========================================
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+os.chdir(REPO_ROOT)
+
+from knowledge.retrieval.kb_index import get_kb_index  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+LABELS_PATH = BENCH_DIR / "retrieval_labels.json"
+RESULTS_DIR = BENCH_DIR / "results"
+
+KNOWN_ITEM_CHARS = 300
+
+
+# -------------------------------
+# Consultas
+# -------------------------------
+def load_labeled(path=LABELS_PATH):
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [(q["consulta"], set(q["relevantes"])) for q in data["consultas"]]
+
+
+def known_items(store, n, seed=13):
+    """(fragmento do meio de um trecho, id do trecho, arquivo) para `n` trechos sorteados."""
+    rng = random.Random(seed)
+    ids = [i for i in range(len(store)) if len(store.raw(i)) >= 2 * KNOWN_ITEM_CHARS]
+    out = []
+    for i in rng.sample(ids, min(n, len(ids))):
+        text = store.text(i)
+        start = rng.randrange(0, len(text) - KNOWN_ITEM_CHARS)
+        out.append((text[start:start + KNOWN_ITEM_CHARS], i, store.source(i)))
+    return out
+
+
+# -------------------------------
+# Medição
+# -------------------------------
+def _percentile(samples, p):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(p * (len(s) - 1))))]
+
+
+def evaluate(index, labeled, known, k):
+    store = index.store
+    hits = 0
+    latencies = []
+    for query, relevant in labeled:
+        t0 = time.perf_counter()
+        ranked = index.search(query, topk=k)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        hits += any(store.source(i) in relevant for i, _ in ranked)
+
+    exact = same_file = 0
+    for query, chunk_id, source in known:
+        t0 = time.perf_counter()
+        ranked = index.search(query, topk=k)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        ids = [i for i, _ in ranked]
+        exact += chunk_id in ids
+        same_file += any(store.source(i) == source for i in ids)
+
+    result = {
+        f"recall@{k}_rotulado": round(hits / max(1, len(labeled)), 3),
+        f"recall@{k}_item_conhecido": round(exact / max(1, len(known)), 3),
+        f"recall@{k}_item_conhecido_arquivo": round(same_file / max(1, len(known)), 3),
+        "consultas": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+    }
+    if hasattr(index, "search_batch"):
+        queries = [q for q, _ in labeled] + [q for q, _, _ in known]
+        index.search_batch(queries[:4], k)  # aquecimento
+        t0 = time.perf_counter()
+        index.search_batch(queries, k)
+        elapsed = time.perf_counter() - t0
+        result["lote_ms"] = round(elapsed * 1000.0, 3)
+        result["lote_consultas_por_s"] = round(len(queries) / elapsed, 1)
+    return result
+
+
+def run(k=5, known_n=100):
+    bm25 = get_kb_index()
+    labeled = load_labeled()
+    known = known_items(bm25.store, known_n)
+    results = {"bm25": evaluate(bm25, labeled, known, k)}
+    try:
+        from knowledge.retrieval.vector_index import get_vector_index
+        t0 = time.perf_counter()
+        vector = get_vector_index()
+        load_ms = (time.perf_counter() - t0) * 1000.0
+        results["vector"] = {"carga_ms": round(load_ms, 1), "dim": vector.dim,
+                             **evaluate(vector, labeled, known, k)}
+    except RuntimeError as exc:
+        results["vector"] = {"skipped": str(exc)}
+    return {"k": k, "trechos": len(bm25.store), "results": results}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Recall e latência da recuperação na knowledge_base")
+    ap.add_argument("--k", type=int, default=5, help="tamanho do top-k (padrão: 5)")
+    ap.add_argument("--known", type=int, default=100, help="consultas de item conhecido (padrão: 100)")
+    ap.add_argument("--output", type=Path, default=RESULTS_DIR / "retrieval.json", help="arquivo de resultados")
+    args = ap.parse_args(argv)
+
+    report = run(max(1, args.k), max(0, args.known))
+    for name, r in report["results"].items():
+        if "skipped" in r:
+            print(f"{name:<8} skipped ({r['skipped']})")
+            continue
+        print(f"{name:<8} " + "  ".join(f"{key}={value}" for key, value in r.items()))
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nResultados gravados em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
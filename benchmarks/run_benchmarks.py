@@ -0,0 +1,318 @@
+# =========================================
+# Synapse Tutor – Microbenchmarks dos caminhos críticos de CPU
+# =========================================
+# Mede as funções puras que dominam o tempo fora das chamadas ao LLM, com
+# entradas reais de knowledge_base/ (incluindo o manual de boas práticas,
+# ~960 KB):
+#   normalize_text, remove_accents, rigid_validate (todos os artefatos),
+#   _gather_kb_snippets, generate_augmented_document, _build_guided_markdown,
+#   markdown_to_docx e extract_text_from_uploads.
+#
+# Cada caso roda `--repeat` vezes (após um aquecimento); o setup de cada
+# repetição limpa o cache de normalização, então o tempo medido é o de um
+# documento novo. Guarda-se min e mediana em ms; a comparação usa o mínimo
+# (o menos sensível a ruído da máquina).
+#
+# Uso (a partir da raiz do repositório):
+#   python -m benchmarks.run_benchmarks                       # mede e grava results/latest.json
+#   python -m benchmarks.run_benchmarks --save-baseline       # grava benchmarks/baseline.json
+#   python -m benchmarks.run_benchmarks --compare             # falha (exit 1) se regredir > 25%
+#   python -m benchmarks.run_benchmarks --compare outro.json --threshold 0.10 --filter rigid
+#
+# Casos cujas dependências não estão instaladas (python-docx) saem como
+# "skipped" e não entram na comparação.
+# =========================================
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from knowledge.validators import validator_engine as engine  # noqa: E402
+from knowledge.validators.text_normalizer import normalize_document  # noqa: E402
+import validator_engine_vNext as vnext  # noqa: E402
+from utils.upload_extractor import extract_text_from_uploads  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+KB_ROOT = REPO_ROOT / "knowledge_base"
+LARGE_DOC = KB_ROOT / "manuais_modelos" / "manual-de-boas-praticas-em-contratacoes-publicas (1).txt"
+MEDIUM_DOC = KB_ROOT / "ETP"
+
+ARTEFATOS = ["DFD", "ETP", "TR", "EDITAL", "CONTRATO", "CONTRATO_TECNICO", "ITF", "FISCALIZACAO",
+             "MAPA_RISCOS", "OBRAS", "PCA", "PESQUISA_PRECOS"]
+
+
+class Skip(Exception):
+    """Caso sem as dependências necessárias neste ambiente."""
+
+
+# -------------------------------
+# Entradas
+# -------------------------------
+def _read(fp: Path) -> str:
+    return fp.read_text(encoding="utf-8", errors="ignore")
+
+
+def _medium_text() -> str:
+    """Primeiro ETP da base (documento de tamanho típico de upload)."""
+    files = sorted(MEDIUM_DOC.rglob("*.txt"))
+    return _read(files[0]) if files else _read(LARGE_DOC)[:40000]
+
+
+def _fake_semantic(itens, every=3):
+    """Resultado semântico sintético: 1 a cada `every` itens ausente, demais com nota variada."""
+    out = []
+    for i, it in enumerate(itens):
+        ausente = i % every == 0
+        out.append({
+            "id": it.get("id"),
+            "descricao": it.get("descricao", ""),
+            "presente": not ausente,
+            "adequacao_nota": 0 if ausente else 40 + (i * 7) % 60,
+            "justificativa": "avaliação sintética para benchmark",
+            "faltantes": [f"elemento {i}.{k}" for k in range(2)] if ausente else [],
+        })
+    return out
+
+
+class _Upload:
+    """Objeto com a interface usada por extract_text_from_uploads (name/read)."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+def _docx_bytes(text):
+    try:
+        from docx import Document
+    except ImportError:
+        raise Skip("python-docx não instalado")
+    doc = Document()
+    for line in text.splitlines():
+        doc.add_paragraph(line)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+@contextlib.contextmanager
+def _in_tempdir():
+    """markdown_to_docx grava em exports/ relativo ao cwd: isola num diretório temporário."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+
+
+# -------------------------------
+# Casos
+# -------------------------------
+def build_cases():
+    """
+    Lista de (nome, preparo). O preparo roda uma vez e devolve a função a
+    cronometrar (sem argumentos); pode levantar Skip.
+    """
+    cases = []
+    large = _read(LARGE_DOC)
+    medium = _medium_text()
+
+    def text_case(fn, text):
+        def prepare():
+            return lambda: fn(text)
+        return prepare
+
+    cases.append(("normalize_text/manual_960k", text_case(engine.normalize_text, large)))
+    cases.append(("normalize_text/etp", text_case(engine.normalize_text, medium)))
+    cases.append(("remove_accents/manual_960k", text_case(engine.remove_accents, large)))
+    cases.append(("remove_accents/etp", text_case(engine.remove_accents, medium)))
+
+    for art in ARTEFATOS:
+        def prepare(art=art):
+            if not engine.load_checklist(art):
+                raise Skip(f"sem checklist para {art}")
+            return lambda: engine.rigid_validate(large, art)
+        cases.append((f"rigid_validate/{art}", prepare))
+
+    for doc_type in ("ETP", "TR", "EDITAL", "CONTRATO", "OUTRO"):
+        cases.append((f"_gather_kb_snippets/{doc_type}",
+                      (lambda d=doc_type: (lambda: vnext._gather_kb_snippets(d, query=medium)))))
+
+    def prepare_augmented():
+        _, rigid = engine.rigid_validate(large, "ETP")
+        result = {"rigid_result": rigid, "semantic_result": _fake_semantic(engine.load_checklist("ETP"))}
+        return lambda: engine.generate_augmented_document(large, "ETP", result)
+    cases.append(("generate_augmented_document/ETP_manual_960k", prepare_augmented))
+
+    def prepare_guided():
+        sem = _fake_semantic(vnext.RIGID_CHECKLIST_ETP * 4, every=2)
+        return lambda: vnext._build_guided_markdown("ETP", large, sem)
+    cases.append(("_build_guided_markdown/ETP_manual_960k", prepare_guided))
+
+    def prepare_docx():
+        try:
+            with _in_tempdir():
+                from utils.formatter_docx import markdown_to_docx
+        except ImportError:
+            raise Skip("python-docx não instalado")
+        md, _ = vnext._build_guided_markdown("ETP", medium, _fake_semantic(vnext.RIGID_CHECKLIST_ETP))
+
+        def run():
+            with _in_tempdir():
+                markdown_to_docx(md, titulo="Rascunho Orientado – ETP", summary="benchmark")
+        return run
+    cases.append(("markdown_to_docx/ETP", prepare_docx))
+
+    def prepare_txt_uploads():
+        files = [(f.name, f.read_bytes()) for f in sorted(KB_ROOT.rglob("*.txt"))[:20]] + \
+                [(LARGE_DOC.name, LARGE_DOC.read_bytes())]
+        return lambda: extract_text_from_uploads([_Upload(n, d) for n, d in files])
+    cases.append(("extract_text_from_uploads/txt_21", prepare_txt_uploads))
+
+    def prepare_docx_uploads():
+        data = _docx_bytes(medium)
+        return lambda: extract_text_from_uploads([_Upload("etp.docx", data)])
+    cases.append(("extract_text_from_uploads/docx", prepare_docx_uploads))
+
+    return cases
+
+
+# -------------------------------
+# Execução
+# -------------------------------
+def _reset_caches():
+    normalize_document.cache_clear()
+
+
+def time_case(fn, repeat):
+    _reset_caches()
+    fn()  # aquecimento (checklists compilados, imports tardios)
+    samples = []
+    for _ in range(repeat):
+        _reset_caches()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return {
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "repeat": repeat,
+    }
+
+
+def run(filter_expr=None, repeat=7, verbose=True):
+    results = {}
+    for name, prepare in build_cases():
+        if filter_expr and filter_expr not in name:
+            continue
+        try:
+            fn = prepare()
+            results[name] = time_case(fn, repeat)
+        except Skip as exc:
+            results[name] = {"skipped": str(exc)}
+        if verbose:
+            r = results[name]
+            if "skipped" in r:
+                print(f"{name:<48} skipped ({r['skipped']})")
+            else:
+                print(f"{name:<48} min={r['min_ms']:10.3f} ms  mediana={r['median_ms']:10.3f} ms")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.25, min_delta_ms=0.5):
+    """
+    Regressões: casos medidos em ambos cujo min_ms cresceu mais que `threshold`
+    (fração) e mais que `min_delta_ms` em valor absoluto (evita falso alarme
+    em funções de microssegundos).
+    """
+    regressions = []
+    rows = []
+    base = baseline.get("results", {})
+    for name, cur in current.get("results", {}).items():
+        old = base.get(name)
+        if not old or "min_ms" not in old or "min_ms" not in cur:
+            continue
+        delta = cur["min_ms"] - old["min_ms"]
+        ratio = (cur["min_ms"] / old["min_ms"] - 1.0) if old["min_ms"] > 0 else 0.0
+        regressed = ratio > threshold and delta > min_delta_ms
+        rows.append((name, old["min_ms"], cur["min_ms"], ratio, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Microbenchmarks dos caminhos críticos de CPU do Synapse Tutor")
+    ap.add_argument("--filter", help="roda só os casos cujo nome contém este texto")
+    ap.add_argument("--repeat", type=int, default=7, help="repetições por caso (padrão: 7)")
+    ap.add_argument("--output", type=Path, default=RESULTS_DIR / "latest.json", help="arquivo de resultados")
+    ap.add_argument("--save-baseline", action="store_true", help=f"grava também em {BASELINE_PATH.name}")
+    ap.add_argument("--compare", nargs="?", const=str(BASELINE_PATH), metavar="BASELINE",
+                    help="compara com o baseline e sai com código 1 se houver regressão")
+    ap.add_argument("--threshold", type=float, default=0.25, help="regressão tolerada (fração, padrão: 0.25)")
+    ap.add_argument("--min-delta-ms", type=float, default=0.5, help="diferença mínima absoluta (padrão: 0.5 ms)")
+    args = ap.parse_args(argv)
+
+    # o engine localiza os checklists por caminho relativo (knowledge/validators/...)
+    os.chdir(REPO_ROOT)
+    current = run(args.filter, max(1, args.repeat))
+    _write_json(args.output, current)
+    print(f"\nResultados gravados em {args.output}")
+    if args.save_baseline:
+        _write_json(BASELINE_PATH, current)
+        print(f"Baseline gravado em {BASELINE_PATH}")
+
+    if args.compare:
+        path = Path(args.compare)
+        if not path.exists():
+            print(f"Baseline não encontrado: {path}")
+            return 2
+        rows, regressions = compare(current, json.loads(path.read_text(encoding="utf-8")),
+                                    args.threshold, args.min_delta_ms)
+        print(f"\nComparação com {path} (limite: +{args.threshold:.0%}, mínimo {args.min_delta_ms} ms)")
+        for name, old, cur, ratio, regressed in rows:
+            flag = "  <-- REGRESSÃO" if regressed else ""
+            print(f"{name:<48} {old:10.3f} -> {cur:10.3f} ms  ({ratio:+.1%}){flag}")
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões): {', '.join(regressions)}")
+            return 1
+        print("\nSem regressões.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# knowledge/retrieval/__init__.py
+# Marca este diretório como um pacote Python.
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Armazém binário dos trechos da knowledge_base (mmap)
+#
+# Em vez de manter o texto decodificado de cada trecho em memória (e em cada
+# processo), a base fragmentada vira três arquivos:
+#   chunks.bin        UTF-8 de todos os trechos, concatenados
+#   chunks.offsets    uint64 little-endian: n+1 fronteiras (trecho i = [off[i], off[i+1]))
+#   chunks.meta.json  versão, assinatura da base e, por trecho, índices de
+#                     arquivo de origem, pasta e seção (tabelas sem repetição)
+# O blob e as fronteiras são abertos uma vez com mmap: `raw(i)` é uma fatia
+# sem cópia (memoryview) e `text(i)` decodifica só o trecho pedido. Processos
+# que abrem o mesmo armazém compartilham as páginas pelo cache do SO.
+#
+# O meta é gravado por último e traz o tamanho do blob e o número de
+# trechos; armazém inconsistente (gravação interrompida) é recusado no open.
+# =============================================================================
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from knowledge.retrieval.chunking import KBChunk
+
+STORE_VERSION = 1
+BLOB_NAME = "chunks.bin"
+OFFSETS_NAME = "chunks.offsets"
+META_NAME = "chunks.meta.json"
+
+
+class StoreError(RuntimeError):
+    """Armazém ausente, de outra versão ou inconsistente."""
+
+
+def _replace(tmp: Path, path: Path) -> None:
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_store(chunks: Iterable[KBChunk], store_dir: Path, fingerprint: str = "") -> Dict[str, object]:
+    """Grava o armazém (blob e fronteiras primeiro; meta por último). Devolve o meta."""
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    tag = f".{os.getpid()}.tmp"
+    tables: Dict[str, Dict[str, int]] = {"sources": {}, "folders": {}, "sections": {}}
+    rows: List[List[int]] = []
+    offsets = array("Q", [0])
+
+    def ref(table: str, value: str) -> int:
+        ids = tables[table]
+        if value not in ids:
+            ids[value] = len(ids)
+        return ids[value]
+
+    blob_tmp = store_dir / (BLOB_NAME + tag)
+    with open(blob_tmp, "wb") as f:
+        for chunk in chunks:
+            data = chunk.text.encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+            rows.append([ref("sources", chunk.source), ref("folders", chunk.folder), ref("sections", chunk.section)])
+
+    total = offsets[-1]
+    offsets_tmp = store_dir / (OFFSETS_NAME + tag)
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    with open(offsets_tmp, "wb") as f:
+        offsets.tofile(f)
+
+    meta = {
+        "version": STORE_VERSION,
+        "fingerprint": fingerprint,
+        "count": len(rows),
+        "blob_bytes": total,
+        **{name: list(ids) for name, ids in tables.items()},
+        "rows": rows,
+    }
+    meta_tmp = store_dir / (META_NAME + tag)
+    meta_tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    _replace(blob_tmp, store_dir / BLOB_NAME)
+    _replace(offsets_tmp, store_dir / OFFSETS_NAME)
+    _replace(meta_tmp, store_dir / META_NAME)
+    return meta
+
+
+class ChunkStore:
+    """Leitura do armazém via mmap (somente leitura, fatias sem cópia)."""
+
+    def __init__(self, store_dir: Path) -> None:
+        self.store_dir = Path(store_dir)
+        try:
+            meta = json.loads((self.store_dir / META_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise StoreError(f"armazém ausente ou ilegível em {self.store_dir}: {e}")
+        if meta.get("version") != STORE_VERSION:
+            raise StoreError(f"versão do armazém {meta.get('version')} != {STORE_VERSION}")
+        self.fingerprint: str = meta.get("fingerprint", "")
+        self.sources: List[str] = meta["sources"]
+        self.folders: List[str] = meta["folders"]
+        self.sections: List[str] = meta["sections"]
+        self._rows: List[List[int]] = meta["rows"]
+        n = int(meta["count"])
+
+        self._blob = self._map(self.store_dir / BLOB_NAME, int(meta["blob_bytes"]))
+        self._offsets_map = self._map(self.store_dir / OFFSETS_NAME, 8 * (n + 1))
+        self._offsets: memoryview
+        if sys.byteorder == "little":
+            self._offsets = memoryview(self._offsets_map).cast("Q")
+        else:  # raro: converte uma vez
+            arr = array("Q", bytes(self._offsets_map))
+            arr.byteswap()
+            self._offsets = memoryview(arr)
+        self._view = memoryview(self._blob) if self._blob is not None else memoryview(b"")
+        if len(self._rows) != n or len(self._offsets) != n + 1:
+            raise StoreError("armazém inconsistente (gravação interrompida?)")
+
+    @staticmethod
+    def _map(path: Path, expected: int) -> Optional[mmap.mmap]:
+        try:
+            size = path.stat().st_size
+        except OSError as e:
+            raise StoreError(str(e))
+        if size != expected:
+            raise StoreError(f"{path.name}: {size} bytes, esperado {expected}")
+        if not size:
+            return None  # mmap não aceita arquivo vazio
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def raw(self, i: int) -> memoryview:
+        """Bytes UTF-8 do trecho, sem cópia."""
+        return self._view[self._offsets[i]:self._offsets[i + 1]]
+
+    def text(self, i: int) -> str:
+        return str(self.raw(i), "utf-8")
+
+    def source(self, i: int) -> str:
+        return self.sources[self._rows[i][0]]
+
+    def folder(self, i: int) -> str:
+        return self.folders[self._rows[i][1]]
+
+    def section(self, i: int) -> str:
+        return self.sections[self._rows[i][2]]
+
+    def __getitem__(self, i: int) -> KBChunk:
+        src, folder, section = self._rows[i]
+        return KBChunk(self.sources[src], self.folders[folder], self.sections[section], self.text(i))
+
+    def __iter__(self) -> Iterator[KBChunk]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self) -> None:
+        self._view.release()
+        self._offsets.release()
+        for m in (self._blob, self._offsets_map):
+            if m is not None:
+                m.close()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Fragmentação da knowledge_base em trechos
+#
+# Cada arquivo .txt/.md de knowledge_base/ é normalizado (mesma normalização
+# dos validadores) e dividido em trechos de ~1.200 caracteres, sem quebrar
+# linhas; linhas muito longas (PDFs convertidos) são divididas por frase.
+# Cada trecho guarda a pasta de primeiro nível, o arquivo de origem e a
+# seção (último título visto antes dele: "CAPÍTULO II", "3.1 ...", "Art. 18").
+# =============================================================================
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from knowledge.validators.text_normalizer import NormalizedText
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+KB_ROOT = REPO_ROOT / "knowledge_base"
+KB_EXTENSIONS = (".txt", ".md")
+
+CHUNK_CHARS = 1200
+_MAX_SECTION_CHARS = 120
+
+_SENTENCE_RX = re.compile(r"(?<=[.;:!?])\s+")
+_HEADING_RX = re.compile(
+    r"^(?:\d+(?:\.\d+)*[.)]?\s+\S|(?:CAP[IÍ]TULO|SE[CÇ][AÃ]O|T[IÍ]TULO|ANEXO|PARTE)\b|Art\.?\s*\d+|#+\s)",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class KBChunk:
+    source: str   # caminho relativo a knowledge_base/ (com "/")
+    folder: str   # pasta de primeiro nível ("" na raiz)
+    section: str  # título mais recente antes do trecho
+    text: str
+
+
+def read_kb_file(fp: Path) -> str:
+    """Lê em UTF-8 (bytes inválidos ignorados)."""
+    try:
+        return fp.read_bytes().decode("utf-8", errors="ignore")
+    except OSError:
+        return ""
+
+
+def iter_kb_files(kb_root: Path = KB_ROOT) -> Iterator[Path]:
+    """Arquivos da base em ordem estável."""
+    if not kb_root.exists():
+        return
+    for fp in sorted(kb_root.rglob("*")):
+        if fp.is_file() and fp.suffix.lower() in KB_EXTENSIONS:
+            yield fp
+
+
+def _is_heading(line: str) -> bool:
+    s = line.strip()
+    if not s or len(s) > _MAX_SECTION_CHARS:
+        return False
+    if _HEADING_RX.match(s):
+        return True
+    letters = [c for c in s if c.isalpha()]
+    return len(letters) >= 4 and all(c.isupper() for c in letters)
+
+
+def _pieces(text: str, target_chars: int) -> Iterator[Tuple[str, bool]]:
+    """(linha ou frase, é título)."""
+    for line in NormalizedText(text).normalized.split("\n"):
+        if not line.strip():
+            continue
+        if len(line) <= target_chars * 1.5:
+            yield line, _is_heading(line)
+        else:
+            for s in _SENTENCE_RX.split(line):
+                if s:
+                    yield s, False
+
+
+def chunk_text(text: str, source: str = "", folder: str = "",
+               target_chars: int = CHUNK_CHARS) -> List[KBChunk]:
+    """Trechos de ~target_chars; um título abre trecho novo quando o atual já tem conteúdo."""
+    chunks: List[KBChunk] = []
+    current: List[str] = []
+    size = 0
+    section = ""
+    current_section = ""
+
+    def flush() -> None:
+        if current:
+            chunks.append(KBChunk(source, folder, current_section, "\n".join(current)))
+
+    for piece, heading in _pieces(text, target_chars):
+        if current and (size + len(piece) > target_chars or (heading and size > target_chars // 3)):
+            flush()
+            current, size = [], 0
+        if heading:
+            section = piece.strip()[:_MAX_SECTION_CHARS]
+        if not current:
+            current_section = section
+        current.append(piece)
+        size += len(piece) + 1
+    flush()
+    return chunks
+
+
+def kb_location(fp: Path, kb_root: Path = KB_ROOT) -> Tuple[str, str]:
+    """(caminho relativo com "/", pasta de primeiro nível) do arquivo na base."""
+    rel = fp.relative_to(kb_root)
+    return rel.as_posix(), (rel.parts[0] if len(rel.parts) > 1 else "")
+
+
+def chunk_file(fp: Path, kb_root: Path = KB_ROOT) -> List[KBChunk]:
+    source, folder = kb_location(fp, kb_root)
+    return chunk_text(read_kb_file(fp), source, folder)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Eliminação de duplicatas na ingestão da knowledge_base
+#
+# A base tem arquivos repetidos em pastas diferentes (ex.: o mesmo Modelo de
+# TR de Obras em TR/ e manuais_modelos/) e cadernos técnicos com blocos de
+# texto-padrão em comum; sem tratamento, a recuperação gasta o orçamento de
+# contexto com o mesmo texto duas vezes. Na ingestão:
+# - duplicata exata: hash do texto normalizado (sem acentos, minúsculo,
+#   espaços colapsados) — por arquivo e por trecho;
+# - quase-duplicata: MinHash de shingles de 5 palavras (one-permutation
+#   hashing: um hash por shingle, 64 faixas) + LSH em 16 bandas de 4; pares
+#   candidatos são confirmados pela similaridade de Jaccard exata (≥ 0,8).
+# Fica o primeiro trecho na ordem de ingestão (ordem dos arquivos); o
+# relatório traz os bytes economizados e os grupos removidos.
+#
+# Hash e assinatura de cada trecho (chunk_features) podem vir prontos do
+# cache da indexação incremental (indexer.py); os shingles só são calculados
+# para os pares candidatos do LSH.
+# =============================================================================
+from __future__ import annotations
+
+import hashlib
+import operator
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from knowledge.retrieval.chunking import KBChunk
+from knowledge.validators.text_normalizer import fold_accents
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+NEAR_DUP_THRESHOLD = 0.8
+# candidato cuja concordância de assinatura (estimativa do Jaccard) fica
+# abaixo de threshold - SIG_MARGIN nem chega à comparação exata
+SIG_MARGIN = 0.3
+
+_WORD_RX = re.compile(r"\w+")
+_EMPTY = (1 << 64) - 1
+
+
+def canonical(text: str) -> str:
+    """Forma usada nas comparações: sem acentos, minúscula, só palavras."""
+    return " ".join(_WORD_RX.findall(fold_accents(text or "").lower()))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(canonical(text).encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> FrozenSet[int]:
+    """Hashes de 64 bits dos shingles de `size` palavras (texto curto: um shingle só)."""
+    words = canonical(text).split()
+    if len(words) <= size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return frozenset(
+        int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams
+    )
+
+
+def minhash(hashes: Iterable[int], num_perm: int = NUM_PERM) -> Tuple[int, ...]:
+    """
+    Assinatura por one-permutation hashing: a faixa de cada hash é h % num_perm
+    e guarda-se o menor h // num_perm por faixa; faixas vazias são preenchidas
+    pela próxima não vazia (densificação por rotação).
+    """
+    sig = [_EMPTY] * num_perm
+    for h in hashes:
+        b = h % num_perm
+        v = h // num_perm
+        if v < sig[b]:
+            sig[b] = v
+    if all(v == _EMPTY for v in sig):
+        return tuple(sig)
+    for b in range(num_perm):
+        if sig[b] == _EMPTY:
+            j, step = b, 0
+            while sig[j] == _EMPTY:
+                j = (j + 1) % num_perm
+                step += 1
+            sig[b] = sig[j] + step * 0x9E3779B97F4A7C15 % (1 << 58)
+    return tuple(sig)
+
+
+def chunk_features(text: str) -> Tuple[str, Tuple[int, ...]]:
+    """(hash do conteúdo, assinatura MinHash) do trecho."""
+    return content_hash(text), minhash(shingles(text))
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _DisjointLSH:
+    """Tabelas LSH por banda: chave da banda → trechos mantidos com essa chave."""
+
+    def __init__(self, bands: int = BANDS, rows: int = ROWS) -> None:
+        self.bands = bands
+        self.rows = rows
+        self.tables: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(bands)]
+
+    def candidates(self, sig: Sequence[int]) -> List[int]:
+        seen: Dict[int, None] = {}
+        for b in range(self.bands):
+            for i in self.tables[b].get(tuple(sig[b * self.rows:(b + 1) * self.rows]), ()):
+                seen.setdefault(i)
+        return list(seen)
+
+    def add(self, i: int, sig: Sequence[int]) -> None:
+        for b in range(self.bands):
+            self.tables[b].setdefault(tuple(sig[b * self.rows:(b + 1) * self.rows]), []).append(i)
+
+
+def dedup_chunks(
+    chunks: Sequence[KBChunk],
+    threshold: float = NEAR_DUP_THRESHOLD,
+    features: Optional[Sequence[Tuple[str, Tuple[int, ...]]]] = None,
+) -> Tuple[List[KBChunk], Dict[str, object]]:
+    """
+    Trechos sem duplicatas exatas nem quase-duplicatas (Jaccard ≥ threshold) +
+    relatório. `features`: chunk_features de cada trecho, se já calculadas.
+    """
+    if features is None:
+        features = [chunk_features(c.text) for c in chunks]
+    kept: List[KBChunk] = []
+    shingle_cache: Dict[str, FrozenSet[int]] = {}
+    by_hash: Dict[str, int] = {}
+    lsh = _DisjointLSH()
+    exact: List[Dict[str, object]] = []
+    near: List[Dict[str, object]] = []
+    bytes_in = bytes_exact = bytes_near = 0
+
+    def shingles_of(text: str, h: str) -> FrozenSet[int]:
+        if h not in shingle_cache:
+            shingle_cache[h] = shingles(text)
+        return shingle_cache[h]
+
+    # arquivos inteiros repetidos (todos os trechos idênticos)
+    file_hashes: Dict[str, List[str]] = {}
+    for c, (h, _) in zip(chunks, features):
+        file_hashes.setdefault(c.source, []).append(h)
+    files_by_content: Dict[Tuple[str, ...], List[str]] = {}
+    for source, hashes in file_hashes.items():
+        files_by_content.setdefault(tuple(hashes), []).append(source)
+    duplicate_files = [sources for sources in files_by_content.values() if len(sources) > 1]
+
+    kept_hashes: List[str] = []
+    kept_sigs: List[Tuple[int, ...]] = []
+    for c, (h, sig) in zip(chunks, features):
+        size = len(c.text.encode("utf-8"))
+        bytes_in += size
+        if h in by_hash:
+            bytes_exact += size
+            exact.append({"source": c.source, "section": c.section, "kept": kept[by_hash[h]].source})
+            continue
+        match: Optional[Tuple[int, float]] = None
+        for j in lsh.candidates(sig):
+            agree = sum(map(operator.eq, sig, kept_sigs[j])) / len(sig)
+            if agree < threshold - SIG_MARGIN:
+                continue
+            sim = jaccard(shingles_of(c.text, h), shingles_of(kept[j].text, kept_hashes[j]))
+            if sim >= threshold and (match is None or sim > match[1]):
+                match = (j, sim)
+        if match is not None:
+            bytes_near += size
+            near.append({"source": c.source, "section": c.section,
+                         "kept": kept[match[0]].source, "similarity": round(match[1], 3)})
+            continue
+        by_hash[h] = len(kept)
+        lsh.add(len(kept), sig)
+        kept.append(c)
+        kept_hashes.append(h)
+        kept_sigs.append(sig)
+
+    report: Dict[str, object] = {
+        "chunks_in": len(chunks),
+        "chunks_kept": len(kept),
+        "bytes_in": bytes_in,
+        "bytes_saved": bytes_exact + bytes_near,
+        "bytes_saved_exact": bytes_exact,
+        "bytes_saved_near": bytes_near,
+        "duplicate_files": duplicate_files,
+        "exact_duplicates": exact,
+        "near_duplicates": near,
+        "threshold": threshold,
+    }
+    return kept, report
+
+
+def format_report(report: Dict[str, object]) -> str:
+    lines = [
+        f"trechos: {report['chunks_in']} → {report['chunks_kept']}",
+        f"bytes economizados: {report['bytes_saved']:,} de {report['bytes_in']:,} "
+        f"(exatos {report['bytes_saved_exact']:,}; quase-duplicatas {report['bytes_saved_near']:,})",
+    ]
+    for sources in report["duplicate_files"]:  # type: ignore[union-attr]
+        lines.append("arquivo repetido: " + " = ".join(sources))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from knowledge.retrieval.chunking import chunk_file, iter_kb_files
+
+    _, rep = dedup_chunks([c for fp in iter_kb_files() for c in chunk_file(fp)])
+    print(format_report(rep))
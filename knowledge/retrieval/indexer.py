@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Indexação incremental da knowledge_base (manifesto + gerações)
+#
+# Curadores incluem textos em legislacao/, instrucoes_normativas/ e
+# notas_tecnicas/ com frequência; refazer fragmentação, deduplicação e
+# índice da base inteira a cada mudança custava ~3 s. Aqui:
+# - cada geração tem um manifesto: arquivo → tamanho, mtime_ns, sha1 do
+#   conteúdo e nº de trechos. Arquivo com o mesmo tamanho/mtime nem é lido;
+#   com o mesmo sha1 (só tocado ou renomeado) não é refragmentado;
+# - cache por conteúdo (files/<sha1>.pkl): trechos, hash e assinatura MinHash
+#   (dedup.py) e contagem de termos (BM25) de cada trecho. Só arquivos novos
+#   ou alterados são fragmentados e analisados; os removidos saem da geração;
+# - deduplicação e postings são remontadas a partir do cache (a
+#   deduplicação depende da ordem global e os ids dos trechos mudam), sem
+#   reler nem reanalisar o texto dos arquivos inalterados;
+# - cada atualização com mudanças grava uma geração completa em generations/<id>/
+#   (armazém, índice BM25, manifesto, relatório da deduplicação; o índice
+#   vetorial é gravado ali sob demanda) e só então troca o ponteiro CURRENT
+#   com os.replace. Leitores nunca veem geração parcial; sessões abertas
+#   passam para a nova na próxima verificação de get_kb_index.
+# Ficam as KEEP_GENERATIONS gerações mais recentes; entradas do cache que
+# nenhuma delas usa são apagadas.
+#
+# Layout (SYNAPSE_KB_INDEX_DIR, padrão .cache/kb_index):
+#   v<INDEX_VERSION>/CURRENT
+#   v<INDEX_VERSION>/generations/<id>/{store/, bm25.pkl, manifest.json, dedup_report.json}
+#   v<INDEX_VERSION>/files/<sha1>.pkl
+#
+# Uso: python -m knowledge.retrieval.indexer [--full]
+#      (também recalcula o mapa item de checklist → trechos, item_context.py)
+# =============================================================================
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from knowledge.retrieval.chunk_store import ChunkStore, write_store
+from knowledge.retrieval.chunking import KB_ROOT, KBChunk, chunk_text, iter_kb_files, kb_location
+from knowledge.retrieval.dedup import chunk_features, dedup_chunks, format_report
+from knowledge.retrieval.kb_index import INDEX_VERSION, KBIndex, analyze, kb_fingerprint, resolve_index_dir
+
+CURRENT_NAME = "CURRENT"
+GENERATIONS_DIRNAME = "generations"
+FILES_DIRNAME = "files"
+STORE_DIRNAME = "store"
+INDEX_NAME = "bm25.pkl"
+MANIFEST_NAME = "manifest.json"
+DEDUP_REPORT_NAME = "dedup_report.json"
+KEEP_GENERATIONS = 2
+
+
+def index_root(index_dir: Optional[Path] = None) -> Path:
+    return resolve_index_dir(index_dir) / f"v{INDEX_VERSION}"
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# =============================================================================
+# Gerações
+# =============================================================================
+def current_generation(index_dir: Optional[Path] = None) -> Optional[Path]:
+    """Diretório da geração apontada por CURRENT (None se não houver)."""
+    root = index_root(index_dir)
+    try:
+        name = (root / CURRENT_NAME).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    gen = root / GENERATIONS_DIRNAME / name
+    return gen if name and gen.is_dir() else None
+
+
+def load_generation(gen: Path) -> Optional[KBIndex]:
+    """Índice da geração ligado ao seu armazém (None se ausente ou inconsistente)."""
+    try:
+        with open(gen / INDEX_NAME, "rb") as f:
+            index = pickle.load(f)
+        if not isinstance(index, KBIndex):
+            return None
+        return index.attach(ChunkStore(gen / STORE_DIRNAME))
+    except Exception:
+        return None
+
+
+def load_current(index_dir: Optional[Path] = None) -> Optional[KBIndex]:
+    gen = current_generation(index_dir)
+    return load_generation(gen) if gen is not None else None
+
+
+def read_manifest(gen: Optional[Path]) -> Dict[str, Dict[str, object]]:
+    """Arquivos do manifesto da geração ({} se não houver)."""
+    if gen is None:
+        return {}
+    try:
+        return json.loads((gen / MANIFEST_NAME).read_text(encoding="utf-8")).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+# =============================================================================
+# Cache por conteúdo de arquivo
+# =============================================================================
+def _analyze_file(data: bytes) -> Dict[str, list]:
+    """Trechos (seção, texto), features da deduplicação e termos de cada trecho."""
+    chunks = chunk_text(data.decode("utf-8", errors="ignore"))
+    return {
+        "chunks": [(c.section, c.text) for c in chunks],
+        "features": [chunk_features(c.text) for c in chunks],
+        "terms": [dict(Counter(analyze(c.text))) for c in chunks],
+    }
+
+
+def _load_entry(files_dir: Path, sha1: str) -> Optional[Dict[str, list]]:
+    try:
+        with open(files_dir / f"{sha1}.pkl", "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _save_entry(files_dir: Path, sha1: str, entry: Dict[str, list]) -> None:
+    _atomic_write(files_dir / f"{sha1}.pkl", pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+# =============================================================================
+# Atualização
+# =============================================================================
+def update_index(kb_root: Path = KB_ROOT, index_dir: Optional[Path] = None,
+                 full: bool = False) -> Tuple[KBIndex, Dict[str, object]]:
+    """
+    Grava uma geração nova a partir da geração atual, refragmentando só os
+    arquivos novos ou alterados (full=True ignora manifesto e cache), e a
+    torna a atual. Sem mudanças (e com a mesma kb_fingerprint), devolve a
+    geração atual sem gravar nada ("unchanged" no resumo). Devolve o índice
+    e o resumo das mudanças.
+    """
+    t0 = time.perf_counter()
+    root = index_root(index_dir)
+    files_dir = root / FILES_DIRNAME
+    files_dir.mkdir(parents=True, exist_ok=True)
+    current = None if full else current_generation(index_dir)
+    previous = read_manifest(current)
+    fingerprint = kb_fingerprint(kb_root)
+
+    # 1) sha1 de cada arquivo (mesmo tamanho/mtime do manifesto: nem é lido)
+    files: List[Tuple[Path, str, str, os.stat_result, str, Optional[bytes]]] = []
+    added: List[str] = []
+    changed: List[str] = []
+    for fp in iter_kb_files(kb_root):
+        source, folder = kb_location(fp, kb_root)
+        st = fp.stat()
+        old = previous.get(source)
+        data: Optional[bytes] = None
+        if old and old.get("size") == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+            sha1 = str(old["sha1"])
+        else:
+            data = fp.read_bytes()
+            sha1 = hashlib.sha1(data).hexdigest()
+        if old is None:
+            added.append(source)
+        elif old.get("sha1") != sha1:
+            changed.append(source)
+        files.append((fp, source, folder, st, sha1, data))
+    removed = sorted(set(previous) - {f[1] for f in files})
+
+    # nada novo, alterado ou removido e a mesma assinatura: a geração atual continua valendo
+    if current is not None and not (added or changed or removed):
+        index = load_generation(current)
+        if index is not None and index.fingerprint == fingerprint:
+            return index, {
+                "added": [], "changed": [], "removed": [], "rechunked": 0,
+                "files": len(files), "chunks": len(index.lengths), "unchanged": True,
+                "seconds": round(time.perf_counter() - t0, 3),
+            }
+
+    # 2) trechos do cache por conteúdo; só arquivos sem entrada são fragmentados
+    manifest: Dict[str, Dict[str, object]] = {}
+    chunks: List[KBChunk] = []
+    features: List[Tuple[str, Tuple[int, ...]]] = []
+    terms: Dict[int, Dict[str, int]] = {}
+    rechunked = 0
+    for fp, source, folder, st, sha1, data in files:
+        entry = None if full else _load_entry(files_dir, sha1)
+        if entry is None:
+            if data is None:
+                data = fp.read_bytes()
+                sha1 = hashlib.sha1(data).hexdigest()
+            entry = _analyze_file(data)
+            _save_entry(files_dir, sha1, entry)
+            rechunked += 1
+        manifest[source] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": sha1,
+                            "chunks": len(entry["chunks"])}
+        for (section, text), feat, counts in zip(entry["chunks"], entry["features"], entry["terms"]):
+            chunk = KBChunk(source, folder, section, text)
+            terms[id(chunk)] = counts
+            chunks.append(chunk)
+            features.append(feat)
+
+    kept, report = dedup_chunks(chunks, features=features)
+
+    gen = root / GENERATIONS_DIRNAME / f"g{time.time_ns()}-{os.getpid()}"
+    write_store(kept, gen / STORE_DIRNAME, fingerprint)
+    index = KBIndex(ChunkStore(gen / STORE_DIRNAME), [terms[id(c)] for c in kept])
+    _atomic_write(gen / INDEX_NAME, pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+    (gen / DEDUP_REPORT_NAME).write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    changes: Dict[str, object] = {
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "rechunked": rechunked,
+        "files": len(manifest),
+        "chunks": len(kept),
+        "unchanged": False,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    _atomic_write(gen / MANIFEST_NAME, json.dumps(
+        {"version": INDEX_VERSION, "fingerprint": fingerprint, "files": manifest, "changes": changes},
+        ensure_ascii=False, indent=1).encode("utf-8"))
+    # a geração só passa a valer aqui
+    _atomic_write(root / CURRENT_NAME, gen.name.encode("utf-8"))
+    _collect_garbage(root, gen.name)
+    return index, changes
+
+
+def _collect_garbage(root: Path, current: str) -> None:
+    """Apaga gerações anteriores além de KEEP_GENERATIONS e o cache que nenhuma usa."""
+    gens_dir = root / GENERATIONS_DIRNAME
+    older = sorted(p.name for p in gens_dir.iterdir() if p.is_dir() and p.name < current)
+    keep = [current] + (older[-(KEEP_GENERATIONS - 1):] if KEEP_GENERATIONS > 1 else [])
+    for name in older:
+        if name not in keep:
+            # gerações em uso por outro processo seguem legíveis (mmap) onde o SO permite
+            shutil.rmtree(gens_dir / name, ignore_errors=True)
+    used: Set[str] = set()
+    for name in keep:
+        used.update(str(f.get("sha1")) for f in read_manifest(gens_dir / name).values())
+    for fp in (root / FILES_DIRNAME).glob("*.pkl"):
+        if fp.stem not in used:
+            try:
+                fp.unlink()
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Atualiza o índice da knowledge_base (incremental)")
+    ap.add_argument("--full", action="store_true", help="refaz tudo, sem manifesto nem cache")
+    args = ap.parse_args()
+
+    idx, summary = update_index(full=args.full)
+    print(f"{summary['files']} arquivos, {summary['chunks']} trechos, {len(idx.postings)} termos "
+          f"em {summary['seconds']:.2f}s → {current_generation()}")
+    print(f"novos: {len(summary['added'])}; alterados: {len(summary['changed'])}; "
+          f"removidos: {len(summary['removed'])}; refragmentados: {summary['rechunked']}")
+    for key in ("added", "changed", "removed"):
+        for source in summary[key]:  # type: ignore[union-attr]
+            print(f"  {key}: {source}")
+    print(format_report(json.loads((current_generation() / DEDUP_REPORT_NAME).read_text(encoding="utf-8"))))
+
+    # trechos por item de checklist da geração nova (item_context.py)
+    from knowledge.retrieval.item_context import precompute
+
+    print(f"mapa item → trechos: {len(precompute(index=idx))} checklist(s) calculado(s)")
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Trechos da knowledge_base pré-calculados por item de checklist
+#
+# Os itens dos checklists (knowledge/validators/*_checklist.yml) são poucos e
+# estáticos; buscar na base, a cada validação, o contexto de cada item é
+# retrabalho. Aqui, para cada checklist e item, ficam guardados os
+# PASSAGES_PER_ITEM trechos mais relevantes (BM25 sobre descrição, id e
+# termos do padrão rígido do item), já com texto e origem:
+# - o mapa fica em item_context.json, na geração atual do índice
+#   (indexer.py), marcado com a kb_fingerprint: geração nova com a mesma
+#   assinatura herda o mapa da anterior; base alterada → mapa refeito;
+# - cada checklist guarda o sha256 do YAML (checklist_registry): checklist
+#   alterado → só ele é refeito;
+# - na validação, item_passages() é uma consulta a dicionário do processo:
+#   usa só a geração do índice já carregada (nunca verifica a base, monta o
+#   índice ou calcula o mapa). Sem índice carregado ou sem pré-cálculo em
+#   dia, o semântico segue sem referências (só pack_context) e o índice/mapa
+#   é preparado numa thread à parte.
+#
+# Pré-cálculo offline: python -m knowledge.retrieval.item_context
+# =============================================================================
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from knowledge.retrieval.kb_index import KBIndex, get_kb_index, loaded_kb_index
+from knowledge.validators.checklist_registry import CompiledChecklist, checklist_item_id, get_checklist_registry
+
+MAP_VERSION = 1
+MAP_NAME = "item_context.json"
+PASSAGES_PER_ITEM = 3
+CHECKLIST_DIR = os.path.join("knowledge", "validators")
+
+Passage = Dict[str, Any]
+
+_CLASS_RX = re.compile(r"\[([^\]\\])[^\]]*\]")     # [cç] → c
+_CLASS_ESCAPE_RX = re.compile(r"\\[sSdDwWb][+*?]?")   # \s+ → espaço
+_LITERAL_ESCAPE_RX = re.compile(r"\\(.)")             # \. → .
+_REGEX_SYNTAX_RX = re.compile(r"\(\?[a-z]+\)|[()|?*+^${}]")
+
+
+def padrao_terms(padrao: str) -> str:
+    """Palavras do padrão rígido, sem a sintaxe de regex."""
+    s = _CLASS_ESCAPE_RX.sub(" ", _CLASS_RX.sub(r"\1", padrao or ""))
+    return " ".join(_REGEX_SYNTAX_RX.sub(" ", _LITERAL_ESCAPE_RX.sub(r"\1", s)).split())
+
+
+def item_query(artefato: str, item: Dict[str, Any]) -> str:
+    return " ".join([
+        artefato,
+        str(item.get("descricao") or ""),
+        str(item.get("id") or "").replace("_", " "),
+        padrao_terms(str(item.get("padrao") or item.get("pattern") or "")),
+    ])
+
+
+def checklist_slug(path: str) -> str:
+    """etp_checklist.yml → etp (mesmo slug de validator_engine.slug_from_artefato)."""
+    return os.path.basename(path).split("_checklist", 1)[0]
+
+
+def compute_checklist(index: KBIndex, slug: str, checklist: CompiledChecklist,
+                      per_item: int = PASSAGES_PER_ITEM) -> Dict[str, Any]:
+    """Trechos ranqueados de cada item do checklist."""
+    store = index.store
+    items: Dict[str, List[Passage]] = {}
+    for idx, item in enumerate(checklist.items):
+        if not isinstance(item, dict):
+            continue
+        ranked = index.search(item_query(slug.upper(), item), topk=per_item)
+        items[checklist_item_id(item, idx)] = [
+            {"source": store.source(i), "section": store.section(i), "text": store.text(i), "score": round(s, 3)}
+            for i, s in ranked
+        ]
+    return {"sha256": checklist.sha256, "items": items}
+
+
+# =============================================================================
+# Persistência (junto da geração do índice)
+# =============================================================================
+def _map_path(index: KBIndex) -> Path:
+    return index.store.store_dir.parent / MAP_NAME
+
+
+def _read_map(path: Path, fingerprint: str) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("version") == MAP_VERSION and data.get("fingerprint") == fingerprint:
+        return data
+    return None
+
+
+def _load_map(index: KBIndex) -> Dict[str, Any]:
+    """Mapa da geração do índice; se ela ainda não tem, o de outra geração com a mesma assinatura."""
+    here = _map_path(index)
+    data = _read_map(here, index.fingerprint)
+    if data is not None:
+        return data
+    try:
+        others = sorted((p for p in here.parent.parent.glob(f"*/{MAP_NAME}") if p != here), reverse=True)
+    except OSError:
+        others = []
+    for path in others:  # gerações mais recentes primeiro
+        data = _read_map(path, index.fingerprint)
+        if data is not None:
+            return data
+    return {"version": MAP_VERSION, "fingerprint": index.fingerprint, "checklists": {}}
+
+
+def _save_map(index: KBIndex, data: Dict[str, Any]) -> None:
+    path = _map_path(index)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def precompute(checklist_dir: str = CHECKLIST_DIR, index: Optional[KBIndex] = None) -> Dict[str, int]:
+    """Refaz o mapa dos checklists novos ou alterados. Devolve slug → nº de itens refeitos."""
+    index = index or get_kb_index()
+    registry = get_checklist_registry()
+    data = _load_map(index)
+    carried = not _map_path(index).exists()  # herdado de outra geração: grava nesta
+    updated: Dict[str, int] = {}
+    for path in registry.list_files(checklist_dir):
+        checklist = registry.get(path)
+        if checklist is None:
+            continue
+        slug = checklist_slug(path)
+        entry = data["checklists"].get(slug)
+        if entry is None or entry.get("sha256") != checklist.sha256:
+            data["checklists"][slug] = compute_checklist(index, slug, checklist)
+            updated[slug] = len(data["checklists"][slug]["items"])
+    if updated or carried:
+        _save_map(index, data)
+    return updated
+
+
+# =============================================================================
+# Consulta (caminho quente)
+# =============================================================================
+# sem mapa em dia, a consulta volta ao disco no máximo a cada MISS_RETRY segundos
+MISS_RETRY = 5.0
+
+_CACHE: Dict[str, Tuple[Tuple[str, str], Dict[str, List[Passage]], float]] = {}
+_LOCK = threading.Lock()
+_PRECOMPUTING: Dict[str, threading.Thread] = {}
+
+
+def _precompute_in_background(index: Optional[KBIndex]) -> None:
+    """
+    Refaz o mapa da geração fora do caminho da validação (uma thread por
+    assinatura). Sem índice, carrega-o (get_kb_index) na mesma thread.
+    """
+    key = index.fingerprint if index is not None else ""
+    running = _PRECOMPUTING.get(key)
+    if running is not None and running.is_alive():
+        return
+
+    def work() -> None:
+        try:
+            precompute(index=index)
+        except Exception:
+            pass  # fica sem referências; `python -m knowledge.retrieval.item_context` refaz
+
+    thread = threading.Thread(target=work, name="item-context-precompute", daemon=True)
+    _PRECOMPUTING[key] = thread
+    thread.start()
+
+
+def item_passages(slug: str, checklist: CompiledChecklist) -> Dict[str, List[Passage]]:
+    """
+    id do item → trechos da base, do mais ao menos relevante, da geração do
+    índice já carregada no processo. Sem índice carregado ou sem pré-cálculo
+    para esta geração/versão do checklist, devolve {} (o semântico segue sem
+    referências) e agenda o carregamento/cálculo em segundo plano.
+    """
+    index = loaded_kb_index()
+    if index is None:
+        _precompute_in_background(None)
+        return {}
+    key = (index.fingerprint, checklist.sha256)
+    hit = _CACHE.get(slug)
+    if hit is not None and hit[0] == key and (hit[1] or time.monotonic() - hit[2] < MISS_RETRY):
+        return hit[1]
+    with _LOCK:
+        entry = _load_map(index)["checklists"].get(slug)
+        items: Dict[str, List[Passage]] = {}
+        if entry is not None and entry.get("sha256") == checklist.sha256:
+            items = entry["items"]
+        else:
+            _precompute_in_background(index)
+        _CACHE[slug] = (key, items, time.monotonic())
+        return items
+
+
+def format_passages(passages: Dict[str, List[Passage]], item_ids: Sequence[str], max_chars: int) -> str:
+    """
+    Trechos dos itens até max_chars: primeiro o melhor de cada item, depois o
+    segundo, etc.; trecho repetido entre itens entra uma vez, trecho que não
+    cabe é pulado.
+    """
+    parts: List[str] = []
+    seen = set()
+    size = 0
+    depth = max((len(passages.get(i) or ()) for i in item_ids), default=0)
+    for rank in range(depth):
+        for item_id in item_ids:
+            ranked = passages.get(item_id) or ()
+            if rank >= len(ranked):
+                continue
+            p = ranked[rank]
+            ref = (p["source"], p["text"])
+            if ref in seen:
+                continue
+            label = f"[{p['source']}" + (f" – {p['section']}]" if p.get("section") else "]")
+            block = f"{label} (item {item_id})\n{p['text']}"
+            if size + len(block) + 2 > max_chars:
+                continue
+            seen.add(ref)
+            parts.append(block)
+            size += len(block) + 2
+    return "\n\n".join(parts)
+
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    done = precompute()
+    print(f"{len(done)} checklist(s) refeito(s) em {time.perf_counter() - t0:.2f}s: "
+          + (", ".join(f"{k} ({v} itens)" for k, v in sorted(done.items())) or "nenhum (mapa em dia)"))
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Índice invertido BM25 persistente da knowledge_base
+#
+# _gather_kb_snippets pegava os N primeiros arquivos por ordem alfabética
+# (relendo a pasta inteira a cada validação) e anexava arquivos inteiros
+# mesmo depois de estourar max_chars. Aqui:
+# - a base é fragmentada em trechos (chunking.py), sem duplicatas exatas
+#   nem quase-duplicatas (dedup.py), e indexada uma vez;
+# - termos sem acentos, minúsculos, sem stopwords e com um radicalizador
+#   leve de português (plural, gênero e sufixos derivacionais comuns);
+# - o índice fica em disco (.cache/kb_index) e é atualizado só quando algum
+#   arquivo da base muda (tamanho/mtime), refragmentando apenas os arquivos
+#   alterados (indexer.py); o texto dos trechos fica no armazém mmap
+#   (chunk_store.py), compartilhado entre processos;
+# - a consulta é o próprio documento do usuário: os termos mais
+#   discriminativos (tf × idf) viram a query BM25;
+# - gather_context devolve os melhores trechos dentro de um orçamento
+#   estrito de caracteres (trecho que não cabe é pulado, nunca cortado).
+#
+# Configuração: SYNAPSE_KB_INDEX_DIR (padrão: .cache/kb_index)
+# Atualização manual: python -m knowledge.retrieval.indexer [--full]
+# =============================================================================
+from __future__ import annotations
+
+import hashlib
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from knowledge.retrieval.chunk_store import ChunkStore, StoreError
+from knowledge.retrieval.chunking import KB_ROOT, KBChunk, iter_kb_files
+from knowledge.validators.text_normalizer import fold_accents
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_INDEX_DIR = REPO_ROOT / ".cache" / "kb_index"
+INDEX_VERSION = 4
+
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+# Termos da consulta (os de maior tf × idf do documento)
+MAX_QUERY_TERMS = 48
+CONTEXT_SEPARATOR = "\n\n---\n"
+CANDIDATES_PER_SLOT = 8
+# Intervalo mínimo entre verificações da base (stat de todos os arquivos)
+CHECK_INTERVAL = 5.0
+
+_WORD_RX = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles em entre era essa esse
+esta estao este eu foi for foram ha isso isto ja la lhe mais mas me mesmo muito na nas nao nem no nos
+o os ou para pela pelas pelo pelos por qual quando que quem se sem ser seu seus so sua suas tambem
+te tem ter um uma umas uns voce sao sera serao seja sejam deve devem podera poderao caso bem cada
+outro outra outros outras sobre apos art inciso paragrafo item alinea
+""".split())
+
+# Sufixos derivacionais (mais longos primeiro); radical mínimo de 4 letras
+_SUFFIXES = (
+    "amentos", "imentos", "amento", "imento", "idades", "idade", "mente", "acoes", "icoes",
+    "acao", "icao", "ucao", "adores", "edores", "idores", "ador", "edor", "idor", "antes",
+    "entes", "ante", "ente", "aveis", "iveis", "avel", "ivel", "ismo", "ista", "ivos", "ivas",
+    "ivo", "iva", "ando", "endo", "indo", "ar", "er", "ir",
+)
+
+
+@lru_cache(maxsize=65536)
+def stem_pt(word: str) -> str:
+    """Radicalizador leve (plural → sufixo derivacional → vogal temática)."""
+    w = word
+    if len(w) <= 3 or w.isdigit():
+        return w
+    # plural
+    if w.endswith(("oes", "aes")):
+        w = w[:-3] + "ao"
+    elif w.endswith(("ais", "eis")) and len(w) > 4:
+        w = w[:-2] + "l"
+    elif w.endswith("ns"):
+        w = w[:-2] + "m"
+    elif w.endswith("es") and len(w) > 5 and w[-3] in "rsz":
+        w = w[:-2]
+    elif w.endswith("s") and len(w) > 3 and w[-2] not in "su":
+        w = w[:-1]
+    for suf in _SUFFIXES:
+        if w.endswith(suf) and len(w) - len(suf) >= 4:
+            w = w[: -len(suf)]
+            break
+    if len(w) > 4 and w[-1] in "aoe":
+        w = w[:-1]
+    return w
+
+
+def analyze(text: str) -> List[str]:
+    """Termos indexáveis: sem acentos, minúsculos, sem stopwords, radicalizados."""
+    out: List[str] = []
+    for w in _WORD_RX.findall(fold_accents(text or "").lower()):
+        if len(w) < 2 or w in _STOPWORDS:
+            continue
+        out.append(stem_pt(w))
+    return out
+
+
+# =============================================================================
+# Índice
+# =============================================================================
+def kb_fingerprint(kb_root: Path = KB_ROOT) -> str:
+    """Assinatura da base (caminho, tamanho e mtime de cada arquivo)."""
+    h = hashlib.sha256()
+    for fp in iter_kb_files(kb_root):
+        st = fp.stat()
+        h.update(f"{fp.relative_to(kb_root).as_posix()}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class KBIndex:
+    """
+    Índice BM25 dos trechos: postings termo → (ids dos trechos, frequências).
+    Texto e metadados dos trechos ficam no armazém (chunk_store.ChunkStore);
+    o pickle guarda só postings e comprimentos.
+    """
+
+    def __init__(self, store: ChunkStore, term_counts: Optional[Sequence[Dict[str, int]]] = None) -> None:
+        """`term_counts`: Counter(analyze(texto)) de cada trecho, se já calculado."""
+        self.store = store
+        self.fingerprint = store.fingerprint
+        self.lengths = array("I")
+        postings: Dict[str, Dict[int, int]] = {}
+        for i in range(len(store)):
+            counts = term_counts[i] if term_counts is not None else Counter(analyze(store.text(i)))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, {})[i] = tf
+        self.postings: Dict[str, Tuple[array, array]] = {
+            term: (array("I", docs.keys()), array("H", (min(v, 65535) for v in docs.values())))
+            for term, docs in postings.items()
+        }
+        self._prepare()
+
+    def _prepare(self) -> None:
+        n = len(self.lengths)
+        self._avg_len = (sum(self.lengths) / n) if n else 0.0
+        self._idf = {
+            t: math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5)) for t, (ids, _) in self.postings.items()
+        }
+        self._norm = [
+            _BM25_K1 * (1 - _BM25_B + _BM25_B * length / (self._avg_len or 1.0)) for length in self.lengths
+        ]
+
+    def __getstate__(self) -> Dict[str, object]:
+        return {"fingerprint": self.fingerprint, "lengths": self.lengths, "postings": self.postings}
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self.store = None  # ligado por attach()
+        self._prepare()
+
+    def attach(self, store: ChunkStore) -> "KBIndex":
+        if store.fingerprint != self.fingerprint or len(store) != len(self.lengths):
+            raise StoreError("armazém e índice de gerações diferentes")
+        self.store = store
+        return self
+
+    def query_terms(self, text: str, max_terms: int = MAX_QUERY_TERMS) -> Dict[str, float]:
+        """Termos mais discriminativos do texto (tf × idf), com o peso normalizado de cada um."""
+        counts = Counter(t for t in analyze(text) if t in self._idf)
+        weighted = sorted(((tf * self._idf[t], t) for t, tf in counts.items()), reverse=True)[:max_terms]
+        top = weighted[0][0] if weighted else 1.0
+        return {t: w / top for w, t in weighted}
+
+    def search(self, text: str, topk: int = 10, folders: Optional[Iterable[str]] = None,
+               max_terms: int = MAX_QUERY_TERMS) -> List[Tuple[int, float]]:
+        """(id do trecho, score) dos melhores trechos para o texto, do mais relevante ao menos."""
+        allowed = set(folders) if folders else None
+        scores: Dict[int, float] = {}
+        for term, qw in self.query_terms(text, max_terms).items():
+            ids, tfs = self.postings[term]
+            idf = self._idf[term] * qw
+            norm = self._norm
+            for i, tf in zip(ids, tfs):
+                scores[i] = scores.get(i, 0.0) + idf * tf * (_BM25_K1 + 1) / (tf + norm[i])
+        if allowed is not None:
+            folder = self.store.folder
+            scores = {i: s for i, s in scores.items() if folder(i) in allowed}
+        key = lambda kv: (-kv[1], kv[0])  # noqa: E731
+        return heapq.nsmallest(topk, scores.items(), key=key) if topk else sorted(scores.items(), key=key)
+
+
+def chunk_label(chunk: KBChunk) -> str:
+    return f"[{chunk.source}" + (f" – {chunk.section}]" if chunk.section else "]")
+
+
+def select_context(store: ChunkStore, ranked: Iterable[Tuple[int, float]], max_chars: int,
+                   topk: int = 10) -> Tuple[str, List[str]]:
+    """
+    Trechos ranqueados (com rótulo de origem) até max_chars no total, separador
+    incluído. Devolve o contexto e os arquivos usados (ordem de relevância).
+    """
+    parts: List[str] = []
+    used: List[str] = []
+    size = 0
+    for i, _ in ranked:
+        if len(parts) >= topk:
+            break
+        chunk = store[i]
+        block = f"{chunk_label(chunk)}\n{chunk.text}"
+        cost = len(block) + (len(CONTEXT_SEPARATOR) if parts else 0)
+        if size + cost > max_chars:
+            continue
+        parts.append(block)
+        size += cost
+        if chunk.source not in used:
+            used.append(chunk.source)
+    return CONTEXT_SEPARATOR.join(parts), used
+
+
+def gather_context(index: KBIndex, text: str, max_chars: int, topk: int = 10,
+                   folders: Optional[Iterable[str]] = None) -> Tuple[str, List[str]]:
+    """Melhores trechos para o texto dentro de max_chars (ver select_context)."""
+    # candidatos de sobra para os trechos que não cabem no orçamento
+    ranked = index.search(text, topk=topk * CANDIDATES_PER_SLOT, folders=folders)
+    return select_context(index.store, ranked, max_chars, topk)
+
+
+# =============================================================================
+# Persistência
+# =============================================================================
+def resolve_index_dir(index_dir: Optional[Path]) -> Path:
+    return Path(index_dir or os.getenv("SYNAPSE_KB_INDEX_DIR") or DEFAULT_INDEX_DIR)
+
+
+class _Slot:
+    """Índice carregado de um par (kb_root, index_dir) e a trava de quem o verifica."""
+
+    __slots__ = ("index", "checked_at", "lock")
+
+    def __init__(self) -> None:
+        self.index: Optional[KBIndex] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+_SLOTS: Dict[Tuple[Path, Path], _Slot] = {}
+_SLOTS_LOCK = threading.Lock()
+
+
+def _slot(kb_root: Path, index_dir: Optional[Path]) -> _Slot:
+    key = (Path(kb_root).resolve(), resolve_index_dir(index_dir).resolve())
+    with _SLOTS_LOCK:
+        slot = _SLOTS.get(key)
+        if slot is None:
+            slot = _SLOTS[key] = _Slot()
+        return slot
+
+
+def get_kb_index(kb_root: Path = KB_ROOT, index_dir: Optional[Path] = None) -> KBIndex:
+    """
+    Índice do processo para (kb_root, index_dir). A base é reverificada no
+    máximo a cada CHECK_INTERVAL segundos; se mudou, usa a geração atual em
+    disco (outro processo pode já tê-la gravado) ou grava uma nova,
+    incrementalmente (indexer.py). Uma thread por vez verifica/atualiza cada
+    par, fora da trava global; as demais seguem com a geração anterior e só
+    esperam quando ainda não há nenhuma.
+    """
+    from knowledge.retrieval.indexer import load_current, update_index
+
+    slot = _slot(kb_root, index_dir)
+    index = slot.index
+    if index is not None and time.monotonic() - slot.checked_at < CHECK_INTERVAL:
+        return index
+    # outra thread verificando: espera só se ainda não há geração carregada
+    if not slot.lock.acquire(blocking=index is None):
+        return index
+    try:
+        if slot.index is not None and time.monotonic() - slot.checked_at < CHECK_INTERVAL:
+            return slot.index
+        fingerprint = kb_fingerprint(kb_root)
+        if slot.index is None or slot.index.fingerprint != fingerprint:
+            index = load_current(index_dir)
+            if index is None or index.fingerprint != fingerprint:
+                index, _ = update_index(kb_root, index_dir)
+            slot.index = index
+        slot.checked_at = time.monotonic()
+        return slot.index
+    finally:
+        slot.lock.release()
+
+
+def loaded_kb_index(kb_root: Path = KB_ROOT, index_dir: Optional[Path] = None) -> Optional[KBIndex]:
+    """Geração já carregada no processo para (kb_root, index_dir), sem verificar a base (None se não há)."""
+    return _slot(kb_root, index_dir).index
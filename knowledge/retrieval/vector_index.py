@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Recuperação vetorial local (NumPy, sem serviço de embeddings)
+#
+# Os hosts de validação não podem chamar uma API de embeddings. Alternativa
+# local ao BM25 (kb_index.py), sobre o mesmo armazém de trechos:
+# - cada trecho vira um vetor TF-IDF com feature hashing assinado (termos do
+#   mesmo analisador do BM25 → `dim` posições, sinal pelo hash para que as
+#   colisões se cancelem em média), tf sublinear e norma L2 = 1;
+# - a matriz (trechos × dim, float32) é gravada como .npy na geração do
+#   armazém (indexer.py) e aberta com np.load(mmap_mode="r"), compartilhada
+#   entre processos; uma geração nova da base refaz a matriz no primeiro uso;
+# - uma consulta é um produto matriz-vetor; várias consultas (lote de
+#   documentos) são um único produto matriz-matriz (search_batch).
+# Similaridade de cosseno; sem termos em comum o score é ~0 e o trecho não
+# entra no resultado.
+#
+# Configuração: SYNAPSE_KB_VECTOR_DIM (padrão: 2048; muda o arquivo do índice)
+# Medição de latência e recall: python -m benchmarks.retrieval_eval
+# =============================================================================
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from knowledge.retrieval.chunk_store import ChunkStore
+from knowledge.retrieval.chunking import KB_ROOT
+from knowledge.retrieval.kb_index import (
+    CANDIDATES_PER_SLOT, analyze, get_kb_index, select_context,
+)
+
+VECTOR_VERSION = 1
+DEFAULT_DIM = 2048
+
+
+def _dim() -> int:
+    try:
+        return max(64, int(os.getenv("SYNAPSE_KB_VECTOR_DIM") or DEFAULT_DIM))
+    except ValueError:
+        return DEFAULT_DIM
+
+
+@lru_cache(maxsize=131072)
+def _feature(term: str, dim: int) -> Tuple[int, float]:
+    """Posição e sinal do termo (hash estável entre processos)."""
+    h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, (1.0 if (h >> 63) & 1 else -1.0)
+
+
+def hashed_tf(text: str, dim: int) -> Dict[int, float]:
+    """Posição → tf sublinear assinado (1 + log tf) do texto."""
+    row: Dict[int, float] = {}
+    for term, tf in Counter(analyze(text)).items():
+        j, sign = _feature(term, dim)
+        row[j] = row.get(j, 0.0) + sign * (1.0 + math.log(tf))
+    return row
+
+
+class VectorIndex:
+    """Matriz TF-IDF hasheada dos trechos do armazém (linhas com norma 1)."""
+
+    def __init__(self, store: ChunkStore, matrix: "np.ndarray", idf: "np.ndarray") -> None:
+        self.store = store
+        self.fingerprint = store.fingerprint
+        self.matrix = matrix
+        self.idf = idf
+        self.dim = int(matrix.shape[1])
+        self._folder_ids = np.fromiter((store.folders.index(store.folder(i)) for i in range(len(store))),
+                                       dtype=np.int32, count=len(store))
+
+    # ---------------------------------------------------------------- build
+    @classmethod
+    def build(cls, store: ChunkStore, dim: Optional[int] = None) -> "VectorIndex":
+        if np is None:
+            raise RuntimeError("numpy não instalado (necessário para o índice vetorial)")
+        dim = dim or _dim()
+        n = len(store)
+        rows = [hashed_tf(store.text(i), dim) for i in range(n)]
+        df = np.zeros(dim, dtype=np.float64)
+        for row in rows:
+            if row:
+                df[np.fromiter(row.keys(), dtype=np.int64, count=len(row))] += 1.0
+        idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        matrix = np.zeros((n, dim), dtype=np.float32)
+        for i, row in enumerate(rows):
+            if row:
+                cols = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+                matrix[i, cols] = np.fromiter(row.values(), dtype=np.float32, count=len(row)) * idf[cols]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return cls(store, matrix, idf)
+
+    # --------------------------------------------------------------- consulta
+    def encode(self, texts: Sequence[str]) -> "np.ndarray":
+        """Vetores das consultas (len(texts) × dim), mesmo esquema dos trechos."""
+        q = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for r, text in enumerate(texts):
+            row = hashed_tf(text, self.dim)
+            if row:
+                cols = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+                q[r, cols] = np.fromiter(row.values(), dtype=np.float32, count=len(row)) * self.idf[cols]
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        np.divide(q, norms, out=q, where=norms > 0)
+        return q
+
+    def search_batch(self, texts: Sequence[str], topk: int = 10,
+                     folders: Optional[Iterable[str]] = None) -> List[List[Tuple[int, float]]]:
+        """Top-k (id, cosseno) de cada texto, com um único produto de matrizes."""
+        if not texts or not len(self.store):
+            return [[] for _ in texts]
+        scores = self.encode(texts) @ self.matrix.T  # (consultas × trechos)
+        if folders:
+            allowed = {self.store.folders.index(f) for f in folders if f in self.store.folders}
+            scores[:, ~np.isin(self._folder_ids, list(allowed))] = -np.inf
+        n = scores.shape[1]
+        k = min(topk or n, n)
+        out: List[List[Tuple[int, float]]] = []
+        for row in scores:
+            idx = np.argpartition(-row, k - 1)[:k] if k < n else np.arange(n)
+            idx = idx[np.lexsort((idx, -row[idx]))]
+            out.append([(int(i), float(row[i])) for i in idx if row[i] > 0])
+        return out
+
+    def search(self, text: str, topk: int = 10, folders: Optional[Iterable[str]] = None) -> List[Tuple[int, float]]:
+        return self.search_batch([text], topk, folders)[0]
+
+
+def gather_contexts(index: VectorIndex, texts: Sequence[str], max_chars: int, topk: int = 10,
+                    folders: Optional[Iterable[str]] = None) -> List[Tuple[str, List[str]]]:
+    """gather_context para vários documentos de uma vez (uma busca em lote)."""
+    ranked = index.search_batch(texts, topk * CANDIDATES_PER_SLOT, folders)
+    return [select_context(index.store, r, max_chars, topk) for r in ranked]
+
+
+# =============================================================================
+# Persistência
+# =============================================================================
+def _paths(base: Path, dim: int) -> Tuple[Path, Path, Path]:
+    stem = f"vectors_v{VECTOR_VERSION}_d{dim}"
+    return base / f"{stem}.npy", base / f"{stem}.idf.npy", base / f"{stem}.meta.json"
+
+
+def _generation_dir(store: ChunkStore) -> Path:
+    """Diretório da geração do armazém (indexer.py): o índice vetorial fica junto."""
+    return store.store_dir.parent
+
+
+def save_vector_index(index: VectorIndex, base: Optional[Path] = None) -> Path:
+    matrix_path, idf_path, meta_path = _paths(base or _generation_dir(index.store), index.dim)
+    matrix_path.parent.mkdir(parents=True, exist_ok=True)
+    for path, arr in ((matrix_path, index.matrix), (idf_path, index.idf)):
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(arr))
+        os.replace(tmp, path)
+    # meta por último: só vale se matriz e idf já estão no lugar
+    meta = {"version": VECTOR_VERSION, "dim": index.dim, "fingerprint": index.fingerprint,
+            "count": int(index.matrix.shape[0])}
+    tmp = meta_path.with_name(f".{meta_path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, meta_path)
+    return matrix_path
+
+
+def load_vector_index(store: ChunkStore, base: Optional[Path] = None,
+                      dim: Optional[int] = None) -> Optional[VectorIndex]:
+    """Índice em disco (matriz em mmap) se for da mesma geração do armazém."""
+    if np is None:
+        return None
+    matrix_path, idf_path, meta_path = _paths(base or _generation_dir(store), dim or _dim())
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("fingerprint") != store.fingerprint or meta.get("count") != len(store):
+            return None
+        matrix = np.load(matrix_path, mmap_mode="r")
+        idf = np.load(idf_path)
+    except Exception:
+        return None
+    if matrix.shape != (len(store), meta["dim"]):
+        return None
+    return VectorIndex(store, matrix, idf)
+
+
+_VECTOR: Optional[VectorIndex] = None
+_VECTOR_LOCK = threading.Lock()
+
+
+def get_vector_index(kb_root: Path = KB_ROOT, index_dir: Optional[Path] = None) -> VectorIndex:
+    """Índice vetorial do processo, sobre o armazém atual do BM25 (refeito se a base mudou)."""
+    global _VECTOR
+    store = get_kb_index(kb_root, index_dir).store
+    with _VECTOR_LOCK:
+        if _VECTOR is not None and _VECTOR.store is store:
+            return _VECTOR
+        index = load_vector_index(store)
+        if index is None:
+            index = VectorIndex.build(store)
+            save_vector_index(index)
+        _VECTOR = index
+        return index
+
+
+if __name__ == "__main__":
+    import time
+
+    t0 = time.perf_counter()
+    vi = VectorIndex.build(get_kb_index().store)
+    path = save_vector_index(vi)
+    print(f"{vi.matrix.shape[0]} × {vi.dim} em {time.perf_counter() - t0:.2f}s → {path}")
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Avaliação semântica em shards concorrentes (AsyncOpenAI)
+#
+# Com o checklist inteiro numa única chamada (max_tokens=2200), checklists
+# longos estouravam o limite de saída: o JSON vinha cortado, o parse falhava
+# e o score caía para 0 sem aviso. Aqui:
+# - o checklist é dividido em shards cujo JSON de resposta estimado cabe no
+#   orçamento de saída (max_tokens, com folga);
+# - os shards rodam em paralelo sob um semáforo (AsyncOpenAI; sem ele, o
+#   client síncrono em threads), e o tempo total acompanha o shard mais lento;
+#   prazo, retry e circuit breaker de cada chamada ficam em llm_call;
+#   evaluate_checklist roda no event loop do processo (llm_pool), com um
+#   AsyncOpenAI compartilhado: as conexões abertas servem às próximas validações;
+# - resposta cortada (finish_reason="length") ou JSON inválido divide o shard
+#   ao meio e tenta de novo, até um item por chamada; demais falhas
+#   (autenticação, circuito aberto, rede, prazo) não dividem e, como o item
+#   que nem sozinho vem válido, sobem em SemanticEvaluationError com os
+#   vereditos já obtidos;
+# - o resultado é remontado na ordem do checklist, um veredito por id;
+# - cada shard passa pelo semantic_cache (mesma chave de cached_chat_json);
+# - em streaming (stream_checklist / on_item), cada veredito é entregue assim
+#   que o seu objeto JSON fecha (json_stream), sem esperar o fim da resposta;
+# - stream_checklists avalia vários checklists (artefatos de um mesmo
+#   documento) em paralelo, com os vereditos marcados pela chave de cada um.
+#
+# Configuração: SYNAPSE_SEMANTIC_CONCURRENCY (padrão: 4 chamadas simultâneas)
+# =============================================================================
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from knowledge.validators.checklist_registry import checklist_item_id
+from knowledge.validators.context_packer import estimate_tokens
+from knowledge.validators.json_stream import JsonItemStream
+from knowledge.validators.llm_call import acall_chat, call_chat
+from knowledge.validators.llm_pool import get_async_llm_client, run_sync
+from knowledge.validators.semantic_cache import get_semantic_cache, has_items, make_key
+
+DEFAULT_CONCURRENCY = 4
+
+# Estimativa do JSON de saída por item: chaves + nota + justificativa curta +
+# faltantes, mais a descrição ecoada
+_ITEM_BASE_TOKENS = 160
+# Fração de max_tokens usada no planejamento (folga para respostas prolixas)
+_BUDGET_FRACTION = 0.8
+
+MessagesBuilder = Callable[[List[Dict[str, Any]]], List[Dict[str, str]]]
+ItemCallback = Callable[[Dict[str, Any]], None]
+
+
+class TruncatedResponse(Exception):
+    """Resposta cortada pelo limite de tokens de saída (`partial`: itens já concluídos)."""
+
+    def __init__(self, message: str, partial: Optional[List[Dict[str, Any]]] = None) -> None:
+        super().__init__(message)
+        self.partial = partial or []
+
+
+class SemanticEvaluationError(RuntimeError):
+    """
+    Avaliação incompleta: `partial` traz os vereditos obtidos (ordem do
+    checklist), `errors` as exceções de origem e, em stream_checklists,
+    `failed` as chaves dos checklists afetados ({chave: mensagem}).
+    """
+
+    def __init__(
+        self,
+        message: str,
+        partial: Optional[List[Dict[str, Any]]] = None,
+        errors: Optional[List[BaseException]] = None,
+        failed: Optional[Dict[str, str]] = None,
+    ) -> None:
+        super().__init__(message)
+        self.partial = partial or []
+        self.errors = errors or []
+        self.failed = failed or {}
+
+
+def _describe(exc: BaseException) -> str:
+    return str(exc) if isinstance(exc, SemanticEvaluationError) else f"{type(exc).__name__}: {exc}"
+
+
+async def _gather_verdicts(aws: Sequence[Any]) -> Tuple[List[List[Dict[str, Any]]], List[BaseException]]:
+    """Roda as corrotinas até o fim; separa vereditos (inclusive parciais) de erros."""
+    results: List[List[Dict[str, Any]]] = []
+    errors: List[BaseException] = []
+    for res in await asyncio.gather(*aws, return_exceptions=True):
+        if isinstance(res, SemanticEvaluationError):
+            results.append(res.partial)
+            errors.extend(res.errors or [res])
+        elif isinstance(res, Exception):
+            errors.append(res)
+        elif isinstance(res, BaseException):
+            raise res  # cancelamento/interrupção não vira veredito parcial
+        else:
+            results.append(res)
+    return results, errors
+
+
+# =============================================================================
+# Planejamento dos shards
+# =============================================================================
+def estimate_output_tokens(item: Dict[str, Any]) -> int:
+    return _ITEM_BASE_TOKENS + estimate_tokens(str(item.get("descricao", "")))
+
+
+def plan_shards(itens: Sequence[Dict[str, Any]], max_tokens: int) -> List[List[Dict[str, Any]]]:
+    """Agrupa itens consecutivos enquanto a saída estimada couber no orçamento."""
+    budget = max(int(max_tokens * _BUDGET_FRACTION), 1)
+    shards: List[List[Dict[str, Any]]] = []
+    used = 0
+    for it in itens:
+        cost = estimate_output_tokens(it)
+        if not shards or used + cost > budget:
+            shards.append([])
+            used = 0
+        shards[-1].append(it)
+        used += cost
+    return shards
+
+
+def merge_shards(itens: Sequence[Dict[str, Any]], results: Sequence[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Um veredito por id, na ordem do checklist (primeira resposta vence)."""
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for data in results:
+        for r in data or []:
+            if isinstance(r, dict):
+                by_id.setdefault(str(r.get("id")), r)
+    ids = [checklist_item_id(it, idx) for idx, it in enumerate(itens)]
+    return [by_id[item_id] for item_id in ids if item_id in by_id]
+
+
+def _with_ids(itens: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Itens sem id recebem o de checklist_item_id (posição no checklist), como no engine."""
+    return [it if it.get("id") else dict(it, id=checklist_item_id(it, idx)) for idx, it in enumerate(itens)]
+
+
+def _concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("SYNAPSE_SEMANTIC_CONCURRENCY") or DEFAULT_CONCURRENCY))
+    except ValueError:
+        return DEFAULT_CONCURRENCY
+
+
+# =============================================================================
+# Execução
+# =============================================================================
+async def _evaluate(
+    client: Any,
+    itens: List[Dict[str, Any]],
+    build_messages: MessagesBuilder,
+    parse: Callable[[str], Any],
+    model: str,
+    max_tokens: int,
+    params: Dict[str, Any],
+    concurrency: int,
+    on_item: Optional[ItemCallback] = None,
+) -> List[Dict[str, Any]]:
+    aclient = get_async_llm_client(client)  # compartilhado no event loop (llm_pool)
+    sem = asyncio.Semaphore(concurrency)
+    cache = get_semantic_cache()
+    emitted: Set[str] = set()
+    emit_lock = threading.Lock()  # consume() pode rodar em threads (client síncrono)
+
+    def emit(data: Any) -> None:
+        if on_item is None:
+            return
+        for r in data if isinstance(data, list) else []:
+            if not isinstance(r, dict):
+                continue
+            with emit_lock:
+                if str(r.get("id")) in emitted:
+                    continue
+                emitted.add(str(r.get("id")))
+            on_item(r)
+
+    def finish(content: str, finish_reason: Optional[str], partial: List[Dict[str, Any]]) -> Any:
+        if finish_reason == "length":
+            raise TruncatedResponse(f"max_tokens={max_tokens}", partial)
+        return parse(content)
+
+    async def call(messages: List[Dict[str, str]]) -> Any:
+        kwargs = dict(params, max_tokens=max_tokens)
+        async with sem:
+            if on_item is None:
+                if aclient is not None:
+                    resp = await acall_chat(aclient, model=model, messages=messages, **kwargs)
+                else:
+                    resp = await asyncio.to_thread(call_chat, client, model=model, messages=messages, **kwargs)
+                choice = resp.choices[0]
+                return finish(choice.message.content or "", getattr(choice, "finish_reason", None), [])
+
+            # stream=True: cada item sai assim que o seu objeto JSON fecha
+            parser = JsonItemStream()
+            partial: List[Dict[str, Any]] = []
+            reason: List[Optional[str]] = [None]
+
+            def consume(chunk: Any) -> None:
+                if not getattr(chunk, "choices", None):
+                    return
+                choice = chunk.choices[0]
+                reason[0] = getattr(choice, "finish_reason", None) or reason[0]
+                delta = getattr(getattr(choice, "delta", None), "content", None)
+                got = [obj for _, obj in parser.feed(delta or "") if isinstance(obj, dict)]
+                partial.extend(got)
+                emit(got)
+
+            if aclient is not None:
+                stream = await acall_chat(aclient, model=model, messages=messages, stream=True, **kwargs)
+                async for chunk in stream:
+                    consume(chunk)
+            else:
+                def drain() -> None:
+                    for chunk in call_chat(client, model=model, messages=messages, stream=True, **kwargs):
+                        consume(chunk)
+
+                await asyncio.to_thread(drain)
+            return finish(parser.text, reason[0], partial)
+
+    async def shard(part: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # montar o prompt (pack_context) é CPU: fora do event loop, que atende às chamadas
+        messages = await asyncio.to_thread(build_messages, part)
+        key = make_key("chat.completions", "1", model, messages, dict(params, max_tokens=max_tokens))
+        cached = cache.get(key)
+        if cached is not None:
+            emit(cached)
+            return cached
+        try:
+            data = await call(messages)
+        except (TruncatedResponse, ValueError) as exc:
+            # cortada/JSON inválido: mantém os itens concluídos e divide o restante
+            done = exc.partial if isinstance(exc, TruncatedResponse) else []
+            ids = {str(r.get("id")) for r in done}
+            rest = [it for it in part if str(it["id"]) not in ids]
+            if not rest:
+                return done
+            if len(part) == 1:
+                raise SemanticEvaluationError(_describe(exc), done, [exc])
+            if len(rest) == 1:
+                subs = [shard(rest)]
+            else:
+                half = len(rest) // 2
+                subs = [shard(rest[:half]), shard(rest[half:])]
+            results, errors = await _gather_verdicts(subs)
+            merged = done + [r for data in results for r in data]
+            if errors:
+                raise SemanticEvaluationError(_describe(errors[0]), merged, errors)
+            return merged
+        if has_items(data):
+            cache.put(key, data)
+        data = data if isinstance(data, list) else []
+        emit(data)
+        return data
+
+    # falhas de um shard não descartam os demais: vereditos parciais seguem no erro
+    results, errors = await _gather_verdicts([shard(p) for p in plan_shards(itens, max_tokens)])
+    merged = merge_shards(itens, results)
+    if errors:
+        raise SemanticEvaluationError(
+            f"{len(itens) - len(merged)} de {len(itens)} itens sem veredito ({_describe(errors[0])})",
+            merged, errors)
+    return merged
+
+
+async def aevaluate_checklist(
+    client: Any,
+    itens: List[Dict[str, Any]],
+    build_messages: MessagesBuilder,
+    parse: Callable[[str], Any],
+    *,
+    model: str,
+    max_tokens: int,
+    concurrency: Optional[int] = None,
+    on_item: Optional[ItemCallback] = None,
+    **params: Any,
+) -> List[Dict[str, Any]]:
+    """evaluate_checklist para quem já está num event loop (ex.: lote com vários documentos)."""
+    if not itens:
+        return []
+    return await _evaluate(client, _with_ids(itens), build_messages, parse, model, max_tokens, params,
+                           concurrency or _concurrency(), on_item)
+
+
+def evaluate_checklist(
+    client: Any,
+    itens: List[Dict[str, Any]],
+    build_messages: MessagesBuilder,
+    parse: Callable[[str], Any],
+    *,
+    model: str,
+    max_tokens: int,
+    concurrency: Optional[int] = None,
+    on_item: Optional[ItemCallback] = None,
+    **params: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Avalia o checklist em shards concorrentes e devolve a lista de vereditos
+    (ordem do checklist). `build_messages(itens)` monta as mensagens de um
+    shard; `parse(conteúdo)` devolve a lista de itens ou levanta ValueError.
+    Itens sem veredito levantam SemanticEvaluationError (com os obtidos).
+    Com `on_item`, as chamadas usam stream=True e cada veredito é entregue
+    assim que chega (a partir de outra thread/do event loop).
+    """
+    if not itens:
+        return []
+    # no event loop do processo (llm_pool): o AsyncOpenAI e as conexões
+    # abertas ficam para as próximas validações, de qualquer sessão
+    return run_sync(aevaluate_checklist(client, itens, build_messages, parse, model=model, max_tokens=max_tokens,
+                                        concurrency=concurrency, on_item=on_item, **params))
+
+
+def stream_checklist(
+    client: Any,
+    itens: List[Dict[str, Any]],
+    build_messages: MessagesBuilder,
+    parse: Callable[[str], Any],
+    *,
+    model: str,
+    max_tokens: int,
+    concurrency: Optional[int] = None,
+    **params: Any,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Gerador com os vereditos na ordem de chegada, na thread de quem itera
+    (adequado ao Streamlit, que só desenha a partir da thread do script).
+    Itens de shards em cache saem de imediato.
+    """
+    for _, r in stream_checklists(client, [("", itens, build_messages)], parse, model=model,
+                                  max_tokens=max_tokens, concurrency=concurrency, **params):
+        yield r
+
+
+def stream_checklists(
+    client: Any,
+    jobs: Sequence[Tuple[str, List[Dict[str, Any]], MessagesBuilder]],
+    parse: Callable[[str], Any],
+    *,
+    model: str,
+    max_tokens: int,
+    concurrency: Optional[int] = None,
+    **params: Any,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    stream_checklist de vários checklists ao mesmo tempo (ex.: os artefatos de
+    um mesmo documento): `jobs` traz (chave, itens, build_messages) e o gerador
+    devolve (chave, veredito) na ordem de chegada. Cada checklist tem o seu
+    limite de `concurrency`; a falha de um não interrompe os demais e sobe
+    ao fim como SemanticEvaluationError, com `failed` = {chave: mensagem}.
+    """
+    done = object()
+    q: "queue.Queue[Any]" = queue.Queue()
+    jobs = [(key, _with_ids(itens), build_messages) for key, itens, build_messages in jobs]
+    wanted = {key: {str(it["id"]) for it in itens} for key, itens, _ in jobs}
+
+    async def run_all() -> List[Any]:
+        return await asyncio.gather(*(
+            aevaluate_checklist(client, itens, build_messages, parse, model=model, max_tokens=max_tokens,
+                                concurrency=concurrency, on_item=lambda r, key=key: q.put((key, r)), **params)
+            for key, itens, build_messages in jobs
+        ), return_exceptions=True)
+
+    def worker() -> None:
+        try:
+            for (key, _, _), res in zip(jobs, run_sync(run_all())):
+                if isinstance(res, BaseException):
+                    q.put((key, res))
+        except BaseException as exc:
+            q.put((None, exc))
+        finally:
+            q.put(done)
+
+    threading.Thread(target=worker, daemon=True).start()
+    errors: List[Tuple[Optional[str], BaseException]] = []
+    while True:
+        r = q.get()
+        if r is done:
+            break
+        key, item = r
+        if isinstance(item, BaseException):
+            errors.append((key, item))
+            continue
+        if str(item.get("id")) in wanted.get(key, ()):
+            yield key, item
+    for key, exc in errors:
+        if not isinstance(exc, Exception):
+            raise exc
+    if errors:
+        failed = {key: _describe(exc) for key, exc in errors if key is not None}
+        if len(errors) > len(failed):  # o próprio laço falhou: todos os checklists afetados
+            failed = {key: _describe(errors[-1][1]) for key, _, _ in jobs}
+        raise SemanticEvaluationError(
+            _describe(errors[0][1]), errors=[exc for _, exc in errors], failed=failed)
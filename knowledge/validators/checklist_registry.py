@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Registro de Checklists (cache de processo)
+#
+# Mantém, por processo, os checklists YAML (knowledge/validators/*_checklist*.yml)
+# já interpretados e com as regex do rígido pré-compiladas:
+# - cada arquivo é lido/parseado uma única vez;
+# - recarga apenas quando o mtime muda E o hash do conteúdo é diferente;
+# - padrão tolerante e variante sem acentos guardados como re.Pattern,
+#   evitando o cache interno do `re` (512 entradas) nas reruns do Streamlit.
+# =============================================================================
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+# YAML
+try:
+    import yaml  # pyyaml
+except Exception:
+    yaml = None
+
+from knowledge.validators.text_normalizer import fold_accents
+
+RIGID_FLAGS = re.IGNORECASE | re.DOTALL
+CHECKLIST_GLOB = "*_checklist*.yml"
+
+
+# =============================================================================
+# Estruturas compiladas
+# =============================================================================
+@dataclass(frozen=True)
+class CompiledItem:
+    """Item do checklist com as regex do rígido prontas para uso."""
+    id: str
+    descricao: str
+    obrigatorio: bool
+    padrao: str                          # padrão bruto do YAML ("" se ausente)
+    pattern: str                         # padrão tolerante (build_tolerant_pattern)
+    rx: Optional[Pattern]                # sobre o texto normalizado
+    rx_no_accents: Optional[Pattern]     # sobre o texto sem acentos (minúsculo)
+    regex_error: bool                    # YAML com regex malformada → contains simples
+    literal: str                         # fallback contains (texto normalizado, minúsculo)
+    literal_no_accents: str              # fallback contains (texto sem acentos)
+    tokens: Tuple[str, ...]              # heurística quando não há padrão
+
+
+@dataclass(frozen=True)
+class CompiledChecklist:
+    path: str
+    mtime_ns: int
+    size: int
+    sha256: str
+    items: Tuple[Dict[str, Any], ...]    # itens como vieram do YAML
+    compiled: Tuple[CompiledItem, ...]
+
+
+def checklist_item_id(item: Dict[str, Any], idx: int) -> str:
+    """Id do item (posição no checklist, "item_{idx}", quando o YAML não traz)."""
+    return str(item.get("id") or f"item_{idx}")
+
+
+def extract_items(data: Any) -> List[Dict[str, Any]]:
+    """Aceita "items", "itens" ou lista raiz."""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        if "items" in data:
+            return data.get("items") or []
+        if "itens" in data:
+            return data.get("itens") or []
+    return []
+
+
+def _compile_item(item: Dict[str, Any]) -> CompiledItem:
+    # import tardio: o engine importa este módulo
+    from knowledge.validators.validator_engine import build_tolerant_pattern
+
+    desc = (item.get("descricao") or "").strip()
+    padrao = (item.get("padrao") or item.get("pattern") or "").strip()
+    rx: Optional[Pattern] = None
+    rx_na: Optional[Pattern] = None
+    regex_error = False
+    pattern = literal = literal_na = ""
+    tokens: Tuple[str, ...] = ()
+
+    if padrao:
+        pattern = build_tolerant_pattern(padrao)
+        pattern_na = fold_accents(pattern)
+        literal = pattern.lower()
+        literal_na = pattern_na.lower()
+        try:
+            rx = re.compile(pattern, RIGID_FLAGS)
+            rx_na = re.compile(pattern_na, RIGID_FLAGS)
+        except re.error:
+            regex_error = True
+    else:
+        # primeiras palavras significativas da descrição
+        tokens = tuple([w for w in re.split(r"\W+", desc.lower()) if len(w) > 4][:3])
+
+    return CompiledItem(
+        id=item.get("id") or "",
+        descricao=desc,
+        obrigatorio=bool(item.get("obrigatorio", False)),
+        padrao=padrao,
+        pattern=pattern,
+        rx=rx,
+        rx_no_accents=rx_na,
+        regex_error=regex_error,
+        literal=literal,
+        literal_no_accents=literal_na,
+        tokens=tokens,
+    )
+
+
+# =============================================================================
+# Registro
+# =============================================================================
+class ChecklistRegistry:
+    """
+    Cache thread-safe de checklists compilados, compartilhado por todas as
+    sessões do processo (Streamlit executa cada sessão em uma thread).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._entries: Dict[str, CompiledChecklist] = {}
+        self._listings: Dict[str, Tuple[int, List[str]]] = {}
+        self._stats = {"hits": 0, "loads": 0, "revalidated": 0}
+
+    # ---------------------------------------------------------------- listagem
+    def list_files(self, base_dir: str) -> List[str]:
+        """Lista *_checklist*.yml do diretório (refeita só se o diretório mudar)."""
+        key = os.path.abspath(base_dir)
+        try:
+            dir_mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached and cached[0] == dir_mtime:
+                return list(cached[1])
+            files = sorted(glob.glob(os.path.join(base_dir, CHECKLIST_GLOB)))
+            self._listings[key] = (dir_mtime, files)
+            return list(files)
+
+    def find(self, base_dir: str, slug: str) -> Optional[str]:
+        """
+        Equivale ao glob "{slug}_checklist*.yml", priorizando o nome "simples".
+        """
+        prefix = f"{slug}_checklist"
+        candidates = [
+            p for p in self.list_files(base_dir)
+            if os.path.basename(p).startswith(prefix)
+        ]
+        if not candidates:
+            return None
+        candidates.sort(key=lambda p: (len(os.path.basename(p)), p))
+        return candidates[0]
+
+    # ------------------------------------------------------------------ leitura
+    def get(self, path: str) -> Optional[CompiledChecklist]:
+        """Retorna o checklist compilado, recarregando apenas se o arquivo mudou."""
+        if yaml is None or not path:
+            return None
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+                self._stats["hits"] += 1
+                return entry
+
+            with open(key, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+
+            if entry and entry.sha256 == digest:
+                # mtime mudou (touch, checkout), conteúdo idêntico → só revalida
+                entry = CompiledChecklist(
+                    path=entry.path,
+                    mtime_ns=st.st_mtime_ns,
+                    size=st.st_size,
+                    sha256=digest,
+                    items=entry.items,
+                    compiled=entry.compiled,
+                )
+                self._stats["revalidated"] += 1
+            else:
+                data = yaml.safe_load(raw.decode("utf-8")) or {}
+                items = tuple(extract_items(data))
+                entry = CompiledChecklist(
+                    path=key,
+                    mtime_ns=st.st_mtime_ns,
+                    size=st.st_size,
+                    sha256=digest,
+                    items=items,
+                    compiled=tuple(_compile_item(i) for i in items if isinstance(i, dict)),
+                )
+                self._stats["loads"] += 1
+
+            self._entries[key] = entry
+            return entry
+
+    def preload(self, base_dir: str) -> int:
+        """Parseia todos os checklists do diretório; retorna quantos foram carregados."""
+        return sum(1 for p in self.list_files(base_dir) if self.get(p) is not None)
+
+    # -------------------------------------------------------------- manutenção
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._listings.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, cached=len(self._entries))
+
+
+_REGISTRY = ChecklistRegistry()
+
+
+def get_checklist_registry() -> ChecklistRegistry:
+    """Instância única do processo."""
+    return _REGISTRY
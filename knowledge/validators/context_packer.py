@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Empacotamento de contexto por relevância (orçamento de tokens)
+#
+# Os validadores semânticos cortavam o documento em 12.000 caracteres
+# mantendo só o começo e o fim (_truncate); em editais e TRs de obras o meio
+# é justamente onde ficam preços, matriz de riscos e sanções. Aqui:
+# - o documento (normalizado) é dividido em trechos de ~700 caracteres;
+# - um índice BM25 local pontua cada trecho contra cada item do checklist
+#   (termos da descrição e do id, sem acentos, com radical de 6 letras);
+# - os melhores trechos entram em rodízio entre os itens (o 1º de cada
+#   item, depois o 2º...) até o orçamento de tokens, e saem na ordem do
+#   documento, com um marcador nas lacunas;
+# - documentos que já cabem no orçamento seguem inteiros, sem alteração;
+# - contagem de tokens, trechos e índice de cada documento ficam em cache
+#   (LRU pequeno): os shards e os artefatos do mesmo documento reaproveitam.
+#
+# Tokens: tiktoken (o200k_base), se instalado; senão, ~3,5 caracteres/token.
+# =============================================================================
+from __future__ import annotations
+
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODING = None
+
+from knowledge.validators.text_normalizer import fold_accents, normalize_document
+
+# Orçamento padrão ≈ os 12.000 caracteres do antigo _truncate
+DEFAULT_MAX_TOKENS = 3400
+PASSAGE_CHARS = 700
+GAP_MARKER = "\n\n[[...trecho omitido...]]\n\n"
+
+_CHARS_PER_TOKEN = 3.5
+_STEM = 6
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+_WORD_RX = re.compile(r"\w+")
+_SENTENCE_RX = re.compile(r"(?<=[.;:!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Número de tokens do texto (exato com tiktoken; estimado sem ele)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return int(len(text) / _CHARS_PER_TOKEN) + 1
+
+
+def _stems(text: str) -> List[str]:
+    words = _WORD_RX.findall(fold_accents(text).lower().replace("_", " "))
+    return [w[:_STEM] for w in words if len(w) > 4]
+
+
+# =============================================================================
+# Trechos
+# =============================================================================
+def split_passages(text: str, target_chars: int = PASSAGE_CHARS) -> List[str]:
+    """Linhas consecutivas agrupadas até ~target_chars; linhas longas, por frase."""
+    pieces: List[str] = []
+    for line in normalize_document(text or "").normalized.split("\n"):
+        if not line.strip():
+            continue
+        if len(line) <= target_chars * 1.5:
+            pieces.append(line)
+        else:
+            pieces.extend(s for s in _SENTENCE_RX.split(line) if s)
+
+    passages: List[str] = []
+    current: List[str] = []
+    size = 0
+    for p in pieces:
+        if current and size + len(p) > target_chars:
+            passages.append("\n".join(current))
+            current, size = [], 0
+        current.append(p)
+        size += len(p) + 1
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+class PassageIndex:
+    """Índice BM25 dos trechos de um documento."""
+
+    def __init__(self, passages: Sequence[str]) -> None:
+        self.passages = list(passages)
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: List[int] = []
+        for i, p in enumerate(self.passages):
+            stems = _stems(p)
+            self._lengths.append(len(stems))
+            for s in stems:
+                tf = self._postings.setdefault(s, {})
+                tf[i] = tf.get(i, 0) + 1
+        n = len(self.passages)
+        self._avg_len = (sum(self._lengths) / n) if n else 0.0
+        self._idf = {
+            s: math.log(1 + (n - len(tf) + 0.5) / (len(tf) + 0.5)) for s, tf in self._postings.items()
+        }
+
+    def rank(self, query: str) -> List[int]:
+        """Trechos com algum termo da consulta, do mais para o menos relevante."""
+        scores: Dict[int, float] = {}
+        for s in set(_stems(query)):
+            tf = self._postings.get(s)
+            if not tf:
+                continue
+            idf = self._idf[s]
+            for i, f in tf.items():
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self._lengths[i] / (self._avg_len or 1.0))
+                scores[i] = scores.get(i, 0.0) + idf * f * (_BM25_K1 + 1) / (f + norm)
+        return sorted(scores, key=lambda i: (-scores[i], i))
+
+
+# =============================================================================
+# Empacotamento
+# =============================================================================
+def _item_query(item: Dict[str, Any]) -> str:
+    return f"{item.get('id', '')} {item.get('descricao', '')}"
+
+
+def _passage_costs(passages: Sequence[str]) -> List[int]:
+    # cada trecho pode vir acompanhado de um marcador de lacuna
+    gap = estimate_tokens(GAP_MARKER)
+    return [estimate_tokens(p) + gap for p in passages]
+
+
+@lru_cache(maxsize=8)
+def _document_tokens(text: str) -> int:
+    return estimate_tokens(text)
+
+
+@lru_cache(maxsize=8)
+def _document_passages(text: str) -> Tuple[Tuple[str, ...], PassageIndex, Tuple[int, ...]]:
+    """Trechos, índice e custos do documento, compartilhados entre shards e artefatos."""
+    passages = tuple(split_passages(text))
+    return passages, PassageIndex(passages), tuple(_passage_costs(passages))
+
+
+def select_passages(
+    passages: Sequence[str],
+    itens: Sequence[Dict[str, Any]],
+    max_tokens: int,
+) -> List[int]:
+    """
+    Índices dos trechos escolhidos (ordem do documento): o primeiro trecho
+    (identificação do documento) e, em rodízio entre os itens, os mais
+    relevantes de cada um, enquanto couberem em max_tokens.
+    """
+    if not passages:
+        return []
+    return _pick(PassageIndex(passages), _passage_costs(passages), itens, max_tokens)
+
+
+def _pick(index: PassageIndex, costs: Sequence[int], itens: Sequence[Dict[str, Any]], max_tokens: int) -> List[int]:
+    rankings = [index.rank(_item_query(it)) for it in itens]
+    chosen = {0} if costs[0] <= max_tokens else set()
+    used = sum(costs[i] for i in chosen)
+    depth = max((len(r) for r in rankings), default=0)
+    for r in range(depth):
+        for ranking in rankings:
+            if r >= len(ranking) or ranking[r] in chosen:
+                continue
+            i = ranking[r]
+            if used + costs[i] <= max_tokens:
+                chosen.add(i)
+                used += costs[i]
+    return sorted(chosen)
+
+
+def pack_context(
+    text: str,
+    itens: Sequence[Dict[str, Any]],
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+) -> str:
+    """
+    Documento reduzido aos trechos mais relevantes para os itens, dentro de
+    max_tokens. Se o documento inteiro couber, volta sem alteração.
+    """
+    text = text or ""
+    if _document_tokens(text) <= max_tokens:
+        return text
+    passages, index, costs = _document_passages(text)
+    picked = _pick(index, costs, itens, max_tokens) if passages else []
+    if not picked:
+        return ""
+
+    out: List[str] = [GAP_MARKER.lstrip("\n")] if picked[0] > 0 else []
+    prev = None
+    for i in picked:
+        if prev is not None:
+            out.append("\n" if i == prev + 1 else GAP_MARKER)
+        out.append(passages[i])
+        prev = i
+    if picked[-1] < len(passages) - 1:
+        out.append(GAP_MARKER.rstrip("\n"))
+    return "".join(out)
+
@@ -7,6 +7,8 @@ from openai import OpenAI
 import json
 import re
 
+from knowledge.validators.semantic_cache import cached_chat_json
+
 def _extract_json(s: str) -> list:
     """
     Extrai JSON válido da resposta do modelo.
@@ -45,10 +47,9 @@ def semantic_validate_dfd(doc_text: str, client: OpenAI) -> Tuple[float, List[Di
         "para cada critério, explicando em até 3 frases."
     )
 
+    # Critérios e formato primeiro, documento por último (prefixo estável para o
+    # cache de prompt do provedor)
     user_msg = f"""
-    Documento (DFD):
-    \"\"\"{doc_text}\"\"\"
-
     Critérios:
     1. Clareza da Identificação da Unidade Demandante (se consta órgão, responsável, data).
     2. Clareza e objetividade do Objeto da Contratação (se está descrito sem ambiguidades).
@@ -60,10 +61,15 @@ def semantic_validate_dfd(doc_text: str, client: OpenAI) -> Tuple[float, List[Di
       {{"id": "objeto", "descricao": "Clareza e objetividade do Objeto da Contratação", "adequacao_nota": X, "justificativa": "..."}},
       {{"id": "justificativa", "descricao": "Adequação da Justificativa", "adequacao_nota": X, "justificativa": "..."}}
     ]
+
+    Documento (DFD):
+    \"\"\"{doc_text}\"\"\"
     """
 
     try:
-        resp = client.chat.completions.create(
+        parsed = cached_chat_json(
+            client,
+            _extract_json,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_msg},
@@ -73,9 +79,6 @@ def semantic_validate_dfd(doc_text: str, client: OpenAI) -> Tuple[float, List[Di
             max_tokens=1000
         )
 
-        raw = resp.choices[0].message.content
-        parsed = _extract_json(raw)
-
         results: List[Dict] = []
         notas = []
 
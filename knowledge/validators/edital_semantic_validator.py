@@ -7,9 +7,9 @@ from pathlib import Path
 import json
 import re
 import yaml
-
-# Dependência para extração de PDF
-import PyPDF2
+from knowledge.validators.context_packer import pack_context
+from knowledge.validators.section_cache import checklist_verdicts
+from utils.upload_extractor import extract_upload
 
 CHECKLIST_PATH = Path("knowledge/validators/edital_checklist.yml")
 
@@ -19,23 +19,14 @@ def load_checklist_items() -> List[Dict]:
     return data.get("itens", [])
 
 def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extrai texto de um PDF carregado."""
-    text = ""
+    """Extrai texto de um PDF carregado (cache por conteúdo e páginas em paralelo)."""
     try:
-        with open(pdf_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                text += page.extract_text() or ""
+        result = extract_upload(pdf_path, Path(pdf_path).read_bytes())
     except Exception as e:
         return f"❌ Erro ao extrair texto do PDF: {e}"
-    return text
-
-def _truncate(text: str, max_chars: int = 12000) -> str:
-    if len(text) <= max_chars:
-        return text
-    head = text[: max_chars // 2]
-    tail = text[-max_chars // 2 :]
-    return head + "\n\n[[...texto truncado...]]\n\n" + tail
+    if result.get("error"):
+        return f"❌ Erro ao extrair texto do PDF: {result['error']}"
+    return result["text"]
 
 def _extract_json(s: str) -> dict:
     """Extrai JSON puro de respostas do modelo."""
@@ -76,7 +67,7 @@ def semantic_validate_edital(doc_input: str, client) -> Tuple[float, List[Dict]]
     else:
         doc_text = doc_input
 
-    doc_trim = _truncate(doc_text, max_chars=12000)
+    doc_trim = pack_context(doc_text, itens)
 
     checklist_compacto = [
         {"id": it["id"], "descricao": it["descricao"], "obrigatorio": bool(it.get("obrigatorio", True))}
@@ -94,26 +85,18 @@ def semantic_validate_edital(doc_input: str, client) -> Tuple[float, List[Dict]]
         "{ 'itens': [ { 'id': '<id>', 'presente': true/false, 'adequacao_nota': 0-100, 'justificativa': 'texto curto', 'faltantes': [] } ] }"
     )
 
-    user_msg = (
-        "CHECKLIST:\n"
-        + json.dumps(checklist_compacto, ensure_ascii=False)
-        + "\n\nDOCUMENTO (EDITAL):\n"
-        + doc_trim
-    )
-
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
-        temperature=0.0,
+    data = checklist_verdicts(
+        client,
+        _extract_json,
+        namespace="edital",
+        system_msg=system_msg,
+        checklist=checklist_compacto,
+        document=doc_trim,
+        source=doc_text,
+        label="EDITAL",
         max_tokens=1800,
     )
 
-    raw = resp.choices[0].message.content
-    data = _extract_json(raw)
-
     results: List[Dict] = []
     obrigatorios = [it for it in checklist_compacto if it["obrigatorio"]]
     notas = []
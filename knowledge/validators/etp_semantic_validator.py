@@ -7,6 +7,8 @@ from pathlib import Path
 import json
 import re
 import yaml
+from knowledge.validators.context_packer import pack_context
+from knowledge.validators.section_cache import checklist_verdicts
 
 # Caminho para checklist de ETP
 CHECKLIST_PATH = Path("knowledge/etp_checklist.yml")
@@ -15,13 +17,6 @@ def load_checklist_items() -> List[Dict]:
     data = yaml.safe_load(CHECKLIST_PATH.read_text(encoding="utf-8"))
     return data.get("itens", [])
 
-def _truncate(text: str, max_chars: int = 12000) -> str:
-    if len(text) <= max_chars:
-        return text
-    head = text[: max_chars // 2]
-    tail = text[-max_chars // 2 :]
-    return head + "\n\n[[...texto truncado...]]\n\n" + tail
-
 def _extract_json(s: str) -> dict:
     """
     Extrai JSON de uma string que pode vir com blocos ```json ou texto extra.
@@ -63,8 +58,8 @@ def semantic_validate_etp(doc_text: str, client) -> Tuple[float, List[Dict]]:
     if not itens:
         return 0.0, []
 
-    # Reduz tamanho do documento para economizar tokens
-    doc_trim = _truncate(doc_text, max_chars=12000)
+    # Trechos mais relevantes para o checklist, dentro do orçamento de tokens
+    doc_trim = pack_context(doc_text, itens)
 
     checklist_compacto = [
         {"id": it["id"], "descricao": it["descricao"], "obrigatorio": bool(it.get("obrigatorio", True))}
@@ -93,27 +88,17 @@ def semantic_validate_etp(doc_text: str, client) -> Tuple[float, List[Dict]]:
         "Não inclua comentários fora do JSON."
     )
 
-    user_msg = (
-        "CHECKLIST:\n"
-        + json.dumps(checklist_compacto, ensure_ascii=False)
-        + "\n\nDOCUMENTO (ETP):\n"
-        + doc_trim
-    )
-
-    # Usa o mesmo modelo já utilizado no app
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
-        temperature=0.0,
-        max_tokens=1500,
+    data = checklist_verdicts(
+        client,
+        _extract_json,
+        namespace="etp",
+        system_msg=system_msg,
+        checklist=checklist_compacto,
+        document=doc_trim,
+        source=doc_text,
+        label="ETP",
     )
 
-    raw = resp.choices[0].message.content
-    data = _extract_json(raw)
-
     results: List[Dict] = []
     obrigatorios = [it for it in checklist_compacto if it["obrigatorio"]]
     notas = []
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Revalidação incremental
+#
+# O rascunho orientado pede ao usuário para editar o documento e "rodar a
+# validação novamente". Em vez de refazer tudo, a nova versão é comparada com
+# a anterior por parágrafo (linhas do texto normalizado):
+# - rígido: itens cujo trecho encontrado caiu só em parágrafos inalterados
+#   são reaproveitados; os demais são revarridos (matcher com `only`);
+# - semântico: só voltam ao LLM os itens cujos parágrafos de suporte
+#   (match rígido + sobreposição lexical com a descrição) mudaram.
+#
+# O estado da rodada ("revision") é um dict serializável em JSON, guardado
+# no próprio payload de validate_document e devolvido em `previous`.
+# =============================================================================
+from __future__ import annotations
+
+import difflib
+import hashlib
+import re
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from knowledge.validators.checklist_registry import CompiledChecklist, checklist_item_id
+from knowledge.validators.section_cache import item_terms
+from knowledge.validators.text_normalizer import NormalizedText
+
+REVISION_VERSION = 1
+
+# Acima desta fração de parágrafos alterados, a revalidação é completa
+MAX_CHANGED_RATIO = 0.6
+
+# Padrões cujo match depende de contexto fora do trecho (âncoras/lookaround)
+_NONLOCAL_RX = re.compile(r"(?<!\\)[\^$]|\\[AZ]|\(\?<?[=!]")
+
+ParagraphRange = Tuple[int, int]
+
+
+# =============================================================================
+# Parágrafos
+# =============================================================================
+def paragraph_hashes(normalized: str) -> List[str]:
+    """Hash curto de cada linha do texto normalizado."""
+    return [
+        hashlib.blake2b(line.encode("utf-8"), digest_size=8).hexdigest()
+        for line in normalized.split("\n")
+    ]
+
+
+def line_starts(text: str) -> List[int]:
+    starts = [0]
+    pos = text.find("\n")
+    while pos >= 0:
+        starts.append(pos + 1)
+        pos = text.find("\n", pos + 1)
+    return starts
+
+
+def span_to_paragraphs(starts: List[int], span: Tuple[int, int]) -> ParagraphRange:
+    start, end = span
+    a = bisect_right(starts, start) - 1
+    b = bisect_right(starts, max(end - 1, start)) - 1
+    return a, b
+
+
+class ParagraphDiff:
+    """Diferença entre duas versões do documento, por hash de parágrafo."""
+
+    def __init__(self, old: List[str], new: List[str]) -> None:
+        self.old_len = len(old)
+        self.new_len = len(new)
+        self._block: Dict[int, Tuple[int, int]] = {}   # antigo → (bloco, novo)
+        self.changed_new: Set[int] = set(range(len(new)))
+        matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+        for block_id, (i, j, n) in enumerate(matcher.get_matching_blocks()):
+            for k in range(n):
+                self._block[i + k] = (block_id, j + k)
+                self.changed_new.discard(j + k)
+
+    @property
+    def changed_ratio(self) -> float:
+        unchanged_old = len(self._block)
+        total = max(self.old_len, self.new_len, 1)
+        return 1.0 - unchanged_old / total
+
+    @property
+    def unchanged(self) -> bool:
+        return not self.changed_new and len(self._block) == self.old_len
+
+    def map_range(self, a: int, b: int) -> Optional[ParagraphRange]:
+        """Intervalo antigo [a, b] → novo, se todo ele ficou inalterado e contíguo."""
+        first = self._block.get(a)
+        last = self._block.get(b)
+        if first is None or last is None or first[0] != last[0]:
+            return None
+        return first[1], last[1]
+
+    def map_paragraph(self, i: int) -> Optional[int]:
+        hit = self._block.get(i)
+        return hit[1] if hit else None
+
+
+# =============================================================================
+# Estado da rodada
+# =============================================================================
+def facts_fingerprint(facts: str) -> str:
+    """Hash do bloco de fatos da jornada enviado no prompt ("" sem fatos)."""
+    return hashlib.sha256(facts.encode("utf-8")).hexdigest()[:16] if facts else ""
+
+
+def build_revision(
+    doc: NormalizedText,
+    artefato: str,
+    checklist: Optional[CompiledChecklist],
+    rigid_ranges: Dict[int, ParagraphRange],
+    semantic_support: Dict[str, List[int]],
+    stats: Optional[Dict[str, Any]] = None,
+    facts: str = "",
+) -> Dict[str, Any]:
+    return {
+        "version": REVISION_VERSION,
+        "artefato": artefato,
+        "checklist": checklist.sha256 if checklist else "",
+        "facts": facts_fingerprint(facts),
+        "paragraphs": paragraph_hashes(doc.normalized),
+        "rigid_ranges": {str(idx): list(r) for idx, r in rigid_ranges.items()},
+        "semantic_support": {k: list(v) for k, v in semantic_support.items()},
+        "stats": stats or {"mode": "full"},
+    }
+
+
+def usable_revision(
+    previous: Optional[Dict[str, Any]],
+    artefato: str,
+    checklist: Optional[CompiledChecklist],
+    facts: str = "",
+) -> Optional[Dict[str, Any]]:
+    """
+    Estado anterior, se compatível com esta rodada (mesmo artefato, checklist
+    e fatos da jornada no prompt).
+    """
+    if not isinstance(previous, dict) or "error" in previous:
+        return None
+    rev = previous.get("revision")
+    if not isinstance(rev, dict) or rev.get("version") != REVISION_VERSION:
+        return None
+    if rev.get("artefato") != artefato:
+        return None
+    if rev.get("checklist") != (checklist.sha256 if checklist else ""):
+        return None
+    # fatos das etapas anteriores mudaram: as notas antigas podem não valer mais
+    if rev.get("facts", "") != facts_fingerprint(facts):
+        return None
+    if not isinstance(rev.get("paragraphs"), list):
+        return None
+    return rev
+
+
+# =============================================================================
+# Rígido
+# =============================================================================
+def reuse_rigid_ranges(
+    checklist: CompiledChecklist,
+    diff: ParagraphDiff,
+    previous_ranges: Dict[str, List[int]],
+) -> Dict[int, ParagraphRange]:
+    """Itens encontrados antes cujo trecho está inteiro em parágrafos inalterados."""
+    reused: Dict[int, ParagraphRange] = {}
+    items = checklist.compiled
+    for key, rng in (previous_ranges or {}).items():
+        try:
+            idx = int(key)
+            a, b = int(rng[0]), int(rng[1])
+        except (TypeError, ValueError, IndexError):
+            continue
+        if idx >= len(items) or _NONLOCAL_RX.search(items[idx].pattern or ""):
+            continue
+        mapped = diff.map_range(a, b)
+        if mapped is not None:
+            reused[idx] = mapped
+    return reused
+
+
+# =============================================================================
+# Semântico
+# =============================================================================
+def semantic_support(
+    doc: NormalizedText,
+    starts: List[int],
+    items: Iterable[Dict[str, Any]],
+    rigid_ranges_by_id: Dict[str, ParagraphRange],
+) -> Dict[str, List[int]]:
+    """
+    Parágrafos que sustentam cada item: o trecho do match rígido (se houver)
+    e os parágrafos com ao menos dois termos da descrição (um, se a descrição
+    tiver só um termo). Termos presentes em mais da metade dos parágrafos
+    não discriminam e são ignorados.
+    """
+    folded = doc.folded
+    n_par = len(starts)
+    cache: Dict[str, Set[int]] = {}
+
+    def occurrences(tok: str) -> Set[int]:
+        hit = cache.get(tok)
+        if hit is None:
+            hit = set()
+            pos = folded.find(tok)
+            while pos >= 0:
+                p = bisect_right(starts, pos) - 1
+                hit.add(p)
+                nxt = starts[p + 1] if p + 1 < n_par else len(folded)
+                pos = folded.find(tok, nxt)
+            cache[tok] = hit
+        return hit
+
+    support: Dict[str, List[int]] = {}
+    for idx, item in enumerate(items):
+        item_id = checklist_item_id(item, idx)
+        toks = [t for t in item_terms(item.get("descricao", "")) if len(occurrences(t)) * 2 <= n_par]
+        counts: Dict[int, int] = {}
+        for t in toks:
+            for p in occurrences(t):
+                counts[p] = counts.get(p, 0) + 1
+        need = 1 if len(toks) <= 1 else 2
+        paras = {p for p, c in counts.items() if c >= need}
+        rng = rigid_ranges_by_id.get(item_id)
+        if rng is not None:
+            paras.update(range(rng[0], rng[1] + 1))
+        support[item_id] = sorted(paras)
+    return support
+
+
+def items_to_resend(
+    items: List[Dict[str, Any]],
+    diff: ParagraphDiff,
+    previous_support: Dict[str, List[int]],
+    new_support: Dict[str, List[int]],
+    previous_results: Dict[str, Dict[str, Any]],
+) -> List[str]:
+    """
+    Ids que voltam ao LLM: sem resultado anterior, com parágrafo de suporte
+    anterior alterado/removido, ou com parágrafo de suporte novo/alterado.
+    """
+    resend: List[str] = []
+    for idx, item in enumerate(items):
+        item_id = checklist_item_id(item, idx)
+        if item_id not in previous_results or item_id not in previous_support:
+            resend.append(item_id)
+            continue
+        old = previous_support.get(item_id) or []
+        if any(diff.map_paragraph(int(p)) is None for p in old):
+            resend.append(item_id)
+            continue
+        if any(p in diff.changed_new for p in new_support.get(item_id, [])):
+            resend.append(item_id)
+    return resend
@@ -2,6 +2,8 @@ from __future__ import annotations
 from typing import List, Dict, Tuple
 from pathlib import Path
 import json, re, yaml
+from knowledge.validators.context_packer import pack_context
+from knowledge.validators.section_cache import checklist_verdicts
 
 CHECKLIST_PATH = Path("knowledge/itf_checklist.yml")
 
@@ -9,9 +11,6 @@ def load_checklist_items() -> List[Dict]:
     data = yaml.safe_load(CHECKLIST_PATH.read_text(encoding="utf-8"))
     return data.get("itens", [])
 
-def _truncate(text: str, max_chars: int = 12000) -> str:
-    return text if len(text)<=max_chars else text[:max_chars//2]+"\n\n[[...texto truncado...]]\n\n"+text[-max_chars//2:]
-
 def _extract_json(s: str) -> dict:
     s=s.strip().strip("`").replace("```json","").replace("```","").strip()
     try:
@@ -28,7 +27,7 @@ def _extract_json(s: str) -> dict:
 def semantic_validate_itf(doc_text:str, client) -> Tuple[float,List[Dict]]:
     itens=load_checklist_items()
     if not itens: return 0.0,[]
-    doc_trim=_truncate(doc_text)
+    doc_trim=pack_context(doc_text,itens)
 
     checklist=[{"id":it["id"],"descricao":it["descricao"],"obrigatorio":bool(it.get("obrigatorio",True))} for it in itens]
 
@@ -38,16 +37,7 @@ def semantic_validate_itf(doc_text:str, client) -> Tuple[float,List[Dict]]:
         "Responda apenas em JSON no formato padrão já utilizado."
     )
 
-    user_msg="CHECKLIST:\n"+json.dumps(checklist,ensure_ascii=False)+"\n\nDOCUMENTO (ITF):\n"+doc_trim
-
-    resp=client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role":"system","content":system_msg},{"role":"user","content":user_msg}],
-        temperature=0.0,max_tokens=1500
-    )
-
-    raw=resp.choices[0].message.content
-    data=_extract_json(raw)
+    data=checklist_verdicts(client,_extract_json,namespace="itf",system_msg=system_msg,checklist=checklist,document=doc_trim,label="ITF",source=doc_text)
 
     results, notas=[],[]
     obrigatorios=[i for i in checklist if i["obrigatorio"]]
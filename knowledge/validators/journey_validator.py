@@ -0,0 +1,582 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Validação da jornada inteira (DFD → ETP → TR)
+#
+# journey/journey_config.json encadeia DFD, ETP e TR, mas cada etapa era
+# validada isoladamente e os fatos comuns (objeto, quantidade, valor
+# estimado, unidade demandante) eram deduzidos de novo pelo LLM em cada uma.
+# Aqui, numa rodada só:
+# - os fatos de cada documento são extraídos uma vez (regras locais; o LLM
+#   só completa os que faltarem) e guardados num cache por jornada, chaveado
+#   pelo hash do documento: etapa não editada não é relida;
+# - as verificações de coerência entre documentos (valor do DFD × estimativa
+#   do ETP, quantidade, objeto, unidade demandante) rodam localmente;
+# - as etapas são validadas em paralelo (validate_document de cada uma, com
+#   os shards semânticos de todas no event loop do processo) e o prompt de
+#   cada etapa recebe os fatos das anteriores em vez dos documentos delas.
+#
+# Configuração (variáveis de ambiente):
+#   SYNAPSE_CACHE_DIR             diretório do cache (fatos em <dir>/journeys)
+#   SYNAPSE_JOURNEY_LLM_FACTS=0   não usa o LLM para completar fatos
+#   SYNAPSE_JOURNEY_VALOR_TOL     diferença relativa aceita entre valores (padrão: 0.10)
+# =============================================================================
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from knowledge.validators import validator_engine as engine
+from knowledge.validators.semantic_cache import DEFAULT_CACHE_DIR, cached_chat_json
+from knowledge.validators.text_normalizer import fold_accents, normalize_document
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+JOURNEY_DIR = REPO_ROOT / "journey"
+
+FACT_FIELDS = ("objeto", "quantidade", "valor_estimado", "unidade_demandante")
+FACT_LABELS = {
+    "objeto": "objeto",
+    "quantidade": "quantidade",
+    "valor_estimado": "valor estimado",
+    "unidade_demandante": "unidade demandante",
+}
+# Campo dos schemas mínimos (journey/schemas) que exige cada fato na etapa
+SCHEMA_FIELDS = {
+    "objeto": "objeto",
+    "quantidade": "quantidade_ou_escopo",
+    "valor_estimado": "estimativa_custos",
+    "unidade_demandante": "unidade_demandante",
+}
+
+# Troque ao mudar a extração: fatos em cache de outra versão são refeitos
+FACTS_VERSION = "1"
+DEFAULT_VALOR_TOL = 0.10
+# Semelhança mínima (termos em comum / termos do texto menor) entre etapas
+TEXT_MIN_OVERLAP = {"objeto": 0.3, "unidade_demandante": 0.5}
+# Início do documento enviado ao LLM para completar fatos
+FACTS_LLM_CHARS = 12000
+_FACTS_PARAMS: Dict[str, Any] = {"model": "gpt-4o-mini", "temperature": 0.0, "max_tokens": 400}
+
+
+# =============================================================================
+# Etapas da jornada
+# =============================================================================
+@lru_cache(maxsize=1)
+def journey_stages() -> Tuple[str, ...]:
+    """Artefatos da jornada na ordem das transições (ex.: ("DFD", "ETP", "TR"))."""
+    try:
+        config = json.loads((JOURNEY_DIR / "journey_config.json").read_text(encoding="utf-8"))
+        transitions = config.get("transitions") or {}
+    except Exception:
+        transitions = {}
+    stages: List[str] = []
+    state, seen = "inicio", set()
+    while state in transitions and state not in seen:
+        seen.add(state)
+        doc = (transitions[state].get("doc") or "").strip().upper()
+        if doc and doc not in stages:
+            stages.append(doc)
+        state = transitions[state].get("next")
+    return tuple(stages) or ("DFD", "ETP", "TR")
+
+
+@lru_cache(maxsize=None)
+def required_fields(stage: str) -> FrozenSet[str]:
+    """required_fields do schema mínimo da etapa (vazio se não houver)."""
+    try:
+        path = JOURNEY_DIR / "schemas" / f"{stage.lower()}.min.json"
+        return frozenset(json.loads(path.read_text(encoding="utf-8")).get("required_fields") or ())
+    except Exception:
+        return frozenset()
+
+
+def _ordered(stages: List[str]) -> List[str]:
+    chain = journey_stages()
+    return [s for s in chain if s in stages] + [s for s in stages if s not in chain]
+
+
+# =============================================================================
+# Extração local dos fatos
+# =============================================================================
+_NUMBERING = r"^\s*(?:(?:\d+(?:\.\d+)*|[ivxlc]+|[a-z])\s*[.)\-–]\s*|\d+(?:\.\d+)+\s+)?"
+_LABELS = {
+    "objeto": r"(?:descri[cç][aã]o\s+do\s+)?(?:do\s+)?objeto(?:\s+da\s+(?:contrata[cç][aã]o|demanda|aquisi[cç][aã]o))?",
+    "quantidade": (
+        r"(?:estimativa\s+(?:preliminar\s+)?(?:da|das|de|do|dos)\s+)?"
+        r"(?:quantidades?|quantitativos?)(?:\s+(?:estimad[ao]s?|solicitad[ao]s?|total))?"
+    ),
+    "valor_estimado": (
+        r"(?:valor\s+(?:total\s+|global\s+)?(?:estimad[oa]|da\s+contrata[cç][aã]o|de\s+refer[eê]ncia)"
+        r"|estimativa\s+(?:preliminar\s+)?(?:de|do|dos|da)\s+(?:valor|custo|pre[cç]o)s?"
+        r"|custo\s+(?:total\s+)?estimado|or[cç]amento\s+estimado)"
+    ),
+    "unidade_demandante": (
+        r"(?:unidade|setor|[aá]rea|[oó]rg[aã]o)\s+(?:demandante|requisitante|solicitante)"
+    ),
+}
+_LABEL_RX = {
+    field: re.compile(_NUMBERING + rf"(?P<label>{label})\b(?P<rest>.*)$", re.IGNORECASE)
+    for field, label in _LABELS.items()
+}
+_MONEY_RX = re.compile(
+    r"R\$\s*(?P<num>\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:,\d{1,2})?)"
+    r"(?:\s*(?P<mult>mil|milh[oõ]es|milh[aã]o|bilh[oõ]es|bilh[aã]o)\b)?",
+    re.IGNORECASE,
+)
+_NUMBER_RX = re.compile(r"(?<![\w/])(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d+))?(?![\w/])")
+_MULTIPLIERS = {"mil": 1e3, "milhao": 1e6, "milhoes": 1e6, "bilhao": 1e9, "bilhoes": 1e9}
+# Linhas seguintes ao título consultadas quando o valor não está na mesma linha
+_LOOKAHEAD = 4
+_MAX_VALUE_CHARS = 300
+
+
+def parse_brl(text: str) -> Optional[float]:
+    """Primeiro valor em reais do texto ("R$ 1.234,56", "R$ 2,5 milhões"), ou None."""
+    m = _MONEY_RX.search(text or "")
+    if not m:
+        return None
+    value = float(m.group("num").replace(".", "").replace(",", "."))
+    mult = fold_accents((m.group("mult") or "").lower())
+    return value * _MULTIPLIERS.get(mult, 1.0)
+
+
+def _parse_number(text: str) -> Optional[float]:
+    """Primeiro número do texto fora de valores em reais e datas ("1.200", "3,5")."""
+    text = _MONEY_RX.sub(" ", text or "")
+    m = _NUMBER_RX.search(text)
+    if not m:
+        return None
+    return float(m.group(1).replace(".", "") + ("." + m.group(2) if m.group(2) else ""))
+
+
+def _clean_value(value: str) -> str:
+    value = re.sub(r"^[\s:\-–—]+|[\s;,.]+$", "", value or "")
+    return value[:_MAX_VALUE_CHARS]
+
+
+def _labeled_values(lines: List[str], field: str) -> List[Tuple[str, List[str]]]:
+    """
+    Linhas rotuladas com o fato: ("Rótulo: valor" → [valor]) ou título seguido
+    de conteúdo ("OBJETO" → próximas linhas não vazias).
+    """
+    rx = _LABEL_RX[field]
+    found: List[Tuple[str, List[str]]] = []
+    for i, line in enumerate(lines):
+        m = rx.match(line)
+        if not m:
+            continue
+        rest = m.group("rest")
+        after = [ln for ln in lines[i + 1:i + 1 + _LOOKAHEAD * 2] if ln.strip()][:_LOOKAHEAD]
+        if re.match(r"\s*[:\-–—]", rest):
+            value = _clean_value(rest)
+            found.append((line, ([value] if value else []) + after))
+        elif len(line) <= 120:
+            # título de seção (ex.: "ESTIMATIVA PRELIMINAR DO VALOR DA CONTRATAÇÃO")
+            found.append((line, [rest] + after if rest.strip() else after))
+    return found
+
+
+def _is_instruction(value: str) -> bool:
+    """Texto de modelo ("[descrição resumida]", "Informar ...") não é fato."""
+    v = value.strip()
+    if not v or (v.startswith("[") and v.endswith("]")):
+        return True
+    return bool(re.match(r"(?:informar|descrever|apresentar|indicar|preencher)\b", fold_accents(v).lower()))
+
+
+def extract_facts_local(document_text: str) -> Dict[str, Any]:
+    """
+    Fatos encontrados por regras locais: {"objeto", "quantidade",
+    "valor_estimado", "unidade_demandante"} (None quando não encontrados),
+    "trechos" (linha de onde veio cada fato) e "origem" ("regra").
+    """
+    lines = [ln.strip() for ln in normalize_document(document_text or "").normalized.split("\n")]
+    facts: Dict[str, Any] = {field: None for field in FACT_FIELDS}
+    trechos: Dict[str, str] = {}
+
+    for field in ("objeto", "unidade_demandante"):
+        for line, values in _labeled_values(lines, field):
+            value = next((_clean_value(v) for v in values if not _is_instruction(v)), "")
+            if value:
+                facts[field], trechos[field] = value, line
+                break
+
+    for line, values in _labeled_values(lines, "quantidade"):
+        for v in values:
+            n = None if _is_instruction(v) else _parse_number(v)
+            if n is not None:
+                facts["quantidade"], trechos["quantidade"] = n, v
+                break
+        if facts["quantidade"] is not None:
+            break
+
+    for line, values in _labeled_values(lines, "valor_estimado"):
+        for v in [line] + values:
+            amount = parse_brl(v)
+            if amount is not None:
+                facts["valor_estimado"], trechos["valor_estimado"] = amount, v
+                break
+        if facts["valor_estimado"] is not None:
+            break
+    if facts["valor_estimado"] is None:
+        # sem rótulo: maior valor em linha que fala de estimativa/total
+        candidates = [
+            (parse_brl(ln), ln) for ln in lines
+            if _MONEY_RX.search(ln) and re.search(r"estimad|estimativa|total|global", fold_accents(ln).lower())
+        ]
+        if candidates:
+            facts["valor_estimado"], trechos["valor_estimado"] = max(candidates, key=lambda c: c[0] or 0.0)
+
+    facts["trechos"] = trechos
+    facts["origem"] = {field: "regra" for field in trechos}
+    return facts
+
+
+# =============================================================================
+# Complemento pelo LLM (só os fatos que as regras não encontraram)
+# =============================================================================
+_FACTS_SYSTEM = (
+    "Você extrai fatos de documentos de contratação pública (DFD, ETP, TR). "
+    "Não invente: use null quando o fato não estiver no documento."
+)
+_FACTS_INSTRUCTIONS = (
+    "Extraia do DOCUMENTO e responda SOMENTE um objeto JSON com os campos:\n"
+    '- "objeto": descrição sucinta do objeto da contratação (string ou null);\n'
+    '- "quantidade": quantidade total a contratar (número ou null);\n'
+    '- "valor_estimado": valor total estimado em reais (número, sem "R$" e sem separador de milhar, ou null);\n'
+    '- "unidade_demandante": unidade/setor que demanda a contratação (string ou null).'
+)
+
+
+def _parse_facts(raw: str) -> Dict[str, Any]:
+    m = re.search(r"\{.*\}", raw or "", flags=re.DOTALL)
+    data = json.loads(m.group(0) if m else raw)
+    if not isinstance(data, dict):
+        raise ValueError("resposta de fatos sem objeto JSON")
+    return data
+
+
+def _coerce_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value)
+    return parse_brl(text if "R$" in text else f"R$ {text}")
+
+
+def complete_facts_llm(document_text: str, facts: Dict[str, Any], client: Any) -> Dict[str, Any]:
+    """Preenche com o LLM (resposta em cache semântico) os fatos ausentes."""
+    missing = [f for f in FACT_FIELDS if facts.get(f) in (None, "")]
+    if not missing or client is None:
+        return facts
+    text = normalize_document(document_text or "").normalized[:FACTS_LLM_CHARS]
+    messages = [
+        {"role": "system", "content": _FACTS_SYSTEM},
+        {"role": "user", "content": f'{_FACTS_INSTRUCTIONS}\n\nDOCUMENTO:\n"""{text}"""\n'},
+    ]
+    try:
+        data = cached_chat_json(client, _parse_facts, messages=messages, version=FACTS_VERSION,
+                                accept=lambda d: isinstance(d, dict), **_FACTS_PARAMS)
+    except Exception:
+        return facts
+    out = dict(facts, origem=dict(facts.get("origem") or {}))
+    for field in missing:
+        value = data.get(field)
+        value = _coerce_number(value) if field in ("quantidade", "valor_estimado") else (
+            _clean_value(str(value)) if value else None
+        )
+        if value not in (None, ""):
+            out[field] = value
+            out["origem"][field] = "llm"
+    return out
+
+
+# =============================================================================
+# Cache de fatos por jornada
+# =============================================================================
+def document_digest(document_text: str) -> str:
+    return hashlib.sha256(normalize_document(document_text or "").normalized.encode("utf-8")).hexdigest()
+
+
+class JourneyFactsCache:
+    """
+    Fatos de cada etapa de uma jornada, em JSON (<cache>/journeys/<id>.json):
+    {etapa: {"digest", "version", "llm", "facts"}}. Só a versão mais recente de
+    cada etapa é guardada; documento com outro hash é extraído de novo.
+    """
+
+    def __init__(self, journey_id: str, cache_dir: Optional[str] = None) -> None:
+        base = Path(cache_dir or os.getenv("SYNAPSE_CACHE_DIR") or str(DEFAULT_CACHE_DIR))
+        safe_id = re.sub(r"[^\w.-]", "_", journey_id)[:80] or "jornada"
+        self.journey_id = journey_id
+        self.path = base / "journeys" / f"{safe_id}.json"
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._revision = 0  # alterações desde a criação (put)
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self._entries: Dict[str, Dict[str, Any]] = data if isinstance(data, dict) else {}
+        except Exception:
+            self._entries = {}
+
+    def get(self, stage: str, digest: str, llm: bool) -> Optional[Dict[str, Any]]:
+        """Fatos em cache do documento; extração só por regras não serve a quem pode usar o LLM."""
+        with self._lock:
+            entry = self._entries.get(stage)
+        if not entry or entry.get("digest") != digest or entry.get("version") != FACTS_VERSION:
+            return None
+        facts = entry.get("facts") or {}
+        gaps = any(facts.get(f) in (None, "") for f in FACT_FIELDS)
+        if llm and gaps and not entry.get("llm"):
+            return None
+        return facts
+
+    def put(self, stage: str, digest: str, llm: bool, facts: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[stage] = {"digest": digest, "version": FACTS_VERSION, "llm": llm, "facts": facts}
+            self._dirty = True
+            self._revision += 1
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps(self._entries, ensure_ascii=False, indent=2)
+            revision = self._revision
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(payload, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            return  # cache é só otimização; continua pendente para o próximo save
+        with self._lock:
+            if self._revision == revision:  # nada novo desde o retrato gravado
+                self._dirty = False
+
+
+_CACHES: Dict[str, JourneyFactsCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_journey_cache(journey_id: str) -> JourneyFactsCache:
+    with _CACHES_LOCK:
+        cache = _CACHES.get(journey_id)
+        if cache is None:
+            cache = _CACHES[journey_id] = JourneyFactsCache(journey_id)
+        return cache
+
+
+def _use_llm(client: Any) -> bool:
+    return client is not None and os.getenv("SYNAPSE_JOURNEY_LLM_FACTS", "1") != "0"
+
+
+def extract_journey_facts(
+    documents: Dict[str, str],
+    client: Any = None,
+    journey_id: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fatos de cada etapa ({etapa: fatos}), do cache da jornada quando o
+    documento não mudou; os demais são extraídos em paralelo.
+    """
+    documents = {(stage or "").strip().upper(): text or "" for stage, text in (documents or {}).items()}
+    llm = _use_llm(client)
+    cache = get_journey_cache(journey_id) if journey_id else None
+
+    def extract(stage: str) -> Dict[str, Any]:
+        text = documents[stage]
+        digest = document_digest(text)
+        cached = cache.get(stage, digest, llm) if cache else None
+        if cached is not None:
+            return cached
+        facts = extract_facts_local(text)
+        if llm:
+            facts = complete_facts_llm(text, facts, client)
+        if cache:
+            cache.put(stage, digest, llm, facts)
+        return facts
+
+    stages = _ordered(list(documents))
+    with ThreadPoolExecutor(max_workers=max(1, len(stages)), thread_name_prefix="synapse-facts") as pool:
+        facts = dict(zip(stages, pool.map(extract, stages)))
+    if cache:
+        cache.save()
+    return facts
+
+
+# =============================================================================
+# Coerência entre documentos (local)
+# =============================================================================
+_STOPWORDS = frozenset(
+    "para com sem por das dos nas nos que uma umas uns como pelo pela pelos pelas "
+    "sobre entre ate seus suas este esta estes estas esse essa aquisicao contratacao "
+    "servico servicos objeto".split()
+)
+
+
+def _terms(text: str) -> FrozenSet[str]:
+    words = re.findall(r"[a-z0-9]+", fold_accents(str(text)).lower())
+    return frozenset(w for w in words if len(w) >= 3 and w not in _STOPWORDS)
+
+
+def text_overlap(a: str, b: str) -> float:
+    """Fração dos termos do texto menor presentes no outro (0..1)."""
+    ta, tb = _terms(a), _terms(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / min(len(ta), len(tb))
+
+
+def format_brl(value: float) -> str:
+    return "R$ " + f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _format_fact(field: str, value: Any) -> str:
+    if field == "valor_estimado":
+        return format_brl(float(value))
+    if field == "quantidade":
+        return f"{float(value):g}".replace(".", ",")
+    return str(value)
+
+
+def _valor_tolerance() -> float:
+    try:
+        return float(os.getenv("SYNAPSE_JOURNEY_VALOR_TOL") or DEFAULT_VALOR_TOL)
+    except ValueError:
+        return DEFAULT_VALOR_TOL
+
+
+def _compare(field: str, a: Any, b: Any, valor_tol: float) -> Tuple[bool, str]:
+    """(coerente, detalhe) entre os valores de duas etapas."""
+    if field == "valor_estimado":
+        a, b = float(a), float(b)
+        diff = abs(b - a) / max(abs(a), abs(b)) if max(abs(a), abs(b)) else 0.0
+        return diff <= valor_tol, f"diferença de {diff:.1%} (tolerância {valor_tol:.0%})"
+    if field == "quantidade":
+        return float(a) == float(b), "quantidades iguais" if float(a) == float(b) else "quantidades diferentes"
+    overlap = text_overlap(a, b)
+    return overlap >= TEXT_MIN_OVERLAP[field], f"{overlap:.0%} dos termos em comum"
+
+
+def consistency_checks(
+    facts: Dict[str, Dict[str, Any]],
+    valor_tol: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Verificações entre etapas, sem LLM. Cada etapa é comparada com a anterior
+    que tem o mesmo fato; fato exigido pelo schema mínimo da etapa e não
+    encontrado vira "ausente". Itens: {"id", "fato", "etapas", "valores",
+    "status" ("ok" | "divergente" | "ausente"), "detalhe"}.
+    """
+    tol = _valor_tolerance() if valor_tol is None else valor_tol
+    stages = _ordered(list(facts))
+    checks: List[Dict[str, Any]] = []
+    for field in FACT_FIELDS:
+        known: List[Tuple[str, Any]] = []
+        for stage in stages:
+            value = (facts.get(stage) or {}).get(field)
+            if value not in (None, ""):
+                known.append((stage, value))
+            elif SCHEMA_FIELDS[field] in required_fields(stage):
+                checks.append({
+                    "id": f"{field}:{stage}",
+                    "fato": field,
+                    "etapas": [stage],
+                    "valores": [None],
+                    "status": "ausente",
+                    "detalhe": f"{FACT_LABELS[field]} não encontrado no {stage}",
+                })
+        for (sa, va), (sb, vb) in zip(known, known[1:]):
+            ok, detalhe = _compare(field, va, vb, tol)
+            checks.append({
+                "id": f"{field}:{sa}-{sb}",
+                "fato": field,
+                "etapas": [sa, sb],
+                "valores": [va, vb],
+                "status": "ok" if ok else "divergente",
+                "detalhe": f"{FACT_LABELS[field]}: {_format_fact(field, va)} ({sa}) × "
+                           f"{_format_fact(field, vb)} ({sb}); {detalhe}",
+            })
+    return checks
+
+
+# =============================================================================
+# Fatos no prompt das etapas seguintes
+# =============================================================================
+def facts_prompt(facts: Dict[str, Dict[str, Any]], stage: str) -> str:
+    """Bloco com os fatos das etapas anteriores a `stage` ("" na primeira)."""
+    stages = _ordered(list(facts) + [stage])
+    lines: List[str] = []
+    for earlier in stages[:stages.index(stage)]:
+        known = [
+            f"{FACT_LABELS[f]}: {_format_fact(f, (facts.get(earlier) or {})[f])}"
+            for f in FACT_FIELDS
+            if (facts.get(earlier) or {}).get(f) not in (None, "")
+        ]
+        if known:
+            lines.append(f"- {earlier}: " + "; ".join(known))
+    return "\n".join(lines)
+
+
+# =============================================================================
+# Rodada da jornada
+# =============================================================================
+def validate_journey(
+    documents: Dict[str, str],
+    client: Any,
+    previous: Optional[Dict[str, Dict[str, Any]]] = None,
+    *,
+    journey_id: str,
+) -> Dict[str, Any]:
+    """
+    Valida todos os documentos informados da jornada ({"DFD": texto, "ETP":
+    texto, "TR": texto}, qualquer subconjunto) numa rodada. Retorna:
+      - journey_id
+      - stages: {etapa: payload de validate_document}
+      - facts: {etapa: fatos extraídos}
+      - consistency: verificações entre documentos (consistency_checks)
+
+    `previous` é o "stages" da rodada anterior (revalidação incremental por
+    etapa). `journey_id` identifica a jornada entre as rodadas (ex.: nº do
+    processo) e é a chave do cache de fatos: precisa ser estável, e não
+    derivado do texto de alguma etapa, para que editar um documento não
+    descarte os fatos já extraídos dos outros.
+    """
+    if not (journey_id or "").strip():
+        raise ValueError("journey_id obrigatório (identificador estável da jornada)")
+    docs = {
+        (stage or "").strip().upper(): text
+        for stage, text in (documents or {}).items()
+        if (stage or "").strip() and (text or "").strip()
+    }
+    stages = _ordered(list(docs))
+    if not stages:
+        return {"journey_id": journey_id, "stages": {}, "facts": {}, "consistency": []}
+
+    facts = extract_journey_facts(docs, client, journey_id)
+    consistency = consistency_checks(facts)
+
+    # Cada etapa em sua thread: o semântico de todas vai para o event loop do
+    # processo (run_sync) e roda em paralelo no pool de conexões compartilhado
+    def validate(stage: str) -> Dict[str, Any]:
+        return engine.validate_document(
+            docs[stage], stage, client, (previous or {}).get(stage), facts_prompt(facts, stage)
+        )
+
+    with ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix="synapse-journey") as pool:
+        payloads = dict(zip(stages, pool.map(validate, stages)))
+
+    return {
+        "journey_id": journey_id,
+        "stages": payloads,
+        "facts": facts,
+        "consistency": consistency,
+    }
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Parser JSON incremental (itens de lista em streaming)
+#
+# Com stream=True o modelo devolve o JSON em pedaços. Este parser acompanha
+# só a estrutura (strings, escapes, chaves e colchetes) e entrega cada objeto
+# de uma lista assim que o "}" correspondente chega — antes do fim da
+# resposta. Serve para os formatos usados no repositório:
+#   [ {...}, {...} ]                          (validator_engine)
+#   {"itens": [ {...} ]}                      (*_semantic_validator)
+#   {"rigid_result": [...], "semantic_result": [...]}   (validator_engine_vNext)
+#
+# O texto é percorrido uma vez (a regex salta direto para os caracteres
+# estruturais); cada objeto concluído é decodificado com json.loads.
+# =============================================================================
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+_STRUCTURAL_RX = re.compile(r'["\\{}\[\]:,]')
+
+StreamItem = Tuple[Optional[str], Any]
+
+
+class JsonItemStream:
+    """
+    Alimentado com `feed(pedaço)`, devolve os objetos concluídos como
+    (chave da lista, objeto). A chave é None para a lista de nível superior.
+    `keys` restringe as listas acompanhadas (None: todas).
+    """
+
+    def __init__(self, keys: Optional[Iterable[Optional[str]]] = None) -> None:
+        self.keys = None if keys is None else set(keys)
+        self._parts: List[str] = []
+        self._text = ""  # trecho ainda em análise (o já processado é descartado)
+        self._pos = 0
+        # pilha de contêineres: ("{" | "[", chave da lista)
+        self._stack: List[Tuple[str, Optional[str]]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._capture_start = -1
+        self._capture_depth = -1
+        self._capture_key: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """Tudo o que foi recebido até agora."""
+        return "".join(self._parts)
+
+    def _wanted(self, key: Optional[str]) -> bool:
+        return self.keys is None or key in self.keys
+
+    def feed(self, chunk: str) -> List[StreamItem]:
+        if not chunk:
+            return []
+        self._parts.append(chunk)
+        self._text += chunk
+        text = self._text
+        out: List[StreamItem] = []
+        pos = self._pos
+
+        while pos < len(text):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                q = text.find('"', pos)
+                b = text.find("\\", pos, q if q >= 0 else len(text))
+                if b >= 0 and (q < 0 or b < q):
+                    # escape: pula o caractere seguinte (pode ainda não ter chegado)
+                    if b + 1 < len(text):
+                        pos = b + 2
+                    else:
+                        self._escape = True
+                        pos = b + 1
+                    continue
+                if q < 0:
+                    pos = len(text)
+                    break
+                self._in_string = False
+                if self._stack and self._stack[-1][0] == "{" and self._capture_start < 0:
+                    try:
+                        self._last_string = json.loads(text[self._string_start:q + 1])
+                    except ValueError:
+                        self._last_string = None
+                pos = q + 1
+                continue
+
+            m = _STRUCTURAL_RX.search(text, pos)
+            if m is None:
+                pos = len(text)
+                break
+            ch = m.group()
+            i = m.start()
+            pos = i + 1
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                self._pending_key = self._last_string
+            elif ch == ",":
+                self._pending_key = None
+            elif ch == "{":
+                parent = self._stack[-1] if self._stack else None
+                if (self._capture_start < 0 and parent is not None and parent[0] == "["
+                        and self._wanted(parent[1])):
+                    self._capture_start = i
+                    self._capture_depth = len(self._stack)
+                    self._capture_key = parent[1]
+                self._stack.append(("{", None))
+                self._pending_key = None
+            elif ch == "[":
+                parent = self._stack[-1] if self._stack else None
+                key = self._pending_key if parent is not None and parent[0] == "{" else None
+                self._stack.append(("[", key))
+                self._pending_key = None
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._capture_start >= 0 and len(self._stack) == self._capture_depth:
+                    try:
+                        out.append((self._capture_key, json.loads(text[self._capture_start:i + 1])))
+                    except ValueError:
+                        pass
+                    self._capture_start = -1
+                    self._capture_depth = -1
+                self._pending_key = None
+
+        if self._capture_start < 0 and not self._in_string:
+            self._text = text[pos:]
+            pos = 0
+        self._pos = pos
+        return out
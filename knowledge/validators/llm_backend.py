@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Backends de LLM (OpenAI, gravação e reprodução offline)
+#
+# Os engines recebem um `client` e chamam client.chat.completions.create
+# (via llm_call). Os backends daqui têm essa mesma interface, então entram
+# no lugar do client sem mudar os validadores:
+# - OpenAIBackend: repassa ao client OpenAI (padrão); async_client() dá o
+#   AsyncOpenAI compartilhado do event loop (llm_pool) com as mesmas credenciais;
+# - RecordingBackend: repassa e grava cada requisição/resposta em um
+#   "cassete" JSON no disco (inclusive respostas em streaming);
+# - ReplayBackend: responde a partir dos cassetes, sem rede nem chave, com
+#   latência configurável (a gravada, fixa ou lognormal) — permite medir
+#   throughput e concorrência do pipeline completo em CI isolado.
+#
+# A chave do cassete é o sha256 da requisição (modelo, mensagens e
+# parâmetros, sem timeout/stream): a mesma chamada grava e reproduz.
+#
+# Configuração (variáveis de ambiente), lida por get_backend():
+#   SYNAPSE_LLM_BACKEND     openai (padrão) | record | replay
+#   SYNAPSE_CASSETTE_DIR    diretório dos cassetes (padrão: tests/cassettes)
+#   SYNAPSE_REPLAY_LATENCY  recorded | fixed:seconds=0.8 |
+#                           lognormal:median=1.5,sigma=0.5  (padrão: recorded)
+#
+# Em benchmarks, desligue o cache semântico (SYNAPSE_SEMANTIC_CACHE=0) para
+# que todas as chamadas cheguem ao backend.
+# =============================================================================
+from __future__ import annotations
+
+import abc
+import json
+import math
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, Optional
+
+from knowledge.validators.semantic_cache import make_key
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CASSETTE_DIR = REPO_ROOT / "tests" / "cassettes"
+CASSETTE_VERSION = 1
+
+# Parâmetros que não mudam a resposta (ficam fora da chave)
+_TRANSPORT_PARAMS = {"timeout", "stream", "stream_options", "extra_headers"}
+# Streaming reproduzido em pedaços deste tamanho
+_REPLAY_CHUNK_CHARS = 16
+
+
+class CassetteMiss(LookupError):
+    """Requisição sem cassete gravado (modo replay)."""
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    return make_key("cassette", CASSETTE_VERSION,
+                    {k: v for k, v in kwargs.items() if k not in _TRANSPORT_PARAMS})
+
+
+# =============================================================================
+# Objetos de resposta (mesmo formato do SDK)
+# =============================================================================
+def _completion(content: str, finish_reason: str, model: str) -> Any:
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)],
+    )
+
+
+def _chunk(piece: Optional[str], finish_reason: Optional[str], model: str) -> Any:
+    delta = SimpleNamespace(content=piece)
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, delta=delta, finish_reason=finish_reason)],
+    )
+
+
+# =============================================================================
+# Interface
+# =============================================================================
+class _Completions:
+    def __init__(self, backend: "LLMBackend") -> None:
+        self._backend = backend
+
+    def create(self, **kwargs: Any) -> Any:
+        return self._backend.complete(**kwargs)
+
+
+class LLMBackend(abc.ABC):
+    """Base: expõe .chat.completions.create(**kwargs) → self.complete(**kwargs)."""
+
+    base_url = ""
+
+    def __init__(self) -> None:
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    @abc.abstractmethod
+    def complete(self, **kwargs: Any) -> Any:
+        """Resposta no formato do SDK (ou iterador de chunks, com stream=True)."""
+
+    def async_client(self) -> Optional[Any]:
+        """
+        Client assíncrono equivalente no event loop corrente (chamar de dentro
+        de uma corrotina). None: as chamadas vão por complete(), em threads.
+        """
+        return None
+
+
+class OpenAIBackend(LLMBackend):
+    """Repassa ao client OpenAI; demais atributos (api_key, base_url...) vêm do client."""
+
+    def __init__(self, client: Any) -> None:
+        super().__init__()
+        self.client = client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__dict__["client"], name)
+
+    @property
+    def base_url(self) -> str:  # type: ignore[override]
+        return str(getattr(self.client, "base_url", "") or "")
+
+    def complete(self, **kwargs: Any) -> Any:
+        return self.client.chat.completions.create(**kwargs)
+
+    def async_client(self) -> Optional[Any]:
+        from knowledge.validators.llm_pool import get_async_llm_client
+
+        return get_async_llm_client(self.client)
+
+
+# =============================================================================
+# Latência (reprodução)
+# =============================================================================
+class LatencyModel:
+    """
+    Latência total de cada resposta reproduzida:
+      recorded  — a gravada no cassete (× scale)
+      fixed     — `seconds`
+      lognormal — mediana `median` e dispersão `sigma` (cauda realista)
+    Em streaming, `ttft` é a fração do total até o primeiro pedaço.
+    """
+
+    def __init__(self, kind: str = "recorded", seconds: float = 0.0, median: float = 1.0,
+                 sigma: float = 0.5, scale: float = 1.0, ttft: float = 0.2, seed: Optional[int] = None) -> None:
+        if kind not in ("recorded", "fixed", "lognormal"):
+            raise ValueError(f"modelo de latência desconhecido: {kind}")
+        self.kind = kind
+        self.seconds = seconds
+        self.median = median
+        self.sigma = sigma
+        self.scale = scale
+        self.ttft = ttft
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: Optional[str]) -> "LatencyModel":
+        """'recorded' | 'fixed:seconds=0.8' | 'lognormal:median=1.5,sigma=0.5,seed=1'."""
+        kind, _, rest = (spec or "recorded").partition(":")
+        params: Dict[str, Any] = {}
+        for part in filter(None, rest.split(",")):
+            name, _, value = part.partition("=")
+            params[name.strip()] = int(value) if name.strip() == "seed" else float(value)
+        return cls(kind.strip() or "recorded", **params)
+
+    def sample(self, recorded: float) -> float:
+        if self.kind == "fixed":
+            return self.seconds
+        if self.kind == "lognormal":
+            with self._lock:
+                return self.median * math.exp(self._rng.gauss(0.0, self.sigma))
+        return max(recorded, 0.0) * self.scale
+
+
+# =============================================================================
+# Gravação / reprodução
+# =============================================================================
+class RecordingBackend(LLMBackend):
+    """Repassa ao backend interno e grava um cassete por requisição."""
+
+    def __init__(self, inner: Any, cassette_dir: os.PathLike = DEFAULT_CASSETTE_DIR) -> None:
+        super().__init__()
+        self.inner = inner
+        self.cassette_dir = Path(cassette_dir)
+        self.base_url = f"record://{self.cassette_dir}"
+
+    def _write(self, kwargs: Dict[str, Any], content: str, finish_reason: Optional[str],
+               latency: float, ttft: Optional[float]) -> None:
+        key = request_key(kwargs)
+        self.cassette_dir.mkdir(parents=True, exist_ok=True)
+        record = {
+            "version": CASSETTE_VERSION,
+            "key": key,
+            "request": {k: v for k, v in kwargs.items() if k not in _TRANSPORT_PARAMS},
+            "response": {"content": content, "finish_reason": finish_reason or "stop"},
+            "latency": round(latency, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        tmp = self.cassette_dir / f".{key}.{threading.get_ident()}.tmp"
+        tmp.write_text(json.dumps(record, ensure_ascii=False, indent=1, default=str), encoding="utf-8")
+        os.replace(tmp, self.cassette_dir / f"{key}.json")
+
+    def complete(self, **kwargs: Any) -> Any:
+        t0 = time.monotonic()
+        resp = self.inner.chat.completions.create(**kwargs)
+        if not kwargs.get("stream"):
+            choice = resp.choices[0]
+            self._write(kwargs, choice.message.content or "", getattr(choice, "finish_reason", None),
+                        time.monotonic() - t0, None)
+            return resp
+        return self._record_stream(kwargs, resp, t0)
+
+    def _record_stream(self, kwargs: Dict[str, Any], stream: Any, t0: float) -> Iterator[Any]:
+        parts = []
+        reason = None
+        ttft = None
+        for chunk in stream:
+            if getattr(chunk, "choices", None):
+                choice = chunk.choices[0]
+                piece = getattr(getattr(choice, "delta", None), "content", None)
+                if piece:
+                    if ttft is None:
+                        ttft = time.monotonic() - t0
+                    parts.append(piece)
+                reason = getattr(choice, "finish_reason", None) or reason
+            yield chunk
+        self._write(kwargs, "".join(parts), reason, time.monotonic() - t0, ttft)
+
+
+class ReplayBackend(LLMBackend):
+    """Responde a partir dos cassetes, com latência simulada (sem rede)."""
+
+    def __init__(self, cassette_dir: os.PathLike = DEFAULT_CASSETTE_DIR,
+                 latency: Optional[LatencyModel] = None) -> None:
+        super().__init__()
+        self.cassette_dir = Path(cassette_dir)
+        self.latency = latency or LatencyModel()
+        self.base_url = f"replay://{self.cassette_dir}"
+        self._cassettes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _load(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            cassette = self._cassettes.get(key)
+        if cassette is None:
+            path = self.cassette_dir / f"{key}.json"
+            try:
+                cassette = json.loads(path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                with self._lock:
+                    self.stats["misses"] += 1
+                raise CassetteMiss(f"sem cassete para a requisição {key[:12]} em {self.cassette_dir}")
+            with self._lock:
+                self._cassettes[key] = cassette
+        with self._lock:
+            self.stats["hits"] += 1
+        return cassette
+
+    def complete(self, **kwargs: Any) -> Any:
+        cassette = self._load(request_key(kwargs))
+        content = cassette["response"]["content"]
+        reason = cassette["response"].get("finish_reason") or "stop"
+        model = kwargs.get("model", "")
+        total = self.latency.sample(float(cassette.get("latency") or 0.0))
+        timeout = kwargs.get("timeout")
+        if timeout is not None and total > timeout:
+            time.sleep(max(timeout, 0.0))
+            raise TimeoutError(f"replay: latência simulada {total:.2f}s > timeout {timeout:.2f}s")
+        if not kwargs.get("stream"):
+            time.sleep(total)
+            return _completion(content, reason, model)
+        recorded_ttft = cassette.get("ttft")
+        ratio = (recorded_ttft / cassette["latency"]) if recorded_ttft and cassette.get("latency") \
+            else self.latency.ttft
+        return self._stream(content, reason, model, total, min(max(ratio, 0.0), 1.0))
+
+    @staticmethod
+    def _stream(content: str, reason: str, model: str, total: float, ratio: float) -> Iterator[Any]:
+        pieces = [content[i:i + _REPLAY_CHUNK_CHARS] for i in range(0, len(content), _REPLAY_CHUNK_CHARS)]
+        time.sleep(total * ratio)
+        step = (total * (1 - ratio)) / max(len(pieces), 1)
+        for piece in pieces:
+            if step:
+                time.sleep(step)
+            yield _chunk(piece, None, model)
+        yield _chunk(None, reason, model)
+
+
+# =============================================================================
+# Seleção por ambiente
+# =============================================================================
+def get_backend(client: Any = None) -> Any:
+    """
+    Backend conforme SYNAPSE_LLM_BACKEND. Em replay, o client é dispensado
+    (sem rede nem OPENAI_API_KEY); nos demais, se omitido, usa o client
+    compartilhado do processo (llm_pool.get_llm_client).
+    """
+    mode = (os.getenv("SYNAPSE_LLM_BACKEND") or "openai").strip().lower()
+    cassette_dir = os.getenv("SYNAPSE_CASSETTE_DIR") or str(DEFAULT_CASSETTE_DIR)
+    if mode == "replay":
+        return ReplayBackend(cassette_dir, LatencyModel.from_spec(os.getenv("SYNAPSE_REPLAY_LATENCY")))
+    if client is None:
+        from knowledge.validators.llm_pool import get_llm_client
+        client = get_llm_client()
+    if mode == "record":
+        return RecordingBackend(OpenAIBackend(client), cassette_dir)
+    if mode != "openai":
+        raise ValueError(f"SYNAPSE_LLM_BACKEND inválido: {mode}")
+    return OpenAIBackend(client)
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Camada de chamada ao LLM (prazo, backoff, hedging, circuit breaker)
+#
+# Todas as chamadas chat.completions (engine, validadores, vNext) passam por
+# aqui, em vez de client.chat.completions.create sem timeout:
+# - prazo por chamada (deadline): cada tentativa recebe só o tempo restante
+#   (timeout do SDK); no assíncrono a espera também é limitada no chamador;
+# - backoff exponencial com teto e jitter, só para erros transitórios
+#   (timeout, conexão, 408/409/429/5xx), respeitando Retry-After;
+# - hedging opcional (só em acall_chat): se a resposta demora mais que o
+#   p95 recente do endpoint, uma segunda requisição idêntica é disparada, vence
+#   a primeira que chegar e a outra é cancelada. call_chat chama a API na
+#   própria thread: uma requisição síncrona não tem como ser cancelada, e a
+#   perdedora seguiria ocupando conexão e cota;
+# - circuit breaker por (endpoint, modelo): após falhas seguidas, as chamadas
+#   falham de imediato (CircuitOpen) até o período de espera terminar;
+# - uso de tokens de cada resposta (prompt, cached — prefixo reaproveitado
+#   pelo cache de prompt do provedor — e completion) somado por endpoint e
+#   guardado nas últimas USAGE_WINDOW respostas (usage_log); em streaming
+#   pede-se stream_options={"include_usage": True} e o uso vem no último chunk.
+#
+# Versões síncrona (call_chat) e assíncrona (acall_chat, para AsyncOpenAI)
+# compartilham breaker, latências e política de retry.
+#
+# Configuração (variáveis de ambiente):
+#   SYNAPSE_LLM_DEADLINE   prazo padrão por chamada, em segundos (padrão: 90)
+#   SYNAPSE_LLM_ATTEMPTS   tentativas por chamada (padrão: 3)
+#   SYNAPSE_LLM_HEDGE=1    liga o hedging por padrão (acall_chat)
+#   SYNAPSE_LLM_STREAM_USAGE=0  não pede o uso em streaming (provedores que
+#                          não aceitam stream_options)
+#
+# Teste local: tests/fake_llm_server.py (servidor compatível com a API).
+# =============================================================================
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_DEADLINE = 90.0
+DEFAULT_ATTEMPTS = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+# Hedging: atraso = p95 das latências recentes (com piso), ou o padrão sem histórico
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_DELAY = 1.0
+HEDGE_DEFAULT_DELAY = 10.0
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30.0
+
+USAGE_WINDOW = 500
+
+_RETRYABLE_STATUS = {408, 409, 429}
+_RETRYABLE_NAMES = {"APITimeoutError", "APIConnectionError", "RateLimitError",
+                    "InternalServerError", "Timeout", "TimeoutError", "ConnectError",
+                    "ReadTimeout", "ConnectTimeout", "RemoteProtocolError"}
+
+class LLMCallError(RuntimeError):
+    """Falha da chamada ao LLM após as tentativas permitidas."""
+
+
+class DeadlineExceeded(LLMCallError):
+    """O prazo da chamada terminou antes de uma resposta."""
+
+
+class CircuitOpen(LLMCallError):
+    """Endpoint/modelo com falhas seguidas: chamada recusada sem tentar."""
+
+
+# =============================================================================
+# Classificação de erros
+# =============================================================================
+def _status(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Erros transitórios: timeout, conexão, 408/409/429 e 5xx."""
+    if isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    code = _status(exc)
+    if code is not None:
+        return code in _RETRYABLE_STATUS or code >= 500
+    return type(exc).__name__ in _RETRYABLE_NAMES
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def backoff_delay(attempt: int, exc: Optional[BaseException] = None) -> float:
+    """Espera antes da tentativa seguinte: exponencial com teto e jitter (ou Retry-After)."""
+    hinted = _retry_after(exc) if exc is not None else None
+    if hinted is not None:
+        return min(max(hinted, 0.0), BACKOFF_CAP)
+    return min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+# =============================================================================
+# Estado por endpoint/modelo
+# =============================================================================
+class CircuitBreaker:
+    """Fechado → aberto após `threshold` falhas seguidas → meio-aberto após `reset_after`."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_after: float = BREAKER_RESET) -> None:
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            # meio-aberto: uma chamada de prova por vez
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self) -> None:
+        """Chamada sem veredito sobre o endpoint (ex.: 400): só libera a prova do meio-aberto."""
+        with self._lock:
+            self._probing = False
+
+
+class LatencyTracker:
+    """Janela das latências recentes (segundos) de chamadas bem-sucedidas."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            data = sorted(self._samples)
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+
+class Endpoint:
+    def __init__(self, key: Tuple[str, str]) -> None:
+        self.key = key
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                      "deadline_exceeded": 0, "circuit_open": 0, "failures": 0,
+                      "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += n
+
+    def hedge_delay(self) -> float:
+        p = self.latency.quantile(HEDGE_QUANTILE)
+        return HEDGE_DEFAULT_DELAY if p is None else max(p, HEDGE_MIN_DELAY)
+
+
+_ENDPOINTS: Dict[Tuple[str, str], Endpoint] = {}
+_ENDPOINTS_LOCK = threading.Lock()
+
+
+def endpoint_for(client: Any, model: str) -> Endpoint:
+    key = (str(getattr(client, "base_url", "") or ""), model)
+    with _ENDPOINTS_LOCK:
+        ep = _ENDPOINTS.get(key)
+        if ep is None:
+            ep = _ENDPOINTS[key] = Endpoint(key)
+        return ep
+
+
+def endpoint_stats() -> Dict[str, Dict[str, Any]]:
+    """Contadores, uso de tokens, estado do breaker e p95 por endpoint/modelo (para logs/benchmarks)."""
+    with _ENDPOINTS_LOCK:
+        eps = list(_ENDPOINTS.values())
+    return {
+        f"{ep.key[0]}|{ep.key[1]}": dict(
+            ep.stats,
+            cached_ratio=round(ep.stats["cached_tokens"] / ep.stats["prompt_tokens"], 3)
+            if ep.stats["prompt_tokens"] else 0.0,
+            breaker=ep.breaker.state,
+            p95=ep.latency.quantile(0.95),
+        )
+        for ep in eps
+    }
+
+
+# =============================================================================
+# Uso de tokens (prompt caching)
+# =============================================================================
+_USAGE_LOG: Deque[Dict[str, Any]] = deque(maxlen=USAGE_WINDOW)
+
+
+def _field(obj: Any, name: str) -> Any:
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def record_usage(ep: Endpoint, usage: Any) -> None:
+    """Soma o uso da resposta no endpoint e o guarda em usage_log (ignora resposta sem usage)."""
+    if usage is None:
+        return
+    details = _field(usage, "prompt_tokens_details")
+    entry = {
+        "endpoint": ep.key[0],
+        "model": ep.key[1],
+        "prompt_tokens": int(_field(usage, "prompt_tokens") or 0),
+        "cached_tokens": int((_field(details, "cached_tokens") if details is not None else 0) or 0),
+        "completion_tokens": int(_field(usage, "completion_tokens") or 0),
+        "at": time.time(),
+    }
+    for name in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+        ep.count(name, entry[name])
+    _USAGE_LOG.append(entry)
+
+
+def usage_log() -> List[Dict[str, Any]]:
+    """Uso de tokens das últimas respostas (mais antiga primeiro)."""
+    return list(_USAGE_LOG)
+
+
+def _stream_usage_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    if params.get("stream") and "stream_options" not in params and os.getenv("SYNAPSE_LLM_STREAM_USAGE", "1") != "0":
+        return dict(params, stream_options={"include_usage": True})
+    return params
+
+
+def _metered_stream(ep: Endpoint, stream: Any) -> Iterator[Any]:
+    for chunk in stream:
+        record_usage(ep, getattr(chunk, "usage", None))
+        yield chunk
+
+
+async def _ametered_stream(ep: Endpoint, stream: Any) -> AsyncIterator[Any]:
+    async for chunk in stream:
+        record_usage(ep, getattr(chunk, "usage", None))
+        yield chunk
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _defaults(deadline: Optional[float], attempts: Optional[int]) -> Tuple[float, int]:
+    if deadline is None:
+        deadline = _env_float("SYNAPSE_LLM_DEADLINE", DEFAULT_DEADLINE)
+    if attempts is None:
+        attempts = max(1, int(_env_float("SYNAPSE_LLM_ATTEMPTS", DEFAULT_ATTEMPTS)))
+    return deadline, attempts
+
+
+# =============================================================================
+# Chamada síncrona
+# =============================================================================
+def _sync_attempt(client: Any, ep: Endpoint, end: float, kwargs: Dict[str, Any]) -> Any:
+    t0 = time.monotonic()
+    if t0 >= end:
+        raise DeadlineExceeded(f"prazo esgotado ({ep.key[1]})")
+    try:
+        resp = client.chat.completions.create(timeout=end - t0, **kwargs)
+    except Exception as exc:
+        if is_retryable(exc) and time.monotonic() >= end:
+            raise DeadlineExceeded(f"prazo esgotado ({ep.key[1]})") from exc
+        raise
+    ep.latency.add(time.monotonic() - t0)
+    return resp
+
+
+def call_chat(
+    client: Any,
+    *,
+    model: str,
+    messages: List[Dict[str, str]],
+    deadline: Optional[float] = None,
+    attempts: Optional[int] = None,
+    **params: Any,
+) -> Any:
+    """
+    client.chat.completions.create com prazo total `deadline` (segundos),
+    retry com backoff para erros transitórios e circuit breaker. Cada
+    tentativa recebe o tempo restante como timeout do SDK. Erros não
+    transitórios (ex.: 400/401/404) sobem sem retry. Com stream=True, o prazo
+    vale até o início da resposta.
+    """
+    deadline, attempts = _defaults(deadline, attempts)
+    ep = endpoint_for(client, model)
+    ep.count("calls")
+    end = time.monotonic() + deadline
+    params = _stream_usage_params(params)
+    kwargs = dict(params, model=model, messages=messages)
+
+    last: Optional[BaseException] = None
+    for attempt in range(attempts):
+        if not ep.breaker.allow():
+            ep.count("circuit_open")
+            raise CircuitOpen(f"circuito aberto para {ep.key[1]} ({ep.key[0] or 'api'})") from last
+        if attempt:
+            ep.count("retries")
+        try:
+            resp = _sync_attempt(client, ep, end, kwargs)
+        except DeadlineExceeded:
+            ep.count("deadline_exceeded")
+            ep.breaker.record_failure()
+            raise
+        except Exception as exc:
+            if not is_retryable(exc):
+                ep.breaker.release()
+                raise
+            ep.breaker.record_failure()
+            last = exc
+            wait_s = backoff_delay(attempt, exc)
+            if attempt + 1 >= attempts or time.monotonic() + wait_s >= end:
+                break
+            time.sleep(wait_s)
+            continue
+        ep.breaker.record_success()
+        if params.get("stream"):
+            return _metered_stream(ep, resp)
+        record_usage(ep, getattr(resp, "usage", None))
+        return resp
+
+    ep.count("failures")
+    raise LLMCallError(f"falha ao consultar {model} após {attempts} tentativa(s): {last}") from last
+
+
+# =============================================================================
+# Chamada assíncrona (AsyncOpenAI)
+# =============================================================================
+async def _async_attempt(client: Any, ep: Endpoint, end: float, hedge: bool, kwargs: Dict[str, Any]) -> Any:
+    loop = asyncio.get_running_loop()
+
+    async def create() -> Tuple[Any, float]:
+        t0 = loop.time()
+        resp = await client.chat.completions.create(timeout=max(end - time.monotonic(), 0.001), **kwargs)
+        return resp, loop.time() - t0
+
+    tasks = [asyncio.ensure_future(create())]
+    try:
+        delay = ep.hedge_delay()
+        if hedge and time.monotonic() + delay < end:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                ep.count("hedges")
+                tasks.append(asyncio.ensure_future(create()))
+
+        pending = set(tasks)
+        errors: List[BaseException] = []
+        while pending:
+            left = end - time.monotonic()
+            if left <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                exc = t.exception()
+                if exc is None:
+                    resp, elapsed = t.result()
+                    ep.latency.add(elapsed)
+                    if t is not tasks[0]:
+                        ep.count("hedge_wins")
+                    return resp
+                errors.append(exc)
+        if errors and not pending:
+            raise errors[0]
+        raise DeadlineExceeded(f"prazo esgotado ({ep.key[1]})")
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+async def acall_chat(
+    client: Any,
+    *,
+    model: str,
+    messages: List[Dict[str, str]],
+    deadline: Optional[float] = None,
+    attempts: Optional[int] = None,
+    hedge: Optional[bool] = None,
+    **params: Any,
+) -> Any:
+    """
+    Versão assíncrona de call_chat (client AsyncOpenAI), com hedging opcional
+    (padrão: SYNAPSE_LLM_HEDGE); a requisição perdedora é cancelada.
+    """
+    deadline, attempts = _defaults(deadline, attempts)
+    if hedge is None:
+        hedge = os.getenv("SYNAPSE_LLM_HEDGE", "0") == "1"
+    ep = endpoint_for(client, model)
+    ep.count("calls")
+    end = time.monotonic() + deadline
+    params = _stream_usage_params(params)
+    kwargs = dict(params, model=model, messages=messages)
+    hedge = hedge and not params.get("stream")
+
+    last: Optional[BaseException] = None
+    for attempt in range(attempts):
+        if not ep.breaker.allow():
+            ep.count("circuit_open")
+            raise CircuitOpen(f"circuito aberto para {ep.key[1]} ({ep.key[0] or 'api'})") from last
+        if attempt:
+            ep.count("retries")
+        try:
+            resp = await _async_attempt(client, ep, end, hedge, kwargs)
+        except DeadlineExceeded:
+            ep.count("deadline_exceeded")
+            ep.breaker.record_failure()
+            raise
+        except Exception as exc:
+            if not is_retryable(exc):
+                ep.breaker.release()
+                raise
+            ep.breaker.record_failure()
+            last = exc
+            wait_s = backoff_delay(attempt, exc)
+            if attempt + 1 >= attempts or time.monotonic() + wait_s >= end:
+                break
+            await asyncio.sleep(wait_s)
+            continue
+        ep.breaker.record_success()
+        if params.get("stream"):
+            return _ametered_stream(ep, resp)
+        record_usage(ep, getattr(resp, "usage", None))
+        return resp
+
+    ep.count("failures")
+    raise LLMCallError(f"falha ao consultar {model} após {attempts} tentativa(s): {last}") from last
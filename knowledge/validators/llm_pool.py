@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Client LLM único por processo (pool de conexões compartilhado)
+#
+# As páginas criavam um OpenAI() a cada clique e a avaliação semântica um
+# AsyncOpenAI a cada validação (asyncio.run): cada client com o seu pool
+# HTTP, e cada validação pagava DNS + TCP + TLS de novo. Aqui:
+# - get_llm_client(api_key, base_url) devolve sempre o mesmo OpenAI por
+#   (chave, base_url, organização) no processo. O módulo fica em sys.modules,
+#   então todas as sessões e páginas do Streamlit, o engine e os
+#   *_semantic_validator.py (que recebem o client da página) usam o mesmo pool;
+# - o pool (httpx) mantém conexões keep-alive com limites ajustáveis e usa
+#   HTTP/2 quando o pacote h2 está instalado (várias requisições simultâneas
+#   numa só conexão);
+# - um AsyncOpenAI só funciona no event loop em que foi criado. run_sync()
+#   executa corrotinas num event loop do processo (thread própria) e
+#   get_async_llm_client() guarda um AsyncOpenAI por loop (backends de
+#   llm_backend respondem por backend.async_client()): no loop do
+#   processo ele vive enquanto o processo viver; em loops próprios (lote)
+#   vale até aclose_async_clients();
+# - pool_stats() mostra, por pool, requisições, conexões abertas no total,
+#   abertas agora, ociosas, ativas (e o pico) e a taxa de reaproveitamento,
+#   para dimensionar os limites pelo nº de usuários simultâneos.
+#
+# Configuração (variáveis de ambiente):
+#   SYNAPSE_LLM_POOL_MAX        conexões simultâneas por pool (padrão: 64)
+#   SYNAPSE_LLM_POOL_KEEPALIVE  conexões ociosas mantidas abertas (padrão: 16)
+#   SYNAPSE_LLM_POOL_IDLE       segundos até fechar conexão ociosa (padrão: 60)
+#   SYNAPSE_LLM_HTTP2=0|1       desliga/liga HTTP/2 (padrão: ligado se h2 instalado)
+# =============================================================================
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+from knowledge.validators.llm_backend import LLMBackend
+
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_KEEPALIVE = 16
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+T = TypeVar("T")
+ClientKey = Tuple[str, str, str]
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def pool_config() -> Dict[str, Any]:
+    """Limites do pool e uso de HTTP/2 conforme o ambiente."""
+    flag = (os.getenv("SYNAPSE_LLM_HTTP2") or "").strip()
+    has_h2 = importlib.util.find_spec("h2") is not None
+    return {
+        "max_connections": max(1, int(_env_number("SYNAPSE_LLM_POOL_MAX", DEFAULT_MAX_CONNECTIONS))),
+        "max_keepalive": max(0, int(_env_number("SYNAPSE_LLM_POOL_KEEPALIVE", DEFAULT_MAX_KEEPALIVE))),
+        "keepalive_expiry": max(0.0, _env_number("SYNAPSE_LLM_POOL_IDLE", DEFAULT_KEEPALIVE_EXPIRY)),
+        "http2": has_h2 and flag != "0",
+    }
+
+
+# =============================================================================
+# Estatísticas do pool
+# =============================================================================
+class PoolMeter:
+    """Contadores de um pool httpx (conexões lidas do pool do httpcore)."""
+
+    def __init__(self, kind: str, base_url: str, config: Dict[str, Any]) -> None:
+        self.kind = kind
+        self.base_url = base_url
+        self.config = dict(config)
+        self.pool: Any = None  # httpcore.ConnectionPool / AsyncConnectionPool
+        self.requests = 0
+        self.opened = 0
+        self.peak_active = 0
+        self._seen: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def _connections(self) -> List[Any]:
+        try:
+            return list(self.pool.connections)
+        except Exception:
+            return []
+
+    def scan(self) -> Dict[str, int]:
+        conns = self._connections()
+        idle = http2 = 0
+        with self._lock:
+            for conn in conns:
+                if conn not in self._seen:
+                    self._seen.add(conn)
+                    self.opened += 1
+                try:
+                    idle += bool(conn.is_idle())
+                    http2 += "HTTP/2" in conn.info()
+                except Exception:
+                    pass
+            self.peak_active = max(self.peak_active, len(conns) - idle)
+        return {"open": len(conns), "idle": idle, "active": len(conns) - idle, "http2_connections": http2}
+
+    def on_request(self, request: Any = None) -> None:
+        with self._lock:
+            self.requests += 1
+        self.scan()
+
+    def on_response(self, response: Any = None) -> None:
+        self.scan()
+
+    async def aon_request(self, request: Any = None) -> None:
+        self.on_request(request)
+
+    async def aon_response(self, response: Any = None) -> None:
+        self.on_response(response)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = self.scan()
+        with self._lock:
+            requests, opened, peak = self.requests, self.opened, self.peak_active
+        return {
+            "kind": self.kind,
+            "base_url": self.base_url,
+            **self.config,
+            "requests": requests,
+            "connections_opened": opened,
+            **now,
+            "peak_active": peak,
+            # fração das requisições que reaproveitou conexão já aberta
+            "reuse_ratio": round(1 - opened / requests, 3) if requests else None,
+        }
+
+
+_METERS: List[PoolMeter] = []
+_METERS_LOCK = threading.Lock()
+
+
+def _new_meter(kind: str, base_url: str, config: Dict[str, Any]) -> PoolMeter:
+    meter = PoolMeter(kind, base_url, config)
+    with _METERS_LOCK:
+        _METERS.append(meter)
+    return meter
+
+
+def _drop_meter(meter: PoolMeter) -> None:
+    with _METERS_LOCK:
+        if meter in _METERS:
+            _METERS.remove(meter)
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    """Estado de cada pool ativo no processo (síncrono e assíncronos)."""
+    with _METERS_LOCK:
+        meters = list(_METERS)
+    return [m.snapshot() for m in meters]
+
+
+# =============================================================================
+# Clients HTTP (httpx, instalado junto com o pacote openai)
+# =============================================================================
+def _http_client(kind: str, base_url: str) -> Tuple[Any, PoolMeter]:
+    import httpx
+    from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+    config = pool_config()
+    limits = httpx.Limits(
+        max_connections=config["max_connections"],
+        max_keepalive_connections=config["max_keepalive"],
+        keepalive_expiry=config["keepalive_expiry"],
+    )
+    meter = _new_meter(kind, base_url, config)
+    if kind == "async":
+        transport = httpx.AsyncHTTPTransport(http2=config["http2"], limits=limits)
+        hooks = {"request": [meter.aon_request], "response": [meter.aon_response]}
+        client = DefaultAsyncHttpxClient(transport=transport, event_hooks=hooks)
+    else:
+        transport = httpx.HTTPTransport(http2=config["http2"], limits=limits)
+        hooks = {"request": [meter.on_request], "response": [meter.on_response]}
+        client = DefaultHttpxClient(transport=transport, event_hooks=hooks)
+    meter.pool = getattr(transport, "_pool", None)
+    return client, meter
+
+
+def _client_key(api_key: Optional[str], base_url: Optional[str], organization: Optional[str]) -> ClientKey:
+    return (
+        api_key or os.getenv("OPENAI_API_KEY") or "",
+        str(base_url or os.getenv("OPENAI_BASE_URL") or ""),
+        organization or os.getenv("OPENAI_ORG_ID") or "",
+    )
+
+
+# =============================================================================
+# Client síncrono (um por processo e credencial)
+# =============================================================================
+_CLIENTS: Dict[ClientKey, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_llm_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                   organization: Optional[str] = None) -> Any:
+    """
+    OpenAI compartilhado por (api_key, base_url, organização). Sem retry no
+    SDK (max_retries=0): prazo e backoff ficam em llm_call. Não feche o client.
+    """
+    key = _client_key(api_key, base_url, organization)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            from openai import OpenAI
+
+            http_client, _ = _http_client("sync", key[1])
+            client = _CLIENTS[key] = OpenAI(
+                api_key=key[0] or None,
+                base_url=key[1] or None,
+                organization=key[2] or None,
+                max_retries=0,
+                http_client=http_client,
+            )
+        return client
+
+
+# =============================================================================
+# Event loop do processo e AsyncOpenAI por loop
+# =============================================================================
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _process_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="synapse-llm-loop", daemon=True).start()
+            _LOOP = loop
+        return _LOOP
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    Executa a corrotina no event loop do processo e espera o resultado (de
+    qualquer thread, inclusive de dentro de outro loop). Os AsyncOpenAI
+    criados nela sobrevivem à chamada, com as conexões abertas.
+    """
+    loop = _process_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync chamado de dentro do event loop do processo; use await")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()  # type: ignore[arg-type]
+
+
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ClientKey, Tuple[Any, PoolMeter]]]" = (
+    weakref.WeakKeyDictionary()
+)
+_ASYNC_LOCK = threading.Lock()
+
+
+def get_async_llm_client(client: Any) -> Optional[Any]:
+    """
+    AsyncOpenAI com as credenciais do client síncrono, compartilhado no event
+    loop corrente (None se o SDK não estiver disponível ou o client não tiver
+    api_key). Um backend (llm_backend.LLMBackend) decide por si, via
+    backend.async_client() — gravação e reprodução de cassetes ficam no
+    client síncrono. Chamar de dentro de uma corrotina.
+    """
+    if isinstance(client, LLMBackend):
+        return client.async_client()
+    api_key = getattr(client, "api_key", None)
+    if not api_key:
+        return None
+    try:
+        from openai import AsyncOpenAI
+    except Exception:
+        return None
+    loop = asyncio.get_running_loop()
+    key = _client_key(api_key, getattr(client, "base_url", None), getattr(client, "organization", None))
+    with _ASYNC_LOCK:
+        clients = _ASYNC_CLIENTS.setdefault(loop, {})
+        hit = clients.get(key)
+        if hit is None:
+            try:
+                http_client, meter = _http_client("async", key[1])
+                aclient = AsyncOpenAI(
+                    api_key=key[0],
+                    base_url=key[1] or None,
+                    organization=key[2] or None,
+                    max_retries=0,  # retry/backoff ficam em llm_call
+                    http_client=http_client,
+                )
+            except Exception:
+                return None
+            hit = clients[key] = (aclient, meter)
+        return hit[0]
+
+
+async def aclose_async_clients() -> None:
+    """Fecha os AsyncOpenAI do event loop corrente (fim de um loop próprio, ex.: lote)."""
+    with _ASYNC_LOCK:
+        clients = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), {})
+    for aclient, meter in clients.values():
+        _drop_meter(meter)
+        try:
+            await aclient.close()
+        except Exception:
+            pass
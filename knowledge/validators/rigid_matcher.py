@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Matcher multi-padrão do rígido (passada única)
+#
+# Em vez de até 2×N re.search por documento (texto + fallback sem acentos),
+# os padrões de um checklist são combinados em uma única alternância com
+# grupos nomeados e aplicados ao texto sem acentos, da esquerda para a direita:
+# - pré-filtro por prefixos literais (str.find): a alternância só é testada,
+#   ancorada, nas posições onde algum prefixo ocorre;
+# - a cada item encontrado, ele sai da alternância e o teste é repetido na
+#   mesma posição, de modo que nenhum item "some" por sobreposição;
+# - o custo total fica O(documento), independente do tamanho do checklist;
+# - scan_checklists junta os checklists de vários artefatos numa só
+#   alternância: um documento com TR, contrato e pesquisa de preços anexos
+#   é varrido uma vez.
+#
+# Benchmark: python -m knowledge.validators.rigid_matcher
+# =============================================================================
+from __future__ import annotations
+
+import heapq
+import re
+from bisect import bisect_right
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Sequence, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+    from re import _constants as sre_constants
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse  # type: ignore
+    import sre_constants  # type: ignore
+
+from knowledge.validators.checklist_registry import RIGID_FLAGS, CompiledChecklist, CompiledItem
+
+_GLOBAL_FLAGS_RX = re.compile(r"^\(\?([aiLmsux]+)\)")
+_MAX_PREFIXES = 64
+_COMBINED_CACHE_SIZE = 256
+
+
+# =============================================================================
+# Análise dos padrões
+# =============================================================================
+def _class_literals(av) -> Optional[List[str]]:
+    """Caracteres de uma classe [..] simples (sem negação/categorias/faixas)."""
+    chars: List[str] = []
+    for op, val in av:
+        if op is sre_constants.LITERAL:
+            chars.append(chr(val).lower())
+        else:
+            return None
+    return sorted(set(chars))
+
+
+def _walk_prefixes(data) -> Tuple[Set[str], bool]:
+    """
+    Retorna (prefixos, completo). Todo match do (sub)padrão começa por um dos
+    prefixos; `completo` indica que o trecho inteiro é literal e a
+    concatenação pode continuar no elemento seguinte.
+    """
+    acc: Set[str] = {""}
+    data = list(data)
+    for pos, (op, av) in enumerate(data):
+        if op is sre_constants.LITERAL:
+            acc = {a + chr(av).lower() for a in acc}
+            continue
+        if op is sre_constants.IN:
+            chars = _class_literals(av)
+            if chars is None or len(acc) * len(chars) > _MAX_PREFIXES:
+                return acc, False
+            acc = {a + c for a in acc for c in chars}
+            continue
+        if op is sre_constants.SUBPATTERN:
+            sub, complete = _walk_prefixes(av[-1])
+        elif op is sre_constants.BRANCH:
+            parts = [_walk_prefixes(b) for b in av[1]]
+            sub = set().union(*(p for p, _ in parts))
+            complete = all(c for _, c in parts)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            lo, _hi, item = av
+            sub, _ = _walk_prefixes(item)
+            if lo == 0:
+                # opcional: o match começa pelo item repetido ou pelo que vem depois
+                rest, _ = _walk_prefixes(data[pos + 1:])
+                sub = sub | rest
+            complete = False
+        else:
+            return acc, False
+        if len(acc) * len(sub) > _MAX_PREFIXES:
+            return acc, False
+        acc = {a + s for a in acc for s in sub}
+        if not complete:
+            return acc, False
+    return acc, True
+
+
+def literal_prefixes(pattern: str) -> Optional[FrozenSet[str]]:
+    """
+    Prefixos literais obrigatórios (minúsculos) de um padrão, ou None quando
+    algum ramo pode começar por algo não literal (sem pré-filtro possível).
+    """
+    try:
+        parsed = sre_parse.parse(pattern, RIGID_FLAGS)
+    except re.error:
+        return None
+    prefixes, _ = _walk_prefixes(parsed.data)
+    if not prefixes or "" in prefixes:
+        return None
+    return frozenset(prefixes)
+
+
+def _combinable_source(pattern: str) -> Optional[str]:
+    """
+    Ajusta o padrão para entrar na alternância combinada: flags globais
+    iniciais viram escopo local (ou somem, se já cobertas por RIGID_FLAGS).
+    Padrões com grupos nomeados ou retrorreferências ficam de fora.
+    """
+    if "(?P" in pattern or re.search(r"\\[1-9]", pattern):
+        return None
+    m = _GLOBAL_FLAGS_RX.match(pattern)
+    if m:
+        rest = pattern[m.end():]
+        extra = "".join(sorted(set(m.group(1)) - {"i", "s"}))
+        return f"(?{extra}:{rest})" if extra else rest
+    return pattern
+
+
+# =============================================================================
+# Matcher
+# =============================================================================
+class ChecklistMatcher:
+    """
+    Matcher de um checklist compilado. `scan` devolve {índice_do_item: span}
+    com o match mais à esquerda de cada item no texto sem acentos —
+    o mesmo resultado de `item.rx_no_accents.search(texto)` item a item.
+    """
+
+    def __init__(self, items: Sequence[CompiledItem]) -> None:
+        self._items = tuple(items)
+        self._sources: Dict[int, str] = {}
+        self._standalone: Dict[int, Pattern] = {}
+        self._prefixes: Dict[int, Optional[FrozenSet[str]]] = {}
+        self._cache: "OrderedDict[FrozenSet[int], Pattern]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        for idx, item in enumerate(self._items):
+            if item.rx_no_accents is None:
+                continue
+            src = item.rx_no_accents.pattern
+            combinable = _combinable_source(src)
+            if combinable is not None:
+                try:
+                    re.compile(f"(?P<_i{idx}>{combinable})", RIGID_FLAGS)
+                except re.error:
+                    combinable = None
+            if combinable is None:
+                self._standalone[idx] = item.rx_no_accents
+            else:
+                self._sources[idx] = combinable
+            self._prefixes[idx] = literal_prefixes(src)
+
+    @property
+    def indices(self) -> FrozenSet[int]:
+        """Itens cobertos pelo matcher (com regex válida)."""
+        return frozenset(self._sources) | frozenset(self._standalone)
+
+    def _combined(self, remaining: FrozenSet[int]) -> Pattern:
+        with self._lock:
+            rx = self._cache.get(remaining)
+            if rx is not None:
+                self._cache.move_to_end(remaining)
+                return rx
+        source = "|".join(f"(?P<_i{i}>{self._sources[i]})" for i in sorted(remaining))
+        rx = re.compile(source, RIGID_FLAGS)
+        with self._lock:
+            self._cache[remaining] = rx
+            while len(self._cache) > _COMBINED_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return rx
+
+    def scan(self, text: str, only: Optional[Iterable[int]] = None) -> Dict[int, Tuple[int, int]]:
+        """
+        Varre o texto (sem acentos, minúsculo) uma única vez.
+        `only` restringe a varredura a um subconjunto de itens.
+        """
+        wanted = self.indices if only is None else self.indices & frozenset(only)
+        hits: Dict[int, Tuple[int, int]] = {}
+
+        # pré-filtro: ocorrências dos prefixos literais, em ordem de posição
+        by_prefix: Dict[str, Set[int]] = {}
+        unanchored: Set[int] = set()
+        for idx in wanted:
+            prefixes = self._prefixes.get(idx)
+            if prefixes is None or idx in self._standalone:
+                unanchored.add(idx)
+                continue
+            for p in prefixes:
+                by_prefix.setdefault(p, set()).add(idx)
+        heap: List[Tuple[int, str]] = []
+        for p in by_prefix:
+            pos = text.find(p)
+            if pos >= 0:
+                heap.append((pos, p))
+        heapq.heapify(heap)
+        remaining = frozenset(i for p in by_prefix for i in by_prefix[p])
+
+        # todo match de um item começa em uma ocorrência de seus prefixos:
+        # basta testar a alternância ancorada nessas posições, da esquerda p/ direita
+        while heap and remaining:
+            pos, p = heapq.heappop(heap)
+            at_pos = [p]
+            while heap and heap[0][0] == pos:
+                at_pos.append(heapq.heappop(heap)[1])
+            while remaining and any(by_prefix[q] & remaining for q in at_pos):
+                m = self._combined(remaining).match(text, pos)
+                if m is None:
+                    break
+                idx = int(m.lastgroup[2:])
+                hits[idx] = m.span()
+                remaining = remaining - {idx}
+            for q in at_pos:
+                if by_prefix[q] & remaining:
+                    nxt = text.find(q, pos + 1)
+                    if nxt >= 0:
+                        heapq.heappush(heap, (nxt, q))
+
+        # itens sem prefixo literal ou fora da alternância: busca convencional
+        for idx in unanchored:
+            rx = self._standalone.get(idx) or self._items[idx].rx_no_accents
+            m = rx.search(text)
+            if m:
+                hits[idx] = m.span()
+        return hits
+
+
+_MATCHERS: Dict[Tuple[str, str], ChecklistMatcher] = {}
+_MATCHERS_LOCK = threading.Lock()
+
+
+def get_matcher(checklist: CompiledChecklist) -> ChecklistMatcher:
+    """Matcher em cache por (arquivo, hash do conteúdo) do checklist."""
+    key = (checklist.path, checklist.sha256)
+    with _MATCHERS_LOCK:
+        matcher = _MATCHERS.get(key)
+        if matcher is None:
+            for old in [k for k in _MATCHERS if k[0] == checklist.path]:
+                del _MATCHERS[old]
+            matcher = _MATCHERS[key] = ChecklistMatcher(checklist.compiled)
+        return matcher
+
+
+_MULTI: "OrderedDict[Tuple[Tuple[str, str], ...], Tuple[ChecklistMatcher, Tuple[int, ...]]]" = OrderedDict()
+_MULTI_CACHE_SIZE = 32
+
+
+def _multi_matcher(checklists: Sequence[CompiledChecklist]) -> Tuple[ChecklistMatcher, Tuple[int, ...]]:
+    """Matcher com os itens de vários checklists em sequência e o deslocamento de cada um."""
+    key = tuple((c.path, c.sha256) for c in checklists)
+    with _MATCHERS_LOCK:
+        hit = _MULTI.get(key)
+        if hit is not None:
+            _MULTI.move_to_end(key)
+            return hit
+    offsets = [0]
+    items: List[CompiledItem] = []
+    for c in checklists:
+        items.extend(c.compiled)
+        offsets.append(len(items))
+    hit = (ChecklistMatcher(items), tuple(offsets))
+    with _MATCHERS_LOCK:
+        _MULTI[key] = hit
+        while len(_MULTI) > _MULTI_CACHE_SIZE:
+            _MULTI.popitem(last=False)
+    return hit
+
+
+def scan_checklists(
+    checklists: Sequence[CompiledChecklist],
+    text: str,
+    only: Optional[Sequence[Optional[Iterable[int]]]] = None,
+) -> List[Dict[int, Tuple[int, int]]]:
+    """
+    Vários checklists (artefatos do mesmo documento) numa única varredura do
+    texto. Devolve, por checklist, {índice_do_item: span} como ChecklistMatcher.scan;
+    `only[k]` restringe os itens do k-ésimo checklist (None = todos).
+    """
+    if not checklists:
+        return []
+    if len(checklists) == 1:
+        return [get_matcher(checklists[0]).scan(text, only=only[0] if only else None)]
+    matcher, offsets = _multi_matcher(checklists)
+    wanted: Optional[Set[int]] = None
+    if only is not None and any(sel is not None for sel in only):
+        wanted = set()
+        for k, sel in enumerate(only):
+            span = range(offsets[k], offsets[k + 1])
+            wanted.update(span if sel is None else (offsets[k] + i for i in sel))
+    hits = matcher.scan(text, only=wanted)
+    out: List[Dict[int, Tuple[int, int]]] = [{} for _ in checklists]
+    for idx, span in hits.items():
+        k = bisect_right(offsets, idx) - 1
+        out[k][idx - offsets[k]] = span
+    return out
+
+
+# =============================================================================
+# Benchmark (textos grandes de knowledge_base/manuais_modelos)
+# =============================================================================
+def _legacy_hits(items: Sequence[CompiledItem], text: str, text_no_accents: str) -> Set[int]:
+    """Estratégia anterior: até dois re.search por item."""
+    hits: Set[int] = set()
+    for idx, item in enumerate(items):
+        if item.rx is None or item.rx_no_accents is None:
+            continue
+        if re.search(item.pattern, text, RIGID_FLAGS) or re.search(
+            item.rx_no_accents.pattern, text_no_accents, RIGID_FLAGS
+        ):
+            hits.add(idx)
+    return hits
+
+
+def _benchmark(repeat: int = 3) -> None:
+    import glob
+    import os
+    import time
+
+    from knowledge.validators.validator_engine import (
+        load_compiled_checklist,
+        normalize_text,
+        remove_accents,
+    )
+
+    artefatos = ["ETP", "DFD", "TR", "CONTRATO", "CONTRATO_TECNICO", "EDITAL", "PESQUISA_PRECOS",
+                 "FISCALIZACAO", "OBRAS", "MAPA_RISCOS", "PCA", "ITF"]
+    files = sorted(glob.glob(os.path.join("knowledge_base", "manuais_modelos", "*.txt")),
+                   key=os.path.getsize, reverse=True)[:4]
+    print(f"{'arquivo':<48} {'KB':>6} {'legado (ms)':>12} {'matcher (ms)':>13} {'speedup':>8}")
+    for fp in files:
+        with open(fp, "r", encoding="utf-8", errors="ignore") as f:
+            text = normalize_text(f.read())
+        folded = remove_accents(text).lower()
+        checklists = [c for c in (load_compiled_checklist(a) for a in artefatos) if c]
+
+        t_legacy = t_new = float("inf")
+        for _ in range(repeat):
+            re.purge()
+            t0 = time.perf_counter()
+            legacy = [_legacy_hits(c.compiled, text, folded) for c in checklists]
+            t_legacy = min(t_legacy, time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            new = [set(get_matcher(c).scan(folded)) for c in checklists]
+            t_new = min(t_new, time.perf_counter() - t0)
+
+        flag = "" if legacy == new else "  (divergência!)"
+        name = os.path.basename(fp)[:46]
+        print(f"{name:<48} {len(text) // 1024:>6} {t_legacy * 1000:>12.1f} {t_new * 1000:>13.1f} "
+              f"{t_legacy / max(t_new, 1e-9):>7.1f}x{flag}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Cache semântico por item, com impressão digital das seções
+#
+# DFD/ETP/TR costumam voltar com uma ou duas seções alteradas, mas cada
+# validação reenviava o checklist inteiro ao modelo. Aqui:
+# - o documento é dividido em seções (títulos numerados, "#", linhas em
+#   caixa alta; seções longas são quebradas) e cada seção recebe um hash
+#   do seu texto normalizado;
+# - cada item do checklist (`itens` de load_checklist_items) depende das
+#   seções onde aparecem termos da sua descrição — ou do documento todo,
+#   quando nenhuma seção o menciona;
+# - o veredito do item (id, presente, adequacao_nota, justificativa,
+#   faltantes) é guardado no semantic_cache sob a chave
+#   (validador, modelo, template do prompt, item, hashes dessas seções);
+# - as seções são as do documento original (`source`), não as do texto
+#   recortado para o prompt: o recorte depende do documento inteiro, e uma
+#   edição em outra parte mudaria o hash de seções que o item nem usa;
+# - só os itens sem veredito válido vão ao modelo, numa única chamada.
+# Os *_semantic_validator.py chamam checklist_verdicts, que monta o prompt
+# padrão deles (instruções + checklist + documento) sobre cached_item_verdicts.
+# =============================================================================
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from knowledge.validators.checklist_registry import checklist_item_id
+from knowledge.validators.semantic_cache import cached_chat_json, get_semantic_cache, make_key
+from knowledge.validators.text_normalizer import fold_accents, normalize_document
+
+SECTION_MIN_CHARS = 300
+SECTION_MAX_CHARS = 4000
+
+# Títulos: markdown, numeração (1., 2.1, 3)) seguida de texto, ou caixa alta
+_HEADING_RX = re.compile(
+    r"^(?:#{1,6}\s+\S.*"
+    r"|\d{1,2}(?:\.\d{1,2})*[.)]?\s+\S.{0,120}"
+    r"|[A-ZÀ-Ý][A-ZÀ-Ý0-9 ,;:/()\-]{3,120})$"
+)
+
+_STATS = {"items_reused": 0, "items_asked": 0}
+_STATS_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Section:
+    title: str
+    text: str
+    folded: str
+    fingerprint: str
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def split_sections(text: str) -> List[Section]:
+    """Divide o texto normalizado em seções estáveis (mesmo texto → mesmos hashes)."""
+    lines = [ln for ln in normalize_document(text or "").normalized.split("\n") if ln.strip()]
+    groups: List[List[str]] = []
+    size = 0
+    for line in lines:
+        starts_section = bool(_HEADING_RX.match(line.strip())) and size >= SECTION_MIN_CHARS
+        if not groups or starts_section or size + len(line) > SECTION_MAX_CHARS:
+            groups.append([])
+            size = 0
+        groups[-1].append(line)
+        size += len(line) + 1
+
+    sections: List[Section] = []
+    for g in groups:
+        body = "\n".join(g)
+        sections.append(Section(
+            title=g[0][:80],
+            text=body,
+            folded=fold_accents(body).lower(),
+            fingerprint=_fingerprint(body),
+        ))
+    return sections
+
+
+def item_terms(descricao: str) -> List[str]:
+    """Termos significativos (sem acentos, minúsculos, > 4 letras) da descrição."""
+    words = re.split(r"\W+", fold_accents(descricao or "").lower())
+    return sorted({w for w in words if len(w) > 4})
+
+
+def relevant_sections(itens: Sequence[Dict[str, Any]], sections: Sequence[Section]) -> Dict[str, List[str]]:
+    """
+    Hashes das seções em que cada item se apoia: seções com ao menos dois
+    termos da descrição (um, se houver só um termo). Termos presentes em mais
+    da metade das seções não discriminam e são ignorados. Sem seção
+    relevante, o item depende do documento inteiro.
+    """
+    everything = sorted(s.fingerprint for s in sections)
+    out: Dict[str, List[str]] = {}
+    for idx, it in enumerate(itens):
+        terms = item_terms(it.get("descricao", ""))
+        hits = {t: [s for s in sections if t in s.folded] for t in terms}
+        if len(sections) >= 4:
+            terms = [t for t in terms if len(hits[t]) * 2 <= len(sections)]
+        need = 1 if len(terms) <= 1 else 2
+        chosen = [
+            s.fingerprint for s in sections
+            if sum(1 for t in terms if s in hits[t]) >= need
+        ]
+        out[checklist_item_id(it, idx)] = sorted(set(chosen)) or everything
+    return out
+
+
+def _returned_items(data: Any) -> List[Dict[str, Any]]:
+    items = data.get("itens", []) if isinstance(data, dict) else data if isinstance(data, list) else []
+    return [r for r in items if isinstance(r, dict)]
+
+
+def cached_item_verdicts(
+    client: Any,
+    parse: Callable[[str], Any],
+    *,
+    namespace: str,
+    checklist: List[Dict[str, Any]],
+    document: str,
+    build_messages: Callable[[List[Dict[str, Any]], str], List[Dict[str, str]]],
+    model: str,
+    source: Optional[str] = None,
+    **params: Any,
+) -> Dict[str, Any]:
+    """
+    Veredito semântico item a item com cache por seções.
+    `build_messages(itens, documento)` monta o prompt do validador; o
+    retorno tem o mesmo formato de `_extract_json`: {"itens": [...]}.
+    `source` é o documento original, cujas seções entram na chave (padrão:
+    `document`, quando o prompt leva o documento inteiro).
+    """
+    cache = get_semantic_cache()
+    template = make_key(build_messages([], ""))
+    relied = relevant_sections(checklist, split_sections(document if source is None else source))
+
+    ids = [checklist_item_id(it, idx) for idx, it in enumerate(checklist)]
+    keys: Dict[str, str] = {}
+    verdicts: Dict[str, Dict[str, Any]] = {}
+    for it, item_id in zip(checklist, ids):
+        keys[item_id] = make_key("item", namespace, model, params, template, it, relied[item_id])
+        hit = cache.get(keys[item_id])
+        if isinstance(hit, dict):
+            verdicts[item_id] = hit
+
+    missing = [it for it, item_id in zip(checklist, ids) if item_id not in verdicts]
+    with _STATS_LOCK:
+        _STATS["items_reused"] += len(checklist) - len(missing)
+        _STATS["items_asked"] += len(missing)
+
+    if missing:
+        data = cached_chat_json(
+            client, parse, model=model, messages=build_messages(missing, document), **params
+        )
+        for r in _returned_items(data):
+            item_id = str(r.get("id"))
+            if item_id in keys and item_id not in verdicts:
+                verdicts[item_id] = r
+                cache.put(keys[item_id], r)
+
+    return {"itens": [verdicts[item_id] for item_id in ids if item_id in verdicts]}
+
+
+def checklist_verdicts(
+    client: Any,
+    parse: Callable[[str], Any],
+    *,
+    namespace: str,
+    system_msg: str,
+    checklist: List[Dict[str, Any]],
+    document: str,
+    label: str,
+    source: Optional[str] = None,
+    checklist_title: str = "CHECKLIST",
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 1500,
+) -> Dict[str, Any]:
+    """
+    cached_item_verdicts com o prompt dos *_semantic_validator.py: `system_msg`
+    e, no usuário, "<checklist_title>:" + itens em JSON + "DOCUMENTO (<label>):"
+    + documento (temperature 0).
+    """
+    def build_messages(subset: List[Dict[str, Any]], doc: str) -> List[Dict[str, str]]:
+        user_msg = (
+            f"{checklist_title}:\n"
+            + json.dumps(subset, ensure_ascii=False)
+            + f"\n\nDOCUMENTO ({label}):\n"
+            + doc
+        )
+        return [{"role": "system", "content": system_msg}, {"role": "user", "content": user_msg}]
+
+    return cached_item_verdicts(
+        client, parse, namespace=namespace, checklist=checklist, document=document,
+        build_messages=build_messages, model=model, source=source, temperature=0.0, max_tokens=max_tokens,
+    )
+
+
+def stats() -> Dict[str, int]:
+    with _STATS_LOCK:
+        return dict(_STATS)
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Cache endereçado por conteúdo da validação semântica
+#
+# semantic_validate (engine) e os semantic_validate_* chamam o LLM com
+# temperature baixa e prompts determinísticos; a mesma requisição devolve o
+# mesmo resultado. O cache evita pagar de novo o round-trip em documentos
+# idênticos, cliques repetidos em "Executar Agente" e reruns do Streamlit.
+#
+# - Chave: sha256 de (texto normalizado/checklist/template do prompt, tudo
+#   dentro das mensagens enviadas) + modelo + parâmetros + versão do parser.
+#   Qualquer edição no checklist ou no prompt gera outra chave: entradas
+#   antigas simplesmente deixam de ser lidas e saem por TTL/tamanho.
+# - Camadas: LRU em memória (processo) + SQLite em disco (WAL), seguro entre
+#   threads (conexão por thread) e entre processos (locks do SQLite).
+# - Só resultados válidos são gravados (exceções não entram no cache).
+#
+# Configuração (variáveis de ambiente):
+#   SYNAPSE_CACHE_DIR          diretório do SQLite (padrão: .cache/synapse)
+#   SYNAPSE_SEMANTIC_CACHE=0   desliga o cache
+#   SYNAPSE_CACHE_TTL          validade em segundos (padrão: 30 dias)
+#   SYNAPSE_CACHE_MAX_MB       tamanho máximo do SQLite (padrão: 128)
+# =============================================================================
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from knowledge.validators.llm_call import call_chat
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CACHE_DIR = REPO_ROOT / ".cache" / "synapse"
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_MB = 128
+MEMORY_ENTRIES = 256
+
+# Eviction por tamanho a cada N gravações
+_EVICT_EVERY = 32
+# "accessed" só é atualizado no disco se a última leitura for mais antiga que isto
+_TOUCH_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS semantic_cache (
+    key      TEXT PRIMARY KEY,
+    value    TEXT NOT NULL,
+    created  REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS semantic_cache_accessed ON semantic_cache (accessed);
+"""
+
+
+def make_key(*parts: Any) -> str:
+    """sha256 do JSON canônico das partes (dicts com chaves ordenadas)."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(json.dumps(p, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+class SemanticCache:
+    """Cache em duas camadas (memória + SQLite) com contadores de hit/miss."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+        memory_entries: int = MEMORY_ENTRIES,
+        enabled: bool = True,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts = 0
+        self._stats = {"hits_memory": 0, "hits_disk": 0, "misses": 0, "stores": 0, "evicted": 0, "errors": 0}
+
+    # ----------------------------------------------------------------- SQLite
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+        except sqlite3.Error:
+            self._count("errors")
+            self.path = None  # disco indisponível → só memória
+            return None
+        self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    # ---------------------------------------------------------------- leitura
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                if now - hit[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["hits_memory"] += 1
+                    return json.loads(hit[1])
+                del self._memory[key]
+
+        conn = self._conn()
+        if conn is not None:
+            try:
+                row = conn.execute(
+                    "SELECT value, created, accessed FROM semantic_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created, accessed = row
+                    if now - created > self.ttl:
+                        conn.execute("DELETE FROM semantic_cache WHERE key = ?", (key,))
+                    else:
+                        if now - accessed > _TOUCH_INTERVAL:
+                            conn.execute("UPDATE semantic_cache SET accessed = ? WHERE key = ?", (now, key))
+                        self._remember(key, created, value)
+                        self._count("hits_disk")
+                        return json.loads(value)
+            except (sqlite3.Error, ValueError):
+                self._count("errors")
+
+        self._count("misses")
+        return None
+
+    # --------------------------------------------------------------- gravação
+    def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        raw = json.dumps(value, ensure_ascii=False)
+        self._remember(key, now, raw)
+        self._count("stores")
+
+        conn = self._conn()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO semantic_cache (key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, raw, now, now, len(raw.encode("utf-8"))),
+            )
+        except sqlite3.Error:
+            self._count("errors")
+            return
+        with self._lock:
+            self._puts += 1
+            due = self._puts % _EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def _remember(self, key: str, created: float, raw: str) -> None:
+        with self._lock:
+            self._memory[key] = (created, raw)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        accept: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Retorna do cache ou calcula e grava. Exceções de `compute` propagam e
+        resultados recusados por `accept` são devolvidos sem gravar.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = compute()
+        if value is not None and (accept is None or accept(value)):
+            self.put(key, value)
+        return value
+
+    # ------------------------------------------------------------- manutenção
+    def evict(self) -> int:
+        """Remove vencidos e, acima do limite de tamanho, os menos acessados."""
+        conn = self._conn()
+        if conn is None:
+            return 0
+        removed = 0
+        try:
+            cur = conn.execute("DELETE FROM semantic_cache WHERE created < ?", (time.time() - self.ttl,))
+            removed += cur.rowcount or 0
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM semantic_cache").fetchone()[0]
+            if total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                rows = conn.execute("SELECT key, size FROM semantic_cache ORDER BY accessed ASC").fetchall()
+                doomed: List[str] = []
+                for k, size in rows:
+                    if total <= target:
+                        break
+                    doomed.append(k)
+                    total -= size
+                conn.executemany("DELETE FROM semantic_cache WHERE key = ?", [(k,) for k in doomed])
+                removed += len(doomed)
+        except sqlite3.Error:
+            self._count("errors")
+            return removed
+        self._count("evicted", removed)
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        conn = self._conn()
+        if conn is not None:
+            try:
+                conn.execute("DELETE FROM semantic_cache")
+            except sqlite3.Error:
+                self._count("errors")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats, memory_entries=len(self._memory))
+        hits = out["hits_memory"] + out["hits_disk"]
+        out["hit_rate"] = round(hits / (hits + out["misses"]), 3) if hits + out["misses"] else 0.0
+        out["path"] = self.path
+        return out
+
+
+_CACHE: Optional[SemanticCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Instância única do processo, configurada pelas variáveis de ambiente."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            cache_dir = os.getenv("SYNAPSE_CACHE_DIR") or str(DEFAULT_CACHE_DIR)
+            _CACHE = SemanticCache(
+                path=os.path.join(cache_dir, "semantic_cache.sqlite3"),
+                ttl=float(os.getenv("SYNAPSE_CACHE_TTL") or DEFAULT_TTL),
+                max_bytes=int(float(os.getenv("SYNAPSE_CACHE_MAX_MB") or DEFAULT_MAX_MB) * 1024 * 1024),
+                enabled=os.getenv("SYNAPSE_SEMANTIC_CACHE", "1") != "0",
+            )
+        return _CACHE
+
+
+def has_items(data: Any) -> bool:
+    """Resposta semântica utilizável: lista não vazia ou {"itens": [...]} não vazio."""
+    if isinstance(data, list):
+        return bool(data)
+    if isinstance(data, dict):
+        return bool(data.get("itens"))
+    return False
+
+
+def cached_chat_json(
+    client: Any,
+    parse: Callable[[str], Any],
+    *,
+    model: str,
+    messages: List[Dict[str, str]],
+    version: str = "1",
+    accept: Callable[[Any], bool] = has_items,
+    **params: Any,
+) -> Any:
+    """
+    chat.completions.create (via llm_call) + parse, com cache pela requisição completa.
+    `version` entra na chave: troque-a quando o parser/pós-processamento mudar.
+    """
+    key = make_key("chat.completions", version, model, messages, params)
+
+    def compute() -> Any:
+        resp = call_chat(client, model=model, messages=messages, **params)
+        return parse(resp.choices[0].message.content or "")
+
+    return get_semantic_cache().get_or_compute(key, compute, accept)
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Synapse.IA – Normalização de texto (passada fundida + mapa de offsets)
+#
+# Substitui a sequência normalize_text → remove_accents → .lower(), que cada
+# etapa (rígido, semântico, rascunho orientado) refazia sobre o mesmo texto,
+# por um objeto único e memoizado por documento com as três visões:
+# - normalized: NFKC (só se necessário), aspas/travessões, espaços colapsados;
+# - folded: sem acentos e minúsculo (NFKD + str.translate das marcas
+#   combinantes, no lugar da list comprehension caractere a caractere);
+# - lowered: normalized.lower().
+# Todas as etapas usam primitivas em C (normalize, translate, replace, re.sub
+# com string de substituição). O mapa de offsets (segmentos em array,
+# normalizado → original) só é montado quando alguém pede um offset.
+#
+# O resultado é idêntico ao de normalize_text/remove_accents anteriores.
+# =============================================================================
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+ZWSP = "\u200B"  # zero width space
+
+# Substituições comuns (Word/PDF) aplicadas após o NFKC
+# (o non-breaking space já vira espaço no próprio NFKC)
+_PUNCT = {
+    ZWSP: "",
+    "–": "-", "—": "-",  # dashes → hífen
+    "“": '"', "”": '"', "‘": "'", "’": "'",  # aspas curvas → retas
+}
+_PUNCT_RX = re.compile("[" + "".join(_PUNCT) + "]")
+
+# Equivale a re.sub(r"[ \t]+", " ") → re.sub(r"\s+\n", "\n") → re.sub(r"\n\s+", "\n"):
+# corridas de espaço com quebra de linha viram "\n"; [ \t]+ vira " "
+_NEWLINE_RUN_RX = re.compile(r"[^\S\n]+\n\s*|\n\s+")
+_BLANK_RUN_RX = re.compile(r"(?: [ \t]|\t)[ \t]*")
+_WS_RX = re.compile(f"{_NEWLINE_RUN_RX.pattern}|{_BLANK_RUN_RX.pattern}")
+
+
+# Marcas combinantes (unicodedata.combining != 0) → removidas por str.translate.
+# Tabela montada uma vez no import, a partir do unicodedata deste Python; as
+# marcas estão todas nos planos 0 e 1 (varrê-los custa ~15 ms, contra ~70 ms
+# para os 1,1 mi de code points).
+_COMBINING_TABLE = dict.fromkeys(cp for cp in range(0x20000) if unicodedata.combining(chr(cp)))
+
+
+_NON_ASCII_RX = re.compile(r"[^\x00-\x7f]+")
+_NON_ASCII_CHUNK_RX = re.compile(r"[\x00-\x7f]?[^\x00-\x7f]+")
+
+
+# =============================================================================
+# Etapas (texto)
+# =============================================================================
+def _unicode_stage(text: str) -> str:
+    """NFKC + aspas/travessões + remoção de zero-width space."""
+    t = text if unicodedata.is_normalized("NFKC", text) else unicodedata.normalize("NFKC", text)
+    if _PUNCT_RX.search(t) is not None:
+        for k, v in _PUNCT.items():
+            t = t.replace(k, v)
+    return t
+
+
+def _whitespace_stage(t: str) -> str:
+    return _BLANK_RUN_RX.sub(" ", _NEWLINE_RUN_RX.sub("\n", t))
+
+
+def fold_accents(s: str) -> str:
+    """Remove acentos (NFKD sem marcas combinantes)."""
+    if not s:
+        return s
+    return unicodedata.normalize("NFKD", s).translate(_COMBINING_TABLE)
+
+
+def _fold_char(c: str) -> str:
+    return unicodedata.normalize("NFKD", c).translate(_COMBINING_TABLE)
+
+
+# =============================================================================
+# Mapa de offsets (segmentos)
+# =============================================================================
+class OffsetMap:
+    """
+    Mapeia offsets do texto de saída para o de entrada por segmentos:
+    (início na saída, início na entrada, tamanho na entrada). Segmentos de
+    cópia têm o mesmo tamanho dos dois lados; substituições apontam para o
+    início do trecho substituído.
+    """
+
+    __slots__ = ("dst", "src", "src_len", "_dst_pos", "_src_pos")
+
+    def __init__(self) -> None:
+        self.dst = array("q")
+        self.src = array("q")
+        self.src_len = array("q")
+        self._dst_pos = 0
+        self._src_pos = 0
+
+    def copy(self, n: int) -> None:
+        if n <= 0:
+            return
+        if self.dst and self.src[-1] + self.src_len[-1] == self._src_pos \
+                and self.dst[-1] + self.src_len[-1] == self._dst_pos:
+            self.src_len[-1] += n  # estende a cópia anterior
+        else:
+            self.dst.append(self._dst_pos)
+            self.src.append(self._src_pos)
+            self.src_len.append(n)
+        self._dst_pos += n
+        self._src_pos += n
+
+    def replace(self, src_n: int, dst_n: int) -> None:
+        if dst_n > 0:
+            self.dst.append(self._dst_pos)
+            self.src.append(self._src_pos)
+            self.src_len.append(src_n)
+        self._dst_pos += dst_n
+        self._src_pos += src_n
+
+    def __call__(self, i: int) -> int:
+        i = max(i, 0)
+        if not self.dst:
+            return min(i, self._src_pos)
+        if i >= self._dst_pos:
+            return self._src_pos + (i - self._dst_pos)
+        j = max(bisect_right(self.dst, i) - 1, 0)
+        delta = i - self.dst[j]
+        return self.src[j] + min(delta, max(self.src_len[j] - 1, 0))
+
+    def __len__(self) -> int:
+        return len(self.dst)
+
+
+# =============================================================================
+# Etapas (mapas) — montados sob demanda
+# =============================================================================
+def _unicode_piece(s: str) -> str:
+    t = unicodedata.normalize("NFKC", s)
+    for k, v in _PUNCT.items():
+        t = t.replace(k, v)
+    return t
+
+
+@lru_cache(maxsize=4096)
+def _unicode_layout(chunk: str) -> Tuple[Tuple[int, int], ...]:
+    """(tamanho de entrada, tamanho de saída) de cada cluster (base + combinantes)."""
+    clusters: List[str] = []
+    for ch in chunk:
+        if clusters and unicodedata.combining(ch):
+            clusters[-1] += ch
+        else:
+            clusters.append(ch)
+    return tuple((len(c), len(_unicode_piece(c))) for c in clusters)
+
+
+def _apply_layout(omap: OffsetMap, layout: Tuple[Tuple[int, int], ...]) -> None:
+    for src_n, dst_n in layout:
+        if src_n == dst_n:
+            omap.copy(src_n)
+        else:
+            omap.replace(src_n, dst_n)
+
+
+def _unicode_map(text: str) -> OffsetMap:
+    """
+    Mapa da etapa unicode. Linhas estáveis são cópia; nas demais, só os
+    trechos não ASCII (com o caractere anterior, base de uma composição)
+    são decompostos em clusters.
+    """
+    omap = OffsetMap()
+    for k, line in enumerate(text.split("\n")):
+        if k:
+            omap.copy(1)
+        if unicodedata.is_normalized("NFKC", line) and _PUNCT_RX.search(line) is None:
+            omap.copy(len(line))
+            continue
+        layout: List[Tuple[int, int]] = []
+        last = 0
+        for m in _NON_ASCII_CHUNK_RX.finditer(line):
+            if m.start() > last:
+                layout.append((m.start() - last, m.start() - last))
+            layout.extend(_unicode_layout(m.group()))
+            last = m.end()
+        if len(line) > last:
+            layout.append((len(line) - last, len(line) - last))
+        out_len = len(_unicode_piece(line))
+        if sum(d for _, d in layout) == out_len:
+            _apply_layout(omap, tuple(layout))
+        else:
+            # composição entre clusters (raro): a linha vira um único segmento
+            omap.replace(len(line), out_len)
+    return omap
+
+
+def _whitespace_map(t: str) -> OffsetMap:
+    omap = OffsetMap()
+    last = 0
+    for m in _WS_RX.finditer(t):
+        start, end = m.span()
+        omap.copy(start - last)
+        omap.replace(end - start, 1)
+        last = end
+    omap.copy(len(t) - last)
+    return omap
+
+
+@lru_cache(maxsize=4096)
+def _fold_layout(run: str) -> Optional[Tuple[Tuple[int, int], ...]]:
+    """Tamanhos, caractere a caractere, após remover acentos + lower (None se 1:1)."""
+    layout = tuple((1, len(_fold_char(ch).lower())) for ch in run)
+    return None if all(d == 1 for _, d in layout) else layout
+
+
+def _fold_map(normalized: str) -> Optional[OffsetMap]:
+    """Mapa sem acentos/minúsculo → normalizado (None quando é 1:1)."""
+    omap = OffsetMap()
+    last = 0
+    changed = False
+    for m in _NON_ASCII_RX.finditer(normalized):
+        layout = _fold_layout(m.group())
+        if layout is None:
+            continue
+        omap.copy(m.start() - last)
+        _apply_layout(omap, layout)
+        last = m.end()
+        changed = True
+    omap.copy(len(normalized) - last)
+    return omap if changed else None
+
+
+# =============================================================================
+# Documento normalizado
+# =============================================================================
+class NormalizedText:
+    """
+    Visões de um mesmo documento:
+      - original: texto recebido
+      - normalized: equivalente a normalize_text(original)
+      - folded: equivalente a remove_accents(normalized).lower()
+      - lowered: normalized.lower()
+    e offsets de volta ao original (to_original / folded_to_original).
+    """
+
+    __slots__ = ("original", "normalized", "folded", "_lowered", "_maps", "_lock")
+
+    def __init__(self, text: str) -> None:
+        self.original = text
+        self.normalized = _whitespace_stage(_unicode_stage(text))
+        self.folded = fold_accents(self.normalized).lower()
+        self._lowered: Optional[str] = None
+        self._maps: Optional[Tuple[OffsetMap, OffsetMap, Optional[OffsetMap]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def lowered(self) -> str:
+        if self._lowered is None:
+            self._lowered = self.normalized.lower()
+        return self._lowered
+
+    def _offset_maps(self) -> Tuple[OffsetMap, OffsetMap, Optional[OffsetMap]]:
+        with self._lock:
+            if self._maps is None:
+                self._maps = (
+                    _unicode_map(self.original),
+                    _whitespace_map(_unicode_stage(self.original)),
+                    _fold_map(self.normalized),
+                )
+            return self._maps
+
+    def to_original(self, i: int) -> int:
+        """Offset no texto normalizado → offset no texto original."""
+        unicode_map, ws_map, _ = self._offset_maps()
+        return unicode_map(ws_map(i))
+
+    def folded_to_normalized(self, i: int) -> int:
+        fold_map = self._offset_maps()[2]
+        return i if fold_map is None else fold_map(i)
+
+    def folded_to_original(self, i: int) -> int:
+        return self.to_original(self.folded_to_normalized(i))
+
+    def span_to_original(self, start: int, end: int, folded: bool = False) -> Tuple[int, int]:
+        """Converte um span (normalizado ou sem acentos) para o texto original."""
+        conv = self.folded_to_original if folded else self.to_original
+        if end <= start:
+            s = conv(start)
+            return s, s
+        return conv(start), conv(end - 1) + 1
+
+
+@lru_cache(maxsize=16)
+def normalize_document(text: str) -> NormalizedText:
+    """Normalização memoizada por documento (compartilhada entre as etapas)."""
+    return NormalizedText(text or "")
+
@@ -3,6 +3,8 @@ from __future__ import annotations
 from typing import List, Dict, Tuple
 from pathlib import Path
 import json, re, yaml
+from knowledge.validators.context_packer import pack_context
+from knowledge.validators.section_cache import checklist_verdicts
 
 CHECKLIST_PATH = Path("knowledge/tr_checklist.yml")
 
@@ -10,10 +12,6 @@ def load_checklist_items() -> List[Dict]:
     data = yaml.safe_load(CHECKLIST_PATH.read_text(encoding="utf-8"))
     return data.get("itens", [])
 
-def _truncate(text: str, max_chars: int = 12000) -> str:
-    if len(text) <= max_chars: return text
-    return text[: max_chars // 2] + "\n\n[[...texto truncado...]]\n\n" + text[-max_chars // 2 :]
-
 def _extract_json(s: str) -> dict:
     m = re.search(r"```json\s*(\{.*?\})\s*```", s, flags=re.S | re.I)
     if m: return json.loads(m.group(1))
@@ -28,7 +26,7 @@ def _extract_json(s: str) -> dict:
 def semantic_validate_tr(doc_text: str, client) -> Tuple[float, List[Dict]]:
     itens = load_checklist_items()
     if not itens: return 0.0, []
-    doc_trim = _truncate(doc_text)
+    doc_trim = pack_context(doc_text, itens)
 
     checklist = [
         {"id": it["id"], "descricao": it["descricao"], "obrigatorio": bool(it.get("obrigatorio", True))}
@@ -44,17 +42,17 @@ def semantic_validate_tr(doc_text: str, client) -> Tuple[float, List[Dict]]:
         "{'itens':[{'id':'...', 'presente':bool, 'adequacao_nota':0-100, 'justificativa':'...', 'faltantes':['...']}]}."
     )
 
-    user_msg = "CHECKLIST:\n" + json.dumps(checklist, ensure_ascii=False) + "\n\nDOCUMENTO (TR):\n" + doc_trim
-
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "system", "content": system_msg}, {"role": "user", "content": user_msg}],
-        temperature=0.0,
-        max_tokens=1500,
+    data = checklist_verdicts(
+        client,
+        _extract_json,
+        namespace="tr",
+        system_msg=system_msg,
+        checklist=checklist,
+        document=doc_trim,
+        source=doc_text,
+        label="TR",
     )
 
-    data = _extract_json(resp.choices[0].message.content)
-
     obrigatorios = [i for i in checklist if i["obrigatorio"]]
     notas = []
     results: List[Dict] = []
@@ -8,23 +8,36 @@
 # - Regex tolerantes para padrões frequentes (ex.: Lei 14.133/2021).
 # - Validação semântica com análise profunda (gpt-4o, temperature=0).
 # - Geração de "Documento Orientado" (Markdown) sem duplicidades.
+# - Checklists em cache de processo (checklist_registry), com regex pré-compiladas.
+# - Rígido em passada única sobre o texto (rigid_matcher), O(documento).
+# - Normalização única e memoizada por documento (text_normalizer), com as
+#   visões normalizada/sem acentos/minúscula compartilhadas entre as etapas.
+# - Revalidação incremental (incremental.py): com o payload anterior, só os
+#   itens afetados pelos parágrafos editados são reavaliados.
+# - Cache persistente do semântico por conteúdo (semantic_cache.py).
+# - Semântico em shards concorrentes dentro do limite de saída (async_semantic.py),
+#   cada um com os trechos do documento mais relevantes aos seus itens e as
+#   referências da knowledge_base pré-calculadas por item (knowledge/retrieval/item_context.py,
+#   opcional: SYNAPSE_SEMANTIC_KB=1).
+# - Prompt do semântico com prefixo estável por artefato (instruções, checklist,
+#   referências) e o documento por último, para o cache de prompt do provedor.
+# - Streaming (iter_validate_document): rígido e itens semânticos entregues
+#   assim que ficam prontos, para exibição progressiva no app.
+# - Vários artefatos do mesmo documento numa passada (validate_document com
+#   lista / iter_validate_artefatos): rígido numa varredura só e semântico
+#   dos artefatos em paralelo.
+# - Fatos das etapas anteriores da jornada (DFD → ETP → TR) no prompt
+#   semântico, depois do prefixo fixo (journey_validator.py).
 # - Retorno estruturado compatível com synapse_chat.py:
 #     rigid_score, rigid_result, semantic_score, semantic_result, improved_document
 # =============================================================================
 from __future__ import annotations
 
+import asyncio
 import os
 import re
-import glob
 import json
-import unicodedata
-from typing import Any, Dict, List, Optional, Tuple
-
-# YAML
-try:
-    import yaml  # pyyaml
-except Exception:
-    yaml = None  # mantemos o engine funcional mesmo sem pyyaml (mas recomendamos instalar)
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 # OpenAI (SDK 2024+)
 try:
@@ -32,39 +45,33 @@ try:
 except Exception:
     OpenAI = None  # o chamador deve informar o client válido
 
+from knowledge.validators.checklist_registry import CompiledChecklist, checklist_item_id, get_checklist_registry
+from knowledge.validators.rigid_matcher import get_matcher, scan_checklists
+from knowledge.validators.async_semantic import (
+    SemanticEvaluationError,
+    aevaluate_checklist,
+    evaluate_checklist,
+    stream_checklist,
+    stream_checklists,
+)
+from knowledge.validators.context_packer import pack_context
+from knowledge.validators import incremental
+from knowledge.validators.text_normalizer import NormalizedText, fold_accents, normalize_document
+
 
 # =============================================================================
 # Utilitários de normalização e suporte
 # =============================================================================
 def normalize_text(text: str) -> str:
-    """Normaliza texto para melhorar matching no rígido."""
+    """Normaliza texto para melhorar matching no rígido (ver text_normalizer)."""
     if not text:
         return ""
-    t = unicodedata.normalize("NFKC", text)
-
-    # Substituições comuns (Word/PDF)
-    replacements = {
-        "\u00A0": " ",   # non-breaking space
-        "\u200B": "",    # zero width space
-        "–": "-", "—": "-",  # dashes → hífen
-        "“": '"', "”": '"', "‘": "'", "’": "'",  # aspas curvas → retas
-    }
-    for k, v in replacements.items():
-        t = t.replace(k, v)
-
-    # Colapsa múltiplos espaços e arruma quebras
-    t = re.sub(r"[ \t]+", " ", t)
-    t = re.sub(r"\s+\n", "\n", t)
-    t = re.sub(r"\n\s+", "\n", t)
-    return t
+    return normalize_document(text).normalized
 
 
 def remove_accents(s: str) -> str:
     """Remove acentos (opcional, quando se desejar matching mais agressivo)."""
-    if not s:
-        return s
-    nfkd = unicodedata.normalize("NFKD", s)
-    return "".join([c for c in nfkd if not unicodedata.combining(c)])
+    return fold_accents(s)
 
 
 def slug_from_artefato(artefato: str) -> str:
@@ -79,36 +86,29 @@ def find_checklist_file(artefato: str) -> Optional[str]:
     Procura o arquivo do checklist no padrão:
       knowledge/validators/{slug}_checklist*.yml
     e prioriza o nome "simples" se houver múltiplos.
+    A listagem do diretório fica em cache no registro de checklists.
     """
     base_dir = os.path.join("knowledge", "validators")
     slug = slug_from_artefato(artefato)
-    candidates = glob.glob(os.path.join(base_dir, f"{slug}_checklist*.yml"))
-    if candidates:
-        candidates.sort(key=lambda p: (len(os.path.basename(p)), p))
-        return candidates[0]
+    found = get_checklist_registry().find(base_dir, slug)
+    if found:
+        return found
     default_path = os.path.join(base_dir, f"{slug}_checklist.yml")
     return default_path if os.path.exists(default_path) else None
 
 
+def load_compiled_checklist(artefato: str) -> Optional[CompiledChecklist]:
+    """Checklist do artefato já parseado e com regex pré-compiladas (cache de processo)."""
+    path = find_checklist_file(artefato)
+    if not path:
+        return None
+    return get_checklist_registry().get(path)
+
+
 def load_checklist(artefato: str) -> List[Dict[str, Any]]:
     """Carrega a lista de itens do checklist do artefato."""
-    if yaml is None:
-        return []
-    path = find_checklist_file(artefato)
-    if not path or not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
-
-    # Aceita "items", "itens" ou lista raiz
-    if isinstance(data, list):
-        return data
-    if isinstance(data, dict):
-        if "items" in data:
-            return data.get("items") or []
-        if "itens" in data:
-            return data.get("itens") or []
-    return []
+    compiled = load_compiled_checklist(artefato)
+    return list(compiled.items) if compiled else []
 
 
 # =============================================================================
@@ -150,48 +150,52 @@ def build_tolerant_pattern(padrao: str) -> str:
 def rigid_validate(document_text: str, artefato: str) -> Tuple[float, List[Dict[str, Any]]]:
     """
     Validação rígida: utiliza regex (padrões no YAML) com normalização robusta.
+    Os padrões do checklist são avaliados em uma única passada (rigid_matcher).
     """
-    text = normalize_text(document_text or "")
-    text_no_accents = remove_accents(text).lower()
+    doc = normalize_document(document_text or "")
+    compiled = load_compiled_checklist(artefato)
+    # todos os padrões válidos em uma única passada sobre o texto sem acentos
+    found = get_matcher(compiled).scan(doc.folded) if compiled else {}
+    return _rigid_results(doc, compiled, found)
+
 
-    checklist = load_checklist(artefato)
+def _rigid_results(
+    doc: NormalizedText,
+    compiled: Optional[CompiledChecklist],
+    found: Dict[int, Any],
+) -> Tuple[float, List[Dict[str, Any]]]:
+    """Monta score/resultado do rígido; `found` traz os itens do matcher encontrados."""
+    text = doc.normalized
+    text_no_accents = doc.folded
+    checklist = compiled.compiled if compiled else ()
     results: List[Dict[str, Any]] = []
-    total = len(checklist) if checklist else 0
+    total = len(checklist)
     hits = 0
 
-    for item in (checklist or []):
-        desc = item.get("descricao", "").strip()
-        obrig = bool(item.get("obrigatorio", False))
-        padrao = (item.get("padrao") or item.get("pattern") or "").strip()
+    for idx, item in enumerate(checklist):
         presente = False
 
-        if padrao:
-            # padrão tolerante
-            rx = build_tolerant_pattern(padrao)
-            try:
-                if re.search(rx, text, flags=re.IGNORECASE | re.DOTALL):
-                    presente = True
-                else:
-                    # fallback agressivo: remove acentos
-                    if re.search(remove_accents(rx), text_no_accents, flags=re.IGNORECASE | re.DOTALL):
-                        presente = True
-            except re.error:
+        if item.padrao:
+            if not item.regex_error:
+                presente = idx in found
+            else:
                 # regex malformada no YAML → tenta contains simples (em textos normalizados)
-                if rx.lower() in text.lower() or remove_accents(rx).lower() in text_no_accents:
+                if item.rx is not None and item.rx.search(text):
                     presente = True
+                else:
+                    presente = item.literal in doc.lowered or item.literal_no_accents in text_no_accents
         else:
             # fallback heurístico mínimo: primeiras palavras significativas da descrição
-            tokens = [w for w in re.split(r"\W+", desc.lower()) if len(w) > 4]
-            presente = any(tok in text_no_accents for tok in tokens[:3])
+            presente = any(tok in text_no_accents for tok in item.tokens)
 
         if presente:
             hits += 1
 
         results.append(
             {
-                "id": item.get("id") or "",
-                "descricao": desc,
-                "obrigatorio": obrig,
+                "id": item.id,
+                "descricao": item.descricao,
+                "obrigatorio": item.obrigatorio,
                 "presente": presente,
             }
         )
@@ -209,31 +213,57 @@ SEMANTIC_SYSTEM = (
     "e Resoluções CNJ 651/2025 e 652/2025. Responda de forma objetiva e auditável."
 )
 
-def semantic_validate(
+# Orçamento de entrada do documento por shard (trechos relevantes; ver context_packer)
+SEMANTIC_CONTEXT_TOKENS = 6000
+# Orçamento das referências da knowledge_base por shard (SYNAPSE_SEMANTIC_KB=1 liga)
+SEMANTIC_KB_CHARS = 4800
+
+
+def _parse_semantic_list(raw: str) -> List[Dict[str, Any]]:
+    """Extrai a lista JSON da resposta (alguns modelos incluem rodeios)."""
+    m = re.search(r"\[.*\]", raw or "[]", flags=re.DOTALL)
+    data = json.loads(m.group(0) if m else raw)
+    if not isinstance(data, list) or not data:
+        raise ValueError("resposta semântica sem lista de itens")
+    return data
+
+
+def _item_kb_passages(artefato: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Trechos da base pré-calculados por item do checklist ({} se indisponíveis)."""
+    if not artefato or os.getenv("SYNAPSE_SEMANTIC_KB", "0") != "1":
+        return {}
+    compiled = load_compiled_checklist(artefato)
+    if compiled is None:
+        return {}
+    try:
+        from knowledge.retrieval.item_context import item_passages
+        return item_passages(slug_from_artefato(artefato), compiled)
+    except Exception:
+        return {}
+
+
+def _semantic_request(
     document_text: str,
-    artefato: str,
     checklist: List[Dict[str, Any]],
-    client: Optional[OpenAI],
-) -> Tuple[float, List[Dict[str, Any]]]:
+    artefato: str = "",
+    facts: str = "",
+) -> Tuple[List[Dict[str, Any]], Callable[[List[Dict[str, Any]]], List[Dict[str, str]]]]:
     """
-    Avaliação semântica item a item usando LLM.
-    Retorna lista padronizada + score (média das notas de adequação).
+    Itens padronizados do checklist + montador das mensagens de um shard.
+    `facts` são os fatos já extraídos das etapas anteriores da jornada
+    (journey_validator.py), enviados junto ao documento.
     """
-    if client is None:
-        return 0.0, []
-
-    text = normalize_text(document_text or "")
+    text = normalize_document(document_text or "").normalized
+    passages = _item_kb_passages(artefato)
 
     itens = [
         {
-            "id": i.get("id", f"item_{idx}"),
+            "id": checklist_item_id(i, idx),
             "descricao": i.get("descricao", ""),
             "obrigatorio": bool(i.get("obrigatorio", False)),
         }
         for idx, i in enumerate(checklist or [])
     ]
-    if not itens:
-        return 0.0, []
 
     instructions = (
         "Avalie cada item do CHECKLIST no DOCUMENTO. "
@@ -243,45 +273,155 @@ def semantic_validate(
         "Responda SOMENTE uma lista JSON (sem comentários ou texto fora do JSON)."
     )
 
-    user_content = f"""
-DOCUMENTO:
-\"\"\"{text}\"\"\"
+    def build_messages(shard: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        # Parte fixa (instruções, checklist do shard e referências da base por
+        # item) primeiro e documento por último: para o mesmo artefato, o
+        # prefixo é idêntico byte a byte e o cache de prompt do provedor o reaproveita.
+        refs = ""
+        if passages:
+            from knowledge.retrieval.item_context import format_passages
+
+            refs = format_passages(passages, [str(it["id"]) for it in shard], SEMANTIC_KB_CHARS)
+        if refs:
+            refs = (
+                "REFERÊNCIAS DA BASE DE CONHECIMENTO (parâmetro normativo e de boas práticas; "
+                f"avalie somente o DOCUMENTO):\n\"\"\"{refs}\"\"\"\n\n"
+            )
+        # Fatos variam por jornada, não por shard: ficam depois do prefixo
+        # fixo do artefato e antes do documento
+        known = (
+            "FATOS DAS ETAPAS ANTERIORES DA JORNADA (já extraídos; use-os para conferir a "
+            f"coerência do DOCUMENTO com elas, sem reavaliá-las):\n{facts}\n\n"
+        ) if facts else ""
+        user_content = f"""{instructions}
 
 CHECKLIST:
-{json.dumps(itens, ensure_ascii=False, indent=2)}
+{json.dumps(shard, ensure_ascii=False, indent=2)}
 
-{instructions}
+{refs}{known}DOCUMENTO:
+\"\"\"{pack_context(text, shard, max_tokens=SEMANTIC_CONTEXT_TOKENS)}\"\"\"
 """
+        return [
+            {"role": "system", "content": SEMANTIC_SYSTEM},
+            {"role": "user", "content": user_content},
+        ]
+
+    return itens, build_messages
+
+
+# Análise profunda – gpt-4o (temperature 0 para consistência e auditabilidade)
+_SEMANTIC_PARAMS: Dict[str, Any] = {"model": "gpt-4o", "temperature": 0.0, "max_tokens": 2200}
+
+
+def semantic_validate(
+    document_text: str,
+    artefato: str,
+    checklist: List[Dict[str, Any]],
+    client: Optional[OpenAI],
+) -> Tuple[float, List[Dict[str, Any]]]:
+    """
+    Avaliação semântica item a item usando LLM.
+    Retorna lista padronizada + score (média das notas de adequação). Se
+    algum item ficar sem veredito, devolve os obtidos (ver asemantic_validate
+    para receber o erro).
+    """
+    if client is None:
+        return 0.0, []
+
+    itens, build_messages = _semantic_request(document_text, checklist, artefato)
+    if not itens:
+        return 0.0, []
 
     try:
-        # Análise profunda – gpt-4o (temperature 0 para consistência e auditabilidade)
-        resp = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": SEMANTIC_SYSTEM},
-                {"role": "user", "content": user_content},
-            ],
-            temperature=0.0,
-            max_tokens=2200,
-        )
-        raw = resp.choices[0].message.content or "[]"
-        # Extrai JSON (alguns modelos incluem rodeios)
-        m = re.search(r"\[.*\]", raw, flags=re.DOTALL)
-        data = json.loads(m.group(0) if m else raw)
-        if not isinstance(data, list):
-            data = []
-    except Exception:
-        data = []
+        # Checklist em shards que cabem em max_tokens, avaliados em paralelo (async_semantic)
+        data = evaluate_checklist(client, itens, build_messages, _parse_semantic_list, **_SEMANTIC_PARAMS)
+    except SemanticEvaluationError as exc:
+        data = exc.partial
+
+    return score_semantic_result(data, len(itens)), data
+
+
+async def asemantic_validate(
+    document_text: str,
+    artefato: str,
+    checklist: List[Dict[str, Any]],
+    client: Optional[OpenAI],
+    concurrency: Optional[int] = None,
+) -> Tuple[float, List[Dict[str, Any]]]:
+    """
+    semantic_validate dentro de um event loop (validação em lote,
+    batch_validate.py). Itens sem veredito levantam SemanticEvaluationError,
+    com os vereditos obtidos em `partial`.
+    """
+    if client is None:
+        return 0.0, []
+
+    # normalização do documento e trechos da base: CPU, fora do event loop
+    itens, build_messages = await asyncio.to_thread(_semantic_request, document_text, checklist, artefato)
+    if not itens:
+        return 0.0, []
+
+    data = await aevaluate_checklist(client, itens, build_messages, _parse_semantic_list,
+                                     concurrency=concurrency, **_SEMANTIC_PARAMS)
+    return score_semantic_result(data, len(itens)), data
 
+
+def semantic_validate_stream(
+    document_text: str,
+    artefato: str,
+    checklist: List[Dict[str, Any]],
+    client: Optional[OpenAI],
+) -> Iterator[Dict[str, Any]]:
+    """
+    Como semantic_validate, mas gera cada item assim que o modelo o conclui
+    (stream=True), na ordem de chegada. Itens sem veredito levantam
+    SemanticEvaluationError ao fim (os obtidos já foram entregues).
+    """
+    if client is None:
+        return
+    itens, build_messages = _semantic_request(document_text, checklist, artefato)
+    if not itens:
+        return
+    yield from stream_checklist(client, itens, build_messages, _parse_semantic_list, **_SEMANTIC_PARAMS)
+
+
+def semantic_validate_stream_many(
+    document_text: str,
+    requests: Sequence[Tuple[str, List[Dict[str, Any]]]],
+    client: Optional[OpenAI],
+    facts: str = "",
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    semantic_validate_stream de vários artefatos do mesmo documento, em
+    paralelo: `requests` traz (artefato, checklist) e o gerador devolve
+    (artefato, item) na ordem de chegada. Itens sem veredito levantam
+    SemanticEvaluationError ao fim, com `failed` = {artefato: mensagem}.
+    """
+    if client is None:
+        return
+    jobs = []
+    for artefato, checklist in requests:
+        itens, build_messages = _semantic_request(document_text, checklist, artefato, facts)
+        if itens:
+            jobs.append((artefato, itens, build_messages))
+    if not jobs:
+        return
+    yield from stream_checklists(client, jobs, _parse_semantic_list, **_SEMANTIC_PARAMS)
+
+
+def score_semantic_result(data: List[Dict[str, Any]], total: Optional[int] = None) -> float:
+    """
+    Média das notas de adequação sobre `total` itens (o checklist): item sem
+    veredito conta como 0, em vez de sumir da média.
+    """
     notas: List[float] = []
     for it in data:
         try:
             notas.append(float(it.get("adequacao_nota", 0) or 0.0))
         except Exception:
             notas.append(0.0)
-
-    score = round(sum(notas) / len(notas), 1) if notas else 0.0
-    return score, data
+    total = max(total or 0, len(notas))
+    return round(sum(notas) / total, 1) if total else 0.0
 
 
 # =============================================================================
@@ -311,7 +451,7 @@ def generate_augmented_document(
       2) Lacunas Detectadas (deduplicadas)
       3) Marcadores <<<INSERIR: ...>>> (deduplicados)
     """
-    text = normalize_text(document_text or "")
+    text = normalize_document(document_text or "").normalized
     rigid = result_dict.get("rigid_result", []) or []
     sem = result_dict.get("semantic_result", []) or []
 
@@ -387,7 +527,22 @@ def generate_augmented_document(
 # =============================================================================
 # Função principal (API consumida pelo Streamlit)
 # =============================================================================
-def validate_document(document_text: str, artefato: str, client: Optional[OpenAI]) -> Dict[str, Any]:
+def _artefato_list(artefatos: Sequence[str]) -> List[str]:
+    out: List[str] = []
+    for a in artefatos:
+        a = (a or "").strip().upper()
+        if a and a not in out:
+            out.append(a)
+    return out
+
+
+def validate_document(
+    document_text: str,
+    artefato: Union[str, Sequence[str]],
+    client: Optional[OpenAI],
+    previous: Optional[Dict[str, Any]] = None,
+    facts: str = "",
+) -> Dict[str, Any]:
     """
     Retorna dicionário com:
       - rigid_score (float)
@@ -395,24 +550,189 @@ def validate_document(document_text: str, artefato: str, client: Optional[OpenAI
       - semantic_score (float)
       - semantic_result (lista de itens semânticos)
       - improved_document (Markdown com lacunas e marcadores)
+      - revision (estado para a próxima rodada; ver incremental.py)
+
+    `previous` é o payload da rodada anterior (mesmo artefato): nesse caso só
+    são reavaliados os itens afetados pelos parágrafos editados.
+
+    Com uma lista de artefatos (ex.: ["TR", "CONTRATO", "PESQUISA_PRECOS"]
+    para um TR com minuta e pesquisa anexas), valida todos numa passada e
+    devolve {artefato: payload}; `previous` passa a ser {artefato: payload}.
+
+    `facts` (texto) são fatos já extraídos de outras etapas da jornada,
+    anexados ao prompt semântico (ver journey_validator.py).
+    """
+    if not isinstance(artefato, str):
+        payloads: Dict[str, Any] = {}
+        for kind, name, data in iter_validate_artefatos(document_text, artefato, client, previous, facts):
+            if kind == "done":
+                payloads[name] = data
+        return payloads
+
+    payload: Dict[str, Any] = {}
+    for kind, data in iter_validate_document(document_text, artefato, client, previous, facts):
+        if kind == "done":
+            payload = data
+    return payload
+
+
+def iter_validate_document(
+    document_text: str,
+    artefato: str,
+    client: Optional[OpenAI],
+    previous: Optional[Dict[str, Any]] = None,
+    facts: str = "",
+) -> Iterator[Tuple[str, Any]]:
+    """
+    validate_document em etapas, para exibição progressiva:
+      ("rigid", {"rigid_score", "rigid_result"})  — assim que o rígido termina
+      ("semantic_item", item)                      — cada item semântico, ao chegar
+      ("done", payload)                            — payload completo de validate_document
     """
     artefato = (artefato or "").strip().upper()
-    text = document_text or ""
-    checklist = load_checklist(artefato)
+    prev = {artefato: previous} if previous is not None else None
+    for kind, _, data in iter_validate_artefatos(document_text, [artefato], client, prev, facts):
+        yield kind, data
 
-    rigid_score, rigid_result = rigid_validate(text, artefato)
-    semantic_score, semantic_result = semantic_validate(text, artefato, checklist, client)
 
-    payload: Dict[str, Any] = {
-        "rigid_score": rigid_score,
-        "rigid_result": rigid_result,
-        "semantic_score": semantic_score,
-        "semantic_result": semantic_result,
-    }
+def iter_validate_artefatos(
+    document_text: str,
+    artefatos: Sequence[str],
+    client: Optional[OpenAI],
+    previous: Optional[Dict[str, Dict[str, Any]]] = None,
+    facts: str = "",
+) -> Iterator[Tuple[str, str, Any]]:
+    """
+    Vários artefatos do mesmo documento numa passada: normalização e
+    trechos do documento compartilhados, rígido de todos os checklists numa
+    única varredura e semântico de todos os artefatos em paralelo. Eventos
+    (tipo, artefato, dados), com os tipos de iter_validate_document; os
+    "done" saem ao fim, na ordem de `artefatos`. `previous` é {artefato: payload}.
+    """
+    text = document_text or ""
+    doc = normalize_document(text)
+    starts = incremental.line_starts(doc.folded)
+
+    runs: List[Dict[str, Any]] = []
+    for artefato in _artefato_list(artefatos):
+        compiled = load_compiled_checklist(artefato)
+        prev = (previous or {}).get(artefato)
+        rev = incremental.usable_revision(prev, artefato, compiled, facts)
+        diff: Optional[incremental.ParagraphDiff] = None
+        if rev is not None:
+            diff = incremental.ParagraphDiff(rev["paragraphs"], incremental.paragraph_hashes(doc.normalized))
+            if diff.changed_ratio > incremental.MAX_CHANGED_RATIO:
+                diff = None
+        runs.append({
+            "artefato": artefato,
+            "compiled": compiled,
+            "checklist": list(compiled.items) if compiled else [],
+            "previous": prev,
+            "rev": rev,
+            "diff": diff,
+            "ranges": {},
+            "rescanned": None,
+        })
+
+    # ---- Rígido (todos os checklists numa varredura)
+    scanned = [run for run in runs if run["compiled"]]
+    only: List[Optional[Set[int]]] = []
+    for run in scanned:
+        sel = None
+        if run["diff"] is not None:
+            run["ranges"] = incremental.reuse_rigid_ranges(
+                run["compiled"], run["diff"], run["rev"].get("rigid_ranges") or {}
+            )
+            sel = get_matcher(run["compiled"]).indices - set(run["ranges"])
+            run["rescanned"] = len(sel)
+        only.append(sel)
+    for run, hits in zip(scanned, scan_checklists([run["compiled"] for run in scanned], doc.folded, only)):
+        for idx, span in hits.items():
+            run["ranges"][idx] = incremental.span_to_paragraphs(starts, span)
+    for run in runs:
+        run["rigid_score"], run["rigid_result"] = _rigid_results(doc, run["compiled"], run["ranges"])
+        yield "rigid", run["artefato"], {"rigid_score": run["rigid_score"], "rigid_result": run["rigid_result"]}
+
+    # ---- Semântico (só itens cujo suporte mudou; artefatos em paralelo)
+    jobs: List[Tuple[str, List[Dict[str, Any]]]] = []
+    for run in runs:
+        compiled, checklist, ranges = run["compiled"], run["checklist"], run["ranges"]
+        ranges_by_id = {checklist_item_id(item, idx): ranges[idx] for idx, item in enumerate(checklist) if idx in ranges}
+        run["support"] = incremental.semantic_support(doc, starts, checklist, ranges_by_id)
+        run["resend"] = None
+        run["arrived"] = {}
+        if run["diff"] is not None and run["previous"].get("semantic_result"):
+            previous_results = {
+                str(r.get("id")): r for r in run["previous"].get("semantic_result") or [] if isinstance(r, dict)
+            }
+            resend = set(incremental.items_to_resend(
+                checklist, run["diff"], run["rev"].get("semantic_support") or {}, run["support"], previous_results
+            ))
+            run["resend"], run["previous_results"] = resend, previous_results
+            for idx, item in enumerate(checklist):
+                item_id = checklist_item_id(item, idx)
+                if item_id not in resend and item_id in previous_results:
+                    yield "semantic_item", run["artefato"], previous_results[item_id]
+            if resend:
+                jobs.append((run["artefato"], [
+                    i for idx, i in enumerate(checklist) if checklist_item_id(i, idx) in resend
+                ]))
+        else:
+            jobs.append((run["artefato"], checklist))
 
+    by_name = {run["artefato"]: run for run in runs}
     try:
-        payload["improved_document"] = generate_augmented_document(text, artefato, payload)
-    except Exception:
-        payload["improved_document"] = text or ""
+        for name, r in semantic_validate_stream_many(text, jobs, client, facts):
+            by_name[name]["arrived"].setdefault(str(r.get("id")), r)
+            yield "semantic_item", name, r
+    except SemanticEvaluationError as exc:
+        # itens sem veredito ficam de fora do resultado e o erro vai no payload
+        for name, _ in jobs:
+            by_name[name]["error"] = exc.failed.get(name, "") if exc.failed else str(exc)
+
+    for run in runs:
+        artefato, compiled, checklist, diff = run["artefato"], run["compiled"], run["checklist"], run["diff"]
+        arrived, resend = run["arrived"], run["resend"]
+        if resend is not None:
+            semantic_result = []
+            for idx, item in enumerate(checklist):
+                item_id = checklist_item_id(item, idx)
+                r = arrived.get(item_id) if item_id in resend else run["previous_results"].get(item_id)
+                if r is not None:
+                    semantic_result.append(r)
+        else:
+            semantic_result = [
+                arrived[checklist_item_id(item, idx)]
+                for idx, item in enumerate(checklist)
+                if checklist_item_id(item, idx) in arrived
+            ]
+        semantic_score = score_semantic_result(semantic_result, len(checklist))
+
+        # itens sem resultado semântico não guardam suporte: voltam ao LLM na próxima rodada
+        answered = {str(r.get("id")) for r in semantic_result if isinstance(r, dict)}
+        support = {k: v for k, v in run["support"].items() if k in answered}
+
+        payload: Dict[str, Any] = {
+            "rigid_score": run["rigid_score"],
+            "rigid_result": run["rigid_result"],
+            "semantic_score": semantic_score,
+            "semantic_result": semantic_result,
+        }
+        if run.get("error"):
+            payload["semantic_error"] = run["error"]
 
-    return payload
+        try:
+            payload["improved_document"] = generate_augmented_document(text, artefato, payload)
+        except Exception:
+            payload["improved_document"] = text or ""
+
+        stats: Dict[str, Any] = {"mode": "full"}
+        if diff is not None:
+            stats = {
+                "mode": "incremental",
+                "changed_paragraphs": len(diff.changed_new),
+                "rigid_rescanned": run["rescanned"],
+                "semantic_resent": len(resend) if resend is not None else len(checklist),
+            }
+        payload["revision"] = incremental.build_revision(doc, artefato, compiled, run["ranges"], support, stats, facts)
+        yield "done", artefato, payload
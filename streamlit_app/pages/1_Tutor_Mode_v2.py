@@ -8,7 +8,6 @@ import re
 from datetime import datetime
 import streamlit as st
 import yaml
-from openai import OpenAI
 
 # Ajuste do PATH raiz
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
@@ -17,6 +16,7 @@ if root_dir not in sys.path:
 
 # Imports locais
 from validator_engine_vNext import validate_document
+from knowledge.validators.llm_pool import get_llm_client
 from utils.formatter_docx import markdown_to_docx
 from utils.recommender_engine import enhance_markdown
 from utils.recommender_examples import build_example_snippets
@@ -45,7 +45,7 @@ def _load_api_client():
     if not api_key:
         st.warning("⚠️ Para validação semântica, configure OPENAI_API_KEY.")
         return None
-    return OpenAI(api_key=api_key)
+    return get_llm_client(api_key)
 
 def _load_question_bank():
     try:
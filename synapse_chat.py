@@ -4,17 +4,21 @@
 # Versão POC 1.1 – Revisão de desempenho e lógica de validação (05/10/2025)
 #
 # Este arquivo mantém 100% do layout aprovado e integra:
-# - Execução do agente
-# - Exibição dos scores e fichas (rígida e semântica)
+# - Execução de um ou mais agentes sobre o mesmo documento (uma passada)
+# - Exibição dos scores e fichas (rígida e semântica), com os itens
+#   semânticos exibidos à medida que chegam (streaming)
 # - Documento Orientado (Markdown) com lacunas e marcadores
 # - Controle de estado para evitar renderização duplicada
+# - Extração dos anexos com cache e progresso por página (upload_extractor)
 # =============================================================================
 
 import streamlit as st
-from openai import OpenAI
-import base64, os, io
+import base64, os
 
-from knowledge.validators.validator_engine import validate_document
+from knowledge.validators.llm_backend import get_backend
+from knowledge.validators.llm_pool import get_llm_client
+from utils.upload_extractor import extract_uploads
+from knowledge.validators.validator_engine import iter_validate_artefatos
 
 # ===============================
 # CONFIG DA PÁGINA
@@ -37,43 +41,16 @@ def get_openai_client():
     if not api_key:
         st.error("🔴 OPENAI_API_KEY ausente. Cadastre em Settings → Secrets (ou defina variável de ambiente).")
         return None
-    return OpenAI(api_key=api_key)
+    return get_backend(get_llm_client(api_key))
 
-def extract_text_from_uploads(files):
-    """
-    Extrai texto básico de arquivos comuns (txt, pdf, docx). Para planilhas/CSV,
-    a POC atual mantém a abordagem mínima (sem parsing tabular complexo).
-    """
-    if not files:
-        return ""
-    texts = []
-    for f in files:
-        name = (f.name or "").lower()
-        data = f.read()
-        try:
-            if name.endswith(".txt"):
-                texts.append(data.decode("utf-8", errors="ignore"))
-            elif name.endswith(".pdf"):
-                try:
-                    from PyPDF2 import PdfReader
-                    reader = PdfReader(io.BytesIO(data))
-                    texts.append("\n".join([(p.extract_text() or "") for p in reader.pages]))
-                except Exception:
-                    # Fallback leve
-                    texts.append("")
-            elif name.endswith(".docx"):
-                try:
-                    import docx
-                    doc = docx.Document(io.BytesIO(data))
-                    texts.append("\n".join([p.text for p in doc.paragraphs]))
-                except Exception:
-                    texts.append("")
-            else:
-                # Fallback: tenta decodificar como texto
-                texts.append(data.decode("utf-8", errors="ignore"))
-        except Exception:
-            pass
-    return "\n\n".join(texts).strip()
+def semantic_row(s: dict) -> dict:
+    """Linha da tabela semântica (usada na exibição progressiva e na final)."""
+    return {
+        "Critério": s.get("descricao", ""),
+        "Presente": "✅" if s.get("presente") else "❌",
+        "Nota": s.get("adequacao_nota", 0),
+        "Justificativa": s.get("justificativa", ""),
+    }
 
 # ===============================
 # ASSETS (LOGO)
@@ -191,10 +168,12 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
-agente = st.selectbox(
-    "Escolha o agente:",
+agentes = st.multiselect(
+    "Escolha o(s) agente(s):",
     ["ETP","DFD","TR","CONTRATO","EDITAL","PESQUISA_PRECOS","FISCALIZACAO","OBRAS","MAPA_RISCOS","PCA"],
-    index=0
+    default=["ETP"],
+    help="Documento com anexos (ex.: TR com minuta de contrato e pesquisa de preços): "
+         "selecione todos e o texto é validado para cada um numa só passada.",
 )
 validar_semantica = st.checkbox("Executar validação semântica", value=True)
 
@@ -217,9 +196,31 @@ if run:
 
     if not insumos and not uploads:
         st.warning("⚠️ Insira texto ou anexe ao menos um arquivo.")
+    elif not agentes:
+        st.warning("⚠️ Selecione ao menos um agente.")
     else:
         texto = (insumos or "").strip()
-        extra = extract_text_from_uploads(uploads)
+        # Extração fora da thread do app (páginas de PDF em paralelo, cache por
+        # conteúdo): a barra avança conforme as páginas ficam prontas
+        progresso = st.progress(0.0, text="Extraindo texto dos anexos...") if uploads else None
+
+        def _on_page(nome, feitas, total):
+            progresso.progress(min(1.0, feitas / max(total, 1)), text=f"Extraindo {nome}: página {feitas}/{total}")
+
+        extraidos = extract_uploads(uploads, _on_page)
+        if progresso is not None:
+            progresso.empty()
+        for r in extraidos:
+            if r.get("error"):
+                st.warning(f"⚠️ Não foi possível extrair o texto de {r['name']}.")
+            elif r.get("timed_out") and r.get("rows") is not None:
+                st.warning(f"⚠️ {r['name']}: leitura interrompida em {r['rows']} linhas (limite de tempo por arquivo).")
+            elif r.get("timed_out") or r.get("truncated"):
+                st.warning(
+                    f"⚠️ {r['name']}: extraídas {r.get('pages')} de {r.get('pages_total')} páginas "
+                    "(limite de tempo/páginas por arquivo)."
+                )
+        extra = "\n\n".join(r.get("text") or "" for r in extraidos).strip()
         if extra:
             texto = (texto + "\n\n" + extra).strip()
 
@@ -227,20 +228,52 @@ if run:
         if client is None:
             st.stop()
 
-        with st.spinner(f"Executando validação do artefato {agente}..."):
+        with st.spinner(f"Executando validação do(s) artefato(s) {', '.join(agentes)}..."):
             try:
                 # A engine aplica análise profunda no semântico; layout permanece igual.
-                result = validate_document(texto, agente, client)
+                # Vários agentes: extração, normalização e rígido uma vez, semântico em paralelo.
+                # Revalidação do mesmo artefato: só os itens afetados pela edição são reavaliados.
+                anterior = st.session_state.last_result or {}
+                previous = {
+                    a: p for a, p in (anterior.get("data") or {}).items()
+                    if a in agentes and isinstance(p, dict) and "error" not in p
+                } if anterior.get("agentes") else {}
+                # Exibição progressiva: os itens semânticos aparecem assim que o modelo os conclui
+                live = st.empty()
+                live_rows = []
+                rigid_live = {}
+                result = {}
+                for kind, nome, data in iter_validate_artefatos(texto, agentes, client, previous=previous or None):
+                    if kind == "rigid":
+                        rigid_live[nome] = data
+                    elif kind == "semantic_item":
+                        row = semantic_row(data)
+                        live_rows.append({"Agente": nome, **row} if len(agentes) > 1 else row)
+                    elif kind == "done":
+                        result[nome] = data
+                        continue
+                    with live.container():
+                        if rigid_live:
+                            scores = " · ".join(
+                                f"{n}: {float(r.get('rigid_score', 0) or 0.0):.1f}%" for n, r in rigid_live.items()
+                            )
+                            st.caption(
+                                f"Score Rígido: {scores} · "
+                                f"{len(live_rows)} item(ns) semântico(s) avaliado(s)…"
+                            )
+                        if live_rows:
+                            st.table(live_rows)
+                live.empty()
                 st.session_state.last_result = {
                     "token": st.session_state.result_token,
-                    "agente": agente,
+                    "agentes": agentes,
                     "texto": texto,
                     "data": result,
                 }
             except Exception as e:
                 st.session_state.last_result = {
                     "token": st.session_state.result_token,
-                    "agente": agente,
+                    "agentes": agentes,
                     "texto": texto,
                     "data": {"error": str(e)},
                 }
@@ -249,70 +282,78 @@ if run:
 # RENDERIZAÇÃO (uma vez por execução)
 # ===============================
 if st.session_state.last_result and st.session_state.last_result.get("token") == st.session_state.result_token:
-    payload = st.session_state.last_result.get("data", {})
-    if "error" in payload:
-        st.error(f"❌ Erro ao processar o agente {st.session_state.last_result.get('agente')}: {payload['error']}")
+    results = st.session_state.last_result.get("data", {})
+    if "error" in results:
+        nomes = ", ".join(st.session_state.last_result.get("agentes") or [])
+        st.error(f"❌ Erro ao processar o(s) agente(s) {nomes}: {results['error']}")
     else:
-        st.success(f"✅ Agente **{st.session_state.last_result.get('agente')}** executado com sucesso!")
-        st.markdown("### 🧾 Resultado da Análise")
+        # um bloco por agente selecionado
+        for agente, payload in results.items():
+            st.success(f"✅ Agente **{agente}** executado com sucesso!")
+            rev_stats = (payload.get("revision") or {}).get("stats") or {}
+            if rev_stats.get("mode") == "incremental":
+                st.caption(
+                    f"Revalidação incremental: {rev_stats.get('changed_paragraphs', 0)} parágrafo(s) alterado(s), "
+                    f"{rev_stats.get('semantic_resent', 0)} item(ns) reenviado(s) à análise semântica."
+                )
+            if payload.get("semantic_error"):
+                st.warning(
+                    "⚠️ Análise semântica incompleta: itens sem veredito ficaram de fora do score "
+                    f"({payload['semantic_error']}). Rode a validação novamente para reenviá-los."
+                )
+            st.markdown("### 🧾 Resultado da Análise")
 
-        rigid_score = float(payload.get("rigid_score", 0) or 0.0)
-        semantic_score = float(payload.get("semantic_score", 0) or 0.0)
+            rigid_score = float(payload.get("rigid_score", 0) or 0.0)
+            semantic_score = float(payload.get("semantic_score", 0) or 0.0)
 
-        st.markdown(
-            f"""
-            <div>
-              <span class="badge badge-rigid">Score Rígido: {rigid_score:.1f}%</span>
-              <span class="badge badge-sem">Score Semântico: {semantic_score:.1f}%</span>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
+            st.markdown(
+                f"""
+                <div>
+                  <span class="badge badge-rigid">Score Rígido: {rigid_score:.1f}%</span>
+                  <span class="badge badge-sem">Score Semântico: {semantic_score:.1f}%</span>
+                </div>
+                """,
+                unsafe_allow_html=True,
+            )
 
-        # ----- Tabela Rígida -----
-        rigid = payload.get("rigid_result", []) or []
-        st.markdown("#### 🧩 Itens Avaliados (Rígidos)")
-        if rigid:
-            rigid_rows = [
-                {
-                    "Critério": r.get("descricao", ""),
-                    "Obrigatório": "✅" if r.get("obrigatorio") else "—",
-                    "Presente": "✅" if r.get("presente") else "❌",
-                } for r in rigid
-            ]
-            st.table(rigid_rows)
-        else:
-            st.info("Nenhum item rígido retornado.")
+            # ----- Tabela Rígida -----
+            rigid = payload.get("rigid_result", []) or []
+            st.markdown("#### 🧩 Itens Avaliados (Rígidos)")
+            if rigid:
+                rigid_rows = [
+                    {
+                        "Critério": r.get("descricao", ""),
+                        "Obrigatório": "✅" if r.get("obrigatorio") else "—",
+                        "Presente": "✅" if r.get("presente") else "❌",
+                    } for r in rigid
+                ]
+                st.table(rigid_rows)
+            else:
+                st.info("Nenhum item rígido retornado.")
 
-        # ----- Tabela Semântica -----
-        sem = payload.get("semantic_result", []) or []
-        st.markdown("#### 💡 Itens Avaliados (Semânticos)")
-        if sem:
-            sem_rows = [
-                {
-                    "Critério": s.get("descricao", ""),
-                    "Presente": "✅" if s.get("presente") else "❌",
-                    "Nota": s.get("adequacao_nota", 0),
-                    "Justificativa": s.get("justificativa", ""),
-                } for s in sem
-            ]
-            st.table(sem_rows)
-        else:
-            st.info("Nenhum item semântico retornado.")
+            # ----- Tabela Semântica -----
+            sem = payload.get("semantic_result", []) or []
+            st.markdown("#### 💡 Itens Avaliados (Semânticos)")
+            if sem:
+                sem_rows = [semantic_row(s) for s in sem]
+                st.table(sem_rows)
+            else:
+                st.info("Nenhum item semântico retornado.")
 
-        # ----- Documento orientado -----
-        improved_doc = payload.get("improved_document", "") or ""
-        st.markdown("### 📄 Documento Orientado (com lacunas)")
-        if improved_doc.strip():
-            st.code(improved_doc, language="markdown")
+            # ----- Documento orientado -----
+            improved_doc = payload.get("improved_document", "") or ""
+            st.markdown("### 📄 Documento Orientado (com lacunas)")
+            if improved_doc.strip():
+                st.code(improved_doc, language="markdown")
 
-            # Download como .md (compatível, sem dependência extra)
-            md_bytes = improved_doc.encode("utf-8")
-            st.download_button(
-                label="⬇️ Baixar rascunho (.md)",
-                data=md_bytes,
-                file_name=f"rascunho_{st.session_state.last_result.get('agente','doc')}.md",
-                mime="text/markdown"
-            )
-        else:
-            st.info("Nenhum rascunho orientado foi gerado.")
+                # Download como .md (compatível, sem dependência extra)
+                md_bytes = improved_doc.encode("utf-8")
+                st.download_button(
+                    label="⬇️ Baixar rascunho (.md)",
+                    data=md_bytes,
+                    file_name=f"rascunho_{agente}.md",
+                    mime="text/markdown",
+                    key=f"download_md_{agente}",
+                )
+            else:
+                st.info("Nenhum rascunho orientado foi gerado.")
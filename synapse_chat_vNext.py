@@ -9,6 +9,7 @@ Melhorias
 - Integração com knowledge_base/ via validator_engine_vNext.
 - Botão único “Executar Agente” preservado; agora exibe também botões
   “Baixar .DOCX” e “Baixar .MD” após a execução.
+- Itens rígidos/semânticos exibidos durante a geração (streaming).
 
 Dependências:
   pip install streamlit python-docx
@@ -32,10 +33,11 @@ from datetime import datetime
 import streamlit as st
 from docx import Document
 from docx.shared import Pt
-from openai import OpenAI
 
 # engine
-from validator_engine_vNext import validate_document
+from validator_engine_vNext import iter_validate_document
+from knowledge.validators.llm_backend import get_backend
+from knowledge.validators.llm_pool import get_llm_client
 
 # ----------------------------------------------------------------------------
 # Config & helpers
@@ -49,7 +51,7 @@ def _load_api_client():
     if not api_key:
         st.error("OPENAI_API_KEY não configurada. Defina em Secrets ou variável de ambiente.")
         st.stop()
-    return OpenAI(api_key=api_key)
+    return get_backend(get_llm_client(api_key))
 
 def branding_bar():
     # Mantém a faixa superior “branding bar” aprovada
@@ -172,10 +174,33 @@ if run:
         else:
             raw_text = upload.read().decode("latin-1", errors="ignore")
 
-    with st.status("Executando agente. Aguarde alguns instantes…", expanded=False):
+    with st.status("Executando agente. Aguarde alguns instantes…", expanded=True):
         try:
             client = _load_api_client()
-            result = validate_document(raw_text, agent, client)
+            # Itens exibidos à medida que o modelo os conclui (resposta em streaming)
+            live = st.empty()
+            live_counts = {"rigid_item": 0, "semantic_item": 0}
+            live_rows = []
+            result = {}
+            for kind, data in iter_validate_document(raw_text, agent, client):
+                if kind == "done":
+                    result = data
+                    break
+                live_counts[kind] += 1
+                if kind == "semantic_item":
+                    live_rows.append({
+                        "Critério": data.get("descricao", ""),
+                        "Presente": "✅" if data.get("presente") else "❌",
+                        "Nota": data.get("adequacao_nota", 0),
+                    })
+                with live.container():
+                    st.caption(
+                        f"{live_counts['rigid_item']} item(ns) rígido(s) e "
+                        f"{live_counts['semantic_item']} semântico(s) recebidos…"
+                    )
+                    if live_rows:
+                        st.table(live_rows)
+            live.empty()
         except Exception as e:
             st.error(f"Falha ao executar a validação: {e}")
             st.stop()
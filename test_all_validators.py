@@ -11,12 +11,14 @@ Finalidade:
 """
 
 from knowledge.validators.validator_engine import validate_document
-from openai import OpenAI
+from knowledge.validators.llm_backend import get_backend
 
 # ---------------------------------------------------------------------------
 # CLIENTE OPENAI
 # ---------------------------------------------------------------------------
-client = OpenAI()  # Usa a variável de ambiente OPENAI_API_KEY
+# Usa a variável de ambiente OPENAI_API_KEY. Com SYNAPSE_LLM_BACKEND=record as
+# respostas são gravadas em tests/cassettes; com =replay, roda offline a partir delas.
+client = get_backend()
 
 # ---------------------------------------------------------------------------
 # TEXTOS DE TESTE (simulações mais realistas)
@@ -5,10 +5,11 @@ Data: outubro/2025
 """
 
 from knowledge.validators.validator_engine import validate_document
-from openai import OpenAI
+from knowledge.validators.llm_backend import get_backend
 
 # 1. Inicializa o cliente OpenAI (usa a variável de ambiente OPENAI_API_KEY)
-client = OpenAI()
+#    SYNAPSE_LLM_BACKEND=record grava as respostas; =replay roda offline
+client = get_backend()
 
 # 2. Documento de teste (texto simples, só para simular)
 documento_exemplo = """
@@ -0,0 +1,195 @@
+# =========================================
+# Synapse Tutor – Servidor LLM falso (compatível com a API OpenAI)
+# =========================================
+# Servidor HTTP local para exercitar a camada knowledge/validators/llm_call.py
+# sem custo nem rede: latência configurável (com cauda), erros 5xx/429 e
+# respostas em streaming (SSE). O client real aponta para ele com
+#   get_llm_client(api_key="fake", base_url=server.base_url)   (llm_pool)
+# Fala HTTP/1.1 com keep-alive (streaming fecha a conexão ao fim) e conta
+# as conexões aceitas (`connections`), para medir o reaproveitamento do pool.
+# O `usage` imita o cache de prompt do provedor: prefixos de 1024+ tokens
+# (em blocos de 128) já vistos voltam em prompt_tokens_details.cached_tokens.
+#
+# Uso: python -m tests.fake_llm_server   (mede p50/p99 com e sem hedging)
+# =========================================
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer:
+    """
+    POST /v1/chat/completions com:
+      - latency: latência base (s); com probabilidade tail_prob, tail_latency
+      - error_rate: fração das requisições que falham com `error_status`
+      - content: texto da resposta (padrão: lista JSON vazia)
+    Tokens estimados em CHARS_PER_TOKEN caracteres; cache de prefixo a partir
+    de CACHE_MIN_TOKENS, em blocos de CACHE_BLOCK_TOKENS.
+    """
+
+    CHARS_PER_TOKEN = 4
+    CACHE_MIN_TOKENS = 1024
+    CACHE_BLOCK_TOKENS = 128
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, tail_prob=0.0, tail_latency=5.0,
+                 error_rate=0.0, error_status=500, retry_after=None, content="[]", seed=None):
+        self.latency = latency
+        self.tail_prob = tail_prob
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.content = content
+        self.requests = 0
+        self.connections = 0
+        self._prefixes = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _draw(self):
+        with self._lock:
+            self.requests += 1
+            slow = self._rng.random() < self.tail_prob
+            fail = self._rng.random() < self.error_rate
+        return (self.tail_latency if slow else self.latency), fail
+
+    def usage(self, req, content):
+        """usage da resposta, com cached_tokens = maior prefixo do prompt já visto."""
+        prompt = "".join(f"{m.get('role')}\n{m.get('content')}\n" for m in req.get("messages") or [])
+        step = self.CACHE_BLOCK_TOKENS * self.CHARS_PER_TOKEN
+        cached = 0
+        with self._lock:
+            for end in range(self.CACHE_MIN_TOKENS * self.CHARS_PER_TOKEN, len(prompt) + 1, step):
+                digest = hashlib.sha1(prompt[:end].encode("utf-8")).digest()
+                if digest in self._prefixes:
+                    cached = end // self.CHARS_PER_TOKEN
+                self._prefixes.add(digest)
+        prompt_tokens = len(prompt) // self.CHARS_PER_TOKEN + 1
+        completion_tokens = len(content) // self.CHARS_PER_TOKEN + 1
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def _json(self, status, body, headers=None):
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                req = json.loads(self.rfile.read(length) or b"{}")
+                delay, fail = server._draw()
+                time.sleep(delay)
+                if fail:
+                    headers = {"retry-after": str(server.retry_after)} if server.retry_after is not None else {}
+                    self._json(server.error_status, {"error": {"message": "falha simulada", "type": "server_error"}},
+                               headers)
+                    return
+                content = server.content(req) if callable(server.content) else server.content
+                model = req.get("model", "fake")
+                if req.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Connection", "close")  # sem Content-Length: o fim do stream é o fim da conexão
+                    self.end_headers()
+                    self.close_connection = True
+                    for i in range(0, len(content), 16):
+                        piece = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": model,
+                                 "choices": [{"index": 0, "delta": {"content": content[i:i + 16]},
+                                              "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps(piece)}\n\n".encode("utf-8"))
+                    last = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": model,
+                            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                    self.wfile.write(f"data: {json.dumps(last)}\n\n".encode("utf-8"))
+                    if (req.get("stream_options") or {}).get("include_usage"):
+                        usage = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": model,
+                                 "choices": [], "usage": server.usage(req, content)}
+                        self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+                self._json(200, {
+                    "id": "fake", "object": "chat.completion", "created": 0, "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": server.usage(req, content),
+                })
+
+        return Handler
+
+
+def _percentile(values, q):
+    data = sorted(values)
+    return data[min(len(data) - 1, int(q * len(data)))] if data else 0.0
+
+
+def run_latency_check(n=200, hedge=False):
+    """p50/p99 de acall_chat contra o servidor falso com cauda de latência (5% a 3 s)."""
+    from knowledge.validators.llm_call import acall_chat
+    from knowledge.validators.llm_pool import get_async_llm_client, get_llm_client, run_sync
+
+    async def measure(client):
+        aclient = get_async_llm_client(client)
+        lat = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            await acall_chat(aclient, model="fake-model", messages=[{"role": "user", "content": "ping"}],
+                             deadline=10.0, hedge=hedge)
+            lat.append(time.perf_counter() - t0)
+        return lat
+
+    with FakeLLMServer(latency=0.1, tail_prob=0.05, tail_latency=3.0, seed=7) as srv:
+        lat = run_sync(measure(get_llm_client(api_key="fake", base_url=srv.base_url)))
+        return _percentile(lat, 0.5), _percentile(lat, 0.99), srv.requests, srv.connections
+
+
+if __name__ == "__main__":
+    for hedge in (False, True):
+        p50, p99, reqs, conns = run_latency_check(hedge=hedge)
+        print(f"hedge={hedge!s:<5} p50={p50 * 1000:7.1f} ms  p99={p99 * 1000:7.1f} ms  requisições={reqs}  "
+              f"conexões={conns}")
@@ -47,8 +47,9 @@ def run_tutor_testset(input_path: str, output_dir: str = "exports/tests"):
 """
 
     print("🔍 Executando validação automática...")
-    from openai import OpenAI
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    # OPENAI_API_KEY do ambiente; SYNAPSE_LLM_BACKEND=replay executa offline (tests/cassettes)
+    from knowledge.validators.llm_backend import get_backend
+    client = get_backend()
 
     vr = validate_document(dfd_text, "DFD", client)
 
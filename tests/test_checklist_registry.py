@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Registro de checklists: recarga só quando o arquivo muda de conteúdo
+import os
+
+import pytest
+
+from knowledge.validators.checklist_registry import ChecklistRegistry, checklist_item_id
+
+
+def _write(path, text, mtime_ns):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def checklist(tmp_path):
+    path = tmp_path / "etp_checklist.yml"
+    _write(path, "itens:\n  - id: a\n    descricao: Primeiro item\n", 1_000_000_000)
+    return path
+
+
+def test_get_caches_until_file_changes(checklist):
+    reg = ChecklistRegistry()
+    first = reg.get(str(checklist))
+    assert [i["id"] for i in first.items] == ["a"]
+    assert reg.get(str(checklist)) is first
+    assert reg.stats()["loads"] == 1 and reg.stats()["hits"] == 1
+
+    _write(checklist, "itens:\n  - id: b\n    descricao: Outro item\n", 2_000_000_000)
+    second = reg.get(str(checklist))
+    assert [i["id"] for i in second.items] == ["b"]
+    assert second.sha256 != first.sha256
+    assert reg.stats()["loads"] == 2
+
+
+def test_touch_without_content_change_only_revalidates(checklist):
+    reg = ChecklistRegistry()
+    first = reg.get(str(checklist))
+    os.utime(checklist, ns=(3_000_000_000, 3_000_000_000))
+    again = reg.get(str(checklist))
+    assert again.items is first.items and again.compiled is first.compiled
+    assert again.mtime_ns == 3_000_000_000
+    assert reg.stats()["revalidated"] == 1 and reg.stats()["loads"] == 1
+
+
+def test_missing_file_drops_entry(checklist):
+    reg = ChecklistRegistry()
+    assert reg.get(str(checklist)) is not None
+    checklist.unlink()
+    assert reg.get(str(checklist)) is None
+    assert reg.stats()["cached"] == 0
+
+
+def test_list_files_find_and_preload(tmp_path, checklist):
+    (tmp_path / "etp_checklist_v2.yml").write_text("- id: x\n", encoding="utf-8")
+    (tmp_path / "notas.yml").write_text("- id: y\n", encoding="utf-8")
+    reg = ChecklistRegistry()
+    assert [os.path.basename(p) for p in reg.list_files(str(tmp_path))] == [
+        "etp_checklist.yml", "etp_checklist_v2.yml",
+    ]
+    assert os.path.basename(reg.find(str(tmp_path), "etp")) == "etp_checklist.yml"
+    assert reg.find(str(tmp_path), "tr") is None
+    assert reg.preload(str(tmp_path)) == 2
+
+
+@pytest.mark.parametrize("item, idx, expected", [
+    ({"id": 7}, 0, "7"),
+    ({"id": "obj"}, 3, "obj"),
+    ({"descricao": "sem id"}, 3, "item_3"),
+    ({"id": ""}, 1, "item_1"),
+])
+def test_checklist_item_id(item, idx, expected):
+    assert checklist_item_id(item, idx) == expected
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Revalidação incremental: diff por parágrafo, estado da rodada e itens que voltam ao LLM
+import pytest
+
+from knowledge.validators import incremental
+from knowledge.validators.checklist_registry import ChecklistRegistry
+from knowledge.validators.text_normalizer import normalize_document
+
+CHECKLIST_YML = """\
+itens:
+  - id: objeto
+    descricao: Descrição do objeto da contratação
+    padrao: objeto da contratação
+  - id: prazo
+    descricao: Prazo de vigência contratual definido
+  - descricao: Garantia contratual exigida do fornecedor
+    padrao: ^garantia
+"""
+
+V1 = """TERMO DE REFERÊNCIA
+1. Objeto da contratação: aquisição de notebooks.
+2. O prazo de vigência contratual é de 12 meses.
+3. Exige-se garantia contratual de 5% do fornecedor.
+4. Disposições gerais."""
+
+
+@pytest.fixture
+def compiled(tmp_path):
+    path = tmp_path / "tr_checklist.yml"
+    path.write_text(CHECKLIST_YML, encoding="utf-8")
+    return ChecklistRegistry().get(str(path))
+
+
+def _hashes(text):
+    return incremental.paragraph_hashes(normalize_document(text).normalized)
+
+
+def _support(text, items, ranges_by_id=None):
+    doc = normalize_document(text)
+    return incremental.semantic_support(doc, incremental.line_starts(doc.folded), items, ranges_by_id or {})
+
+
+def test_span_to_paragraphs():
+    text = "abc\ndef\n\nghi"
+    starts = incremental.line_starts(text)
+    assert starts == [0, 4, 8, 9]
+    assert incremental.span_to_paragraphs(starts, (5, 7)) == (1, 1)
+    assert incremental.span_to_paragraphs(starts, (2, 10)) == (0, 3)
+    # fim exclusivo: terminar no "\n" não puxa o parágrafo seguinte
+    assert incremental.span_to_paragraphs(starts, (4, 8)) == (1, 1)
+
+
+def test_paragraph_diff_maps_unchanged_and_flags_changed():
+    v2 = V1.replace("12 meses", "24 meses").replace("4. Disposições", "Nova linha.\n4. Disposições")
+    diff = incremental.ParagraphDiff(_hashes(V1), _hashes(v2))
+    assert not diff.unchanged
+    assert diff.changed_new == {2, 4}
+    assert diff.map_paragraph(1) == 1
+    assert diff.map_paragraph(2) is None
+    assert diff.map_paragraph(4) == 5
+    assert diff.map_range(0, 1) == (0, 1)
+    assert diff.map_range(1, 3) is None  # atravessa o parágrafo alterado
+    assert diff.changed_ratio == pytest.approx(1 - 4 / 6)
+
+
+def test_paragraph_diff_identical():
+    diff = incremental.ParagraphDiff(_hashes(V1), _hashes(V1))
+    assert diff.unchanged and diff.changed_ratio == 0.0
+
+
+def test_reuse_rigid_ranges_skips_anchored_patterns(compiled):
+    diff = incremental.ParagraphDiff(_hashes(V1), _hashes("Preâmbulo.\n" + V1))
+    reused = incremental.reuse_rigid_ranges(compiled, diff, {"0": [1, 1], "2": [3, 3], "9": [0, 0], "x": [0]})
+    # o item 2 usa "^": depende do contexto e é sempre revarrido
+    assert reused == {0: (2, 2)}
+
+
+def test_semantic_support_uses_description_terms_and_rigid_range(compiled):
+    items = list(compiled.items)
+    support = _support(V1, items, {"objeto": (1, 1)})
+    assert support["objeto"] == [1]
+    assert support["prazo"] == [2]
+    assert support["item_2"] == [3]  # sem id: mesmo id dos resultados
+
+
+def test_items_to_resend_only_items_whose_support_changed(compiled):
+    items = list(compiled.items)
+    v2 = V1.replace("12 meses", "24 meses")
+    diff = incremental.ParagraphDiff(_hashes(V1), _hashes(v2))
+    old_support, new_support = _support(V1, items), _support(v2, items)
+    previous = {"objeto": {"id": "objeto"}, "prazo": {"id": "prazo"}, "item_2": {"id": "item_2"}}
+    assert incremental.items_to_resend(items, diff, old_support, new_support, previous) == ["prazo"]
+
+
+def test_items_to_resend_without_previous_result_or_support(compiled):
+    items = list(compiled.items)
+    diff = incremental.ParagraphDiff(_hashes(V1), _hashes(V1))
+    support = _support(V1, items)
+    previous = {"objeto": {"id": "objeto"}, "prazo": {"id": "prazo"}}
+    partial_support = {k: v for k, v in support.items() if k != "prazo"}
+    assert incremental.items_to_resend(items, diff, partial_support, support, previous) == ["prazo", "item_2"]
+
+
+def test_items_to_resend_when_old_support_paragraph_removed(compiled):
+    items = list(compiled.items)
+    v2 = V1.replace("2. O prazo de vigência contratual é de 12 meses.\n", "")
+    diff = incremental.ParagraphDiff(_hashes(V1), _hashes(v2))
+    previous = {"objeto": {}, "prazo": {}, "item_2": {}}
+    resend = incremental.items_to_resend(items, diff, _support(V1, items), _support(v2, items), previous)
+    assert resend == ["prazo"]
+
+
+def test_usable_revision_requires_same_artefato_checklist_and_facts(compiled):
+    doc = normalize_document(V1)
+    rev = incremental.build_revision(doc, "TR", compiled, {0: (1, 1)}, {"objeto": [1]}, facts="- DFD: x")
+    previous = {"revision": rev}
+    assert incremental.usable_revision(previous, "TR", compiled, "- DFD: x") is rev
+    assert rev["rigid_ranges"] == {"0": [1, 1]}
+    assert incremental.usable_revision(previous, "ETP", compiled, "- DFD: x") is None
+    assert incremental.usable_revision(previous, "TR", None, "- DFD: x") is None
+    assert incremental.usable_revision(previous, "TR", compiled, "- DFD: y") is None
+    assert incremental.usable_revision(previous, "TR", compiled) is None
+    assert incremental.usable_revision({"error": "x", "revision": rev}, "TR", compiled, "- DFD: x") is None
+    assert incremental.usable_revision({"revision": dict(rev, version=0)}, "TR", compiled, "- DFD: x") is None
+    assert incremental.usable_revision(None, "TR", compiled) is None
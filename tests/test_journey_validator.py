@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# Fatos da jornada (DFD → ETP → TR): extração local, valores em reais e coerência
+import json
+
+import pytest
+
+from knowledge.validators import journey_validator
+from knowledge.validators.journey_validator import (
+    JourneyFactsCache,
+    consistency_checks,
+    extract_facts_local,
+    facts_prompt,
+    parse_brl,
+)
+
+DFD = """DOCUMENTO DE FORMALIZAÇÃO DA DEMANDA
+Unidade demandante: Secretaria de Tecnologia da Informação
+1. OBJETO
+Aquisição de 120 notebooks para os cartórios do interior.
+ESTIMATIVA DA QUANTIDADE PARA A CONTRATAÇÃO
+Informar as estimativas.
+120 unidades
+ESTIMATIVA PRELIMINAR DO VALOR DA CONTRATAÇÃO
+R$ 600.000,00 (seiscentos mil reais)
+"""
+
+ETP = """ESTUDO TÉCNICO PRELIMINAR
+Área requisitante: Secretaria de Tecnologia da Informação - STI
+Objeto: aquisição de notebooks para cartórios do interior
+Quantidade estimada: 120
+Valor total estimado: R$ 0,72 milhão
+"""
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("R$ 1.234,56", 1234.56),
+    ("valor de R$ 600.000,00 (seiscentos mil reais)", 600000.0),
+    ("R$ 2,5 milhões", 2_500_000.0),
+    ("R$ 0,72 milhão", 720_000.0),
+    ("R$ 15 mil", 15_000.0),
+    ("sem valor", None),
+    ("", None),
+])
+def test_parse_brl(text, expected):
+    if expected is None:
+        assert parse_brl(text) is None
+    else:
+        assert parse_brl(text) == pytest.approx(expected)
+
+
+def test_extract_facts_local_labels_and_section_titles():
+    facts = extract_facts_local(DFD)
+    assert facts["unidade_demandante"] == "Secretaria de Tecnologia da Informação"
+    assert facts["objeto"].startswith("Aquisição de 120 notebooks")
+    # "Informar as estimativas." é texto do modelo, não fato
+    assert facts["quantidade"] == 120
+    assert facts["valor_estimado"] == pytest.approx(600_000.0)
+    assert set(facts["origem"]) == {"objeto", "quantidade", "valor_estimado", "unidade_demandante"}
+
+
+def test_extract_facts_local_missing_facts_are_none():
+    facts = extract_facts_local("TERMO DE REFERÊNCIA\nTexto sem rótulos.")
+    assert facts["objeto"] is None and facts["valor_estimado"] is None
+    assert facts["trechos"] == {}
+
+
+def test_consistency_checks_flags_value_divergence():
+    facts = {"DFD": extract_facts_local(DFD), "ETP": extract_facts_local(ETP)}
+    checks = {c["id"]: c for c in consistency_checks(facts, valor_tol=0.10)}
+    assert checks["valor_estimado:DFD-ETP"]["status"] == "divergente"  # 600 mil × 720 mil
+    assert checks["quantidade:DFD-ETP"]["status"] == "ok"
+    assert checks["objeto:DFD-ETP"]["status"] == "ok"
+    # dentro da tolerância, o mesmo par é coerente
+    relaxed = {c["id"]: c for c in consistency_checks(facts, valor_tol=0.20)}
+    assert relaxed["valor_estimado:DFD-ETP"]["status"] == "ok"
+
+
+def test_consistency_checks_reports_missing_required_fact():
+    facts = {"DFD": extract_facts_local(DFD), "ETP": {"objeto": None, "valor_estimado": None}}
+    ausentes = [c for c in consistency_checks(facts) if c["status"] == "ausente"]
+    assert ausentes and all(c["etapas"] == ["ETP"] for c in ausentes)
+
+
+def test_facts_prompt_only_lists_earlier_stages():
+    facts = {"DFD": extract_facts_local(DFD), "ETP": extract_facts_local(ETP)}
+    assert facts_prompt(facts, "DFD") == ""
+    prompt = facts_prompt(facts, "TR")
+    assert prompt.startswith("- DFD:") and "\n- ETP:" in prompt
+    assert "R$ 600.000,00" in prompt
+
+
+def test_facts_cache_save_retries_after_write_failure(tmp_path, monkeypatch):
+    cache = JourneyFactsCache("processo-1", cache_dir=str(tmp_path))
+    cache.put("DFD", "abc", False, {"objeto": "notebooks"})
+
+    def fail(*args):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(journey_validator.os, "replace", fail)
+    cache.save()
+    assert not cache.path.exists()
+    monkeypatch.undo()
+    cache.save()  # a alteração continua pendente após a falha
+    assert json.loads(cache.path.read_text(encoding="utf-8"))["DFD"]["facts"] == {"objeto": "notebooks"}
+    assert JourneyFactsCache("processo-1", cache_dir=str(tmp_path)).get("DFD", "abc", False) == {"objeto": "notebooks"}
+
+
+def test_validate_journey_requires_journey_id():
+    with pytest.raises(ValueError):
+        journey_validator.validate_journey({"DFD": DFD}, None, journey_id=" ")
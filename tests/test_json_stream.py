@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Parser JSON incremental: itens entregues assim que o "}" chega, em qualquer fatiamento
+import json
+
+import pytest
+
+from knowledge.validators.json_stream import JsonItemStream
+
+ITENS = [
+    {"id": "1", "status": "ATENDE", "justificativa": "chave } e colchete ] dentro da string"},
+    {"id": "2", "status": "NÃO ATENDE", "justificativa": "aspas \"escapadas\" e barra \\"},
+    {"id": "3", "status": "PARCIAL", "evidencias": [{"trecho": "aninhado"}], "meta": {"x": [1, 2]}},
+]
+
+
+def _feed_all(parser, text, size):
+    out = []
+    for i in range(0, len(text), size):
+        out.extend(parser.feed(text[i:i + size]))
+    return out
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 10_000])
+def test_top_level_list_any_chunking(size):
+    text = json.dumps(ITENS, ensure_ascii=False)
+    parser = JsonItemStream()
+    out = _feed_all(parser, text, size)
+    assert out == [(None, it) for it in ITENS]
+    assert parser.text == text
+
+
+@pytest.mark.parametrize("size", [1, 3, 50])
+def test_keyed_list_ignores_other_lists(size):
+    payload = {
+        "rigid_result": [{"id": "r1"}],
+        "itens": ITENS,
+        "outros": [{"id": "x"}],
+    }
+    text = json.dumps(payload, ensure_ascii=False)
+    out = _feed_all(JsonItemStream(keys=["itens"]), text, size)
+    assert [obj for _, obj in out] == ITENS
+    assert {key for key, _ in out} == {"itens"}
+
+
+def test_item_delivered_before_end_of_response():
+    parser = JsonItemStream(keys=["itens"])
+    assert parser.feed('{"itens": [{"id": "1", "status": "ATEN') == []
+    assert parser.feed('DE"}, {"id": "2"') == [("itens", {"id": "1", "status": "ATENDE"})]
+    assert parser.feed("}]}") == [("itens", {"id": "2"})]
+
+
+def test_escape_split_across_chunks():
+    parser = JsonItemStream()
+    out = parser.feed('[{"s": "a\\') + parser.feed('"}"}]')
+    assert out == [(None, {"s": 'a"}'})]
+
+
+def test_all_keys_tracked_when_keys_is_none():
+    text = '{"rigid_result": [{"a": 1}], "semantic_result": [{"b": 2}]}'
+    assert JsonItemStream().feed(text) == [("rigid_result", {"a": 1}), ("semantic_result", {"b": 2})]
+
+
+def test_invalid_object_is_skipped_and_empty_chunk_is_noop():
+    parser = JsonItemStream()
+    assert parser.feed("") == []
+    assert parser.feed('[{"a": 1,}, {"b": 2}]') == [(None, {"b": 2})]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Ingestão da knowledge_base: trechos por seção e eliminação de duplicatas
+from knowledge.retrieval.chunking import KBChunk, chunk_text
+from knowledge.retrieval.dedup import canonical, chunk_features, content_hash, dedup_chunks
+
+LEI = """CAPÍTULO II
+Art. 18 A fase preparatória do processo licitatório é caracterizada pelo planejamento.
+O estudo técnico preliminar deve evidenciar o problema a ser resolvido.
+CAPÍTULO III
+Art. 40 O planejamento de compras deverá considerar a expectativa de consumo anual."""
+
+TEXTO = (
+    "O termo de referência deve conter a definição do objeto, os quantitativos estimados, "
+    "o prazo do contrato e, se for o caso, a possibilidade de sua prorrogação, a "
+    "fundamentação da contratação e a descrição da solução como um todo, considerado "
+    "todo o ciclo de vida do objeto, além dos requisitos da contratação e do modelo de "
+    "execução do objeto, que consiste na definição de como o contrato deverá produzir os "
+    "resultados pretendidos desde o seu início até o seu encerramento."
+)
+
+
+def test_chunk_text_sections_and_size():
+    chunks = chunk_text(LEI, source="leis/14133.txt", folder="leis", target_chars=120)
+    assert all(isinstance(c, KBChunk) and c.source == "leis/14133.txt" and c.folder == "leis" for c in chunks)
+    # seção = último título antes do início do trecho; título com pouco conteúdo não abre trecho
+    assert [c.section[:12] for c in chunks] == ["CAPÍTULO II", "Art. 18 A fa", "CAPÍTULO III"]
+    assert chunks[2].text.startswith("CAPÍTULO III\nArt. 40")
+    # nada se perde: todas as linhas aparecem em algum trecho
+    joined = "\n".join(c.text for c in chunks)
+    for line in LEI.split("\n"):
+        assert line in joined
+
+
+def test_chunk_text_splits_long_lines_by_sentence():
+    line = " ".join(f"Frase número {i} sobre contratações." for i in range(60))
+    chunks = chunk_text(line, target_chars=200)
+    assert len(chunks) > 1
+    assert all(len(c.text) <= 200 + 60 for c in chunks)
+    assert chunk_text("") == []
+
+
+def test_canonical_ignores_accents_case_and_punctuation():
+    assert canonical("  Contratação,   DIRETA! ") == "contratacao direta"
+    assert content_hash("Contratação direta") == content_hash("contratacao — DIRETA")
+
+
+def test_dedup_removes_exact_and_near_duplicates_keeping_first():
+    near = TEXTO.replace("encerramento", "término")
+    chunks = [
+        KBChunk("TR/modelo.txt", "TR", "", TEXTO),
+        KBChunk("manuais/modelo.txt", "manuais", "", TEXTO.upper()),
+        KBChunk("cadernos/obras.txt", "cadernos", "", near),
+        KBChunk("leis/14133.txt", "leis", "", LEI),
+    ]
+    kept, report = dedup_chunks(chunks)
+    assert [c.source for c in kept] == ["TR/modelo.txt", "leis/14133.txt"]
+    assert report["exact_duplicates"] == [{"source": "manuais/modelo.txt", "section": "", "kept": "TR/modelo.txt"}]
+    assert [n["source"] for n in report["near_duplicates"]] == ["cadernos/obras.txt"]
+    assert report["near_duplicates"][0]["similarity"] >= 0.8
+    assert report["duplicate_files"] == [["TR/modelo.txt", "manuais/modelo.txt"]]
+    assert report["bytes_saved"] == report["bytes_saved_exact"] + report["bytes_saved_near"] > 0
+
+
+def test_dedup_with_precomputed_features_and_threshold():
+    chunks = [KBChunk("a.txt", "", "", TEXTO), KBChunk("b.txt", "", "", TEXTO.replace("encerramento", "término"))]
+    features = [chunk_features(c.text) for c in chunks]
+    kept, _ = dedup_chunks(chunks, features=features)
+    assert len(kept) == 1
+    kept, report = dedup_chunks(chunks, threshold=0.99, features=features)
+    assert len(kept) == 2 and report["near_duplicates"] == []
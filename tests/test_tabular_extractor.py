@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Planilhas anexadas: números em formato brasileiro e leitura de CSV
+import math
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from utils.tabular_extractor import _to_number, read_tabular  # noqa: E402
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("R$ 1.234,56", 1234.56),
+    ("R$ 1.234,56", 1234.56),
+    ("1.234", 1234.0),
+    ("1234.5", 1234.5),
+    ("-3,5", -3.5),
+    ("12%", 12.0),
+    ("1.234.567,8", 1234567.8),
+    ("abc", None),
+    ("", None),
+    (None, None),
+])
+def test_to_number(raw, expected):
+    value = _to_number(pd.Series([raw], dtype="object")).iloc[0]
+    if expected is None:
+        assert math.isnan(value)
+    else:
+        assert value == pytest.approx(expected)
+
+
+def test_to_number_keeps_numeric_series():
+    out = _to_number(pd.Series([1, 2, 3]))
+    assert str(out.dtype) == "float64" and out.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_read_tabular_csv_types_columns():
+    data = "Item;Quantidade;Valor unitário\nNotebook;120;R$ 5.000,00\nMouse;120;R$ 45,90\n".encode("utf-8")
+    out = read_tabular("itens.csv", data)
+    assert out["rows"] == 2 and not out["timed_out"]
+    sheet = out["sheets"][0]
+    assert sheet["kinds"] == {"Item": "texto", "Quantidade": "numero", "Valor unitário": "numero"}
+    assert sheet["frame"]["Valor unitário"].tolist() == pytest.approx([5000.0, 45.9])
+    assert "Notebook" in out["text"]
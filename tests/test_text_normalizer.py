@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Normalização dos documentos: offsets de volta ao texto original (OffsetMap) e dobra de acentos
+import pytest
+
+from knowledge.validators.text_normalizer import OffsetMap, fold_accents, normalize_document
+
+
+def test_offset_map_copy_segments_are_merged():
+    omap = OffsetMap()
+    omap.copy(3)
+    omap.copy(4)
+    assert len(omap) == 1
+    assert [omap(i) for i in range(7)] == list(range(7))
+    # além do fim: desloca a partir do último offset
+    assert omap(9) == 9
+
+
+def test_offset_map_replace_points_to_start_of_replaced_run():
+    omap = OffsetMap()
+    omap.copy(2)        # "ab"
+    omap.replace(3, 1)  # "   " → " "
+    omap.copy(2)        # "cd"
+    assert [omap(i) for i in range(5)] == [0, 1, 2, 5, 6]
+
+
+def test_offset_map_deletion_and_expansion():
+    omap = OffsetMap()
+    omap.copy(1)
+    omap.replace(2, 0)  # removido: não gera segmento
+    omap.replace(1, 2)  # "ﬁ" → "fi"
+    omap.copy(1)
+    assert len(omap) == 3
+    assert [omap(i) for i in range(4)] == [0, 3, 3, 4]
+
+
+def test_empty_offset_map():
+    omap = OffsetMap()
+    assert omap(0) == 0 and omap(5) == 0
+
+
+ORIGINAL = "\uff21  caf\u00e9\u00a0\u201cok\u201d\n\n\n\u00c9 \ufb01m  e\u0301"  # largura total, NBSP, aspas, ligadura, combinante
+
+
+def test_normalize_document_forms():
+    doc = normalize_document(ORIGINAL)
+    assert doc.original == ORIGINAL
+    assert doc.normalized == 'A café "ok"\nÉ fim é'
+    assert doc.folded == 'a cafe "ok"\ne fim e'
+
+
+def test_to_original_every_offset_lands_on_source_char():
+    doc = normalize_document(ORIGINAL)
+    assert doc.to_original(0) == 0  # "Ａ"
+    assert ORIGINAL[doc.to_original(2):].startswith("café")
+    assert ORIGINAL[doc.to_original(7)] == "\u201c"
+    assert ORIGINAL[doc.to_original(12)] == "\u00c9"  # após linhas vazias colapsadas
+    assert doc.to_original(14) == doc.to_original(15)  # "fi" vem de "ﬁ"
+    assert all(0 <= doc.to_original(i) < len(ORIGINAL) for i in range(len(doc.normalized)))
+
+
+def test_span_to_original_normalized_and_folded():
+    doc = normalize_document(ORIGINAL)
+    start = doc.folded.index("cafe")
+    a, b = doc.span_to_original(start, start + 4, folded=True)
+    assert ORIGINAL[a:b] == "café"
+    assert doc.span_to_original(start, start + 4) == (a, b)
+
+
+def test_plain_ascii_maps_identically():
+    text = "Objeto da contratação: serviços\ncontínuos"
+    doc = normalize_document(text)
+    assert doc.normalized == text
+    assert [doc.folded_to_original(i) for i in range(len(text))] == list(range(len(text)))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Ação", "Acao"),
+    ("ÉTICA çÃo", "ETICA cAo"),
+    ("é", "e"),
+    ("sem acento", "sem acento"),
+])
+def test_fold_accents(text, expected):
+    assert fold_accents(text) == expected
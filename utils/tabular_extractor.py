@@ -0,0 +1,390 @@
+# =========================================
+# utils/tabular_extractor.py
+# =========================================
+# Planilhas (XLSX) e CSV enviados no app. Antes caíam no fallback de
+# upload_extractor (bytes decodificados como UTF-8): XLSX chegava aos
+# validadores como lixo binário e CSV como texto cru, gastando tokens.
+# Aqui as linhas são lidas em fluxo (openpyxl read_only/iter_rows e
+# pandas.read_csv com chunksize), em blocos de CHUNK_ROWS linhas:
+# - texto compacto por planilha: tabela Markdown com as primeiras linhas,
+#   nº de linhas omitidas e soma/mín./máx. das colunas numéricas (calculados
+#   sobre todas as linhas);
+# - DataFrame tipado por planilha (números pt-BR "1.234,56"/"R$ 10,00"
+#   convertidos, datas preservadas) para verificações numéricas, limitado a
+#   SYNAPSE_TABLE_MAX_ROWS linhas: a memória não cresce com a planilha.
+#
+# Dependências opcionais (requirements.txt): pandas e openpyxl.
+#
+# Configuração (variáveis de ambiente):
+#   SYNAPSE_TABLE_PREVIEW_ROWS  linhas por planilha no texto (padrão: 50)
+#   SYNAPSE_TABLE_MAX_ROWS      linhas guardadas no DataFrame (padrão: 100000)
+# =========================================
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+CHUNK_ROWS = 5000
+DEFAULT_PREVIEW_ROWS = 50
+DEFAULT_MAX_ROWS = 100_000
+# Colunas e caracteres por célula no texto
+MAX_TEXT_COLUMNS = 30
+MAX_CELL_CHARS = 60
+# Fração mínima de células não vazias que precisam converter para a coluna ser numérica
+NUMERIC_MIN_RATIO = 0.9
+# DataFrames das últimas planilhas lidas (por sha256 dos bytes)
+MEMORY_ENTRIES = 4
+
+_BR_NUMBER_RX = r"^-?\d{1,3}(?:\.\d{3})+(?:,\d+)?$|^-?\d+,\d+$"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(float(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+def table_limits() -> Dict[str, int]:
+    return {
+        "preview_rows": max(0, _env_int("SYNAPSE_TABLE_PREVIEW_ROWS", DEFAULT_PREVIEW_ROWS)),
+        "max_rows": max(0, _env_int("SYNAPSE_TABLE_MAX_ROWS", DEFAULT_MAX_ROWS)),
+    }
+
+
+# -------------------------------
+# Tipagem das colunas
+# -------------------------------
+def _to_number(col: Any) -> Any:
+    """Série → float (NaN onde não for número); aceita "R$ 1.234,56", "1234.5", "12%"."""
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        return col.astype("float64")
+    s = col.astype("object").where(col.notna(), None).map(lambda v: "" if v is None else str(v))
+    s = s.str.replace("\u00a0", " ", regex=False).str.strip()
+    s = s.str.replace(r"^R\$\s*", "", regex=True).str.replace(r"\s*%$", "", regex=True).str.replace(" ", "", regex=False)
+    br = s.str.match(_BR_NUMBER_RX)
+    s = s.where(~br, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(s, errors="coerce").astype("float64")
+
+
+def _is_blank(col: Any) -> Any:
+    return col.isna() | (col.astype("object").map(lambda v: isinstance(v, str) and not v.strip()))
+
+
+def _column_kinds(chunk: Any) -> Dict[str, str]:
+    """"numero" | "data" | "texto" por coluna, decidido no primeiro bloco (esquema fixo)."""
+    import pandas as pd
+
+    kinds: Dict[str, str] = {}
+    for name in chunk.columns:
+        col = chunk[name]
+        filled = ~_is_blank(col)
+        if not filled.any():
+            kinds[name] = "texto"
+        elif pd.api.types.is_datetime64_any_dtype(col) or col[filled].map(
+            lambda v: hasattr(v, "year") and hasattr(v, "month")
+        ).all():
+            kinds[name] = "data"
+        elif _to_number(col[filled]).notna().mean() >= NUMERIC_MIN_RATIO:
+            kinds[name] = "numero"
+        else:
+            kinds[name] = "texto"
+    return kinds
+
+
+def _typed(chunk: Any, kinds: Dict[str, str]) -> Any:
+    import pandas as pd
+
+    out = {}
+    for name in chunk.columns:
+        col = chunk[name]
+        if kinds.get(name) == "numero":
+            out[name] = _to_number(col)
+        elif kinds.get(name) == "data":
+            out[name] = pd.to_datetime(col, errors="coerce")
+        else:
+            out[name] = col.astype("object").where(~_is_blank(col), None)
+    return pd.DataFrame(out, index=chunk.index)
+
+
+# -------------------------------
+# Montagem de uma planilha em blocos
+# -------------------------------
+def _column_names(header: Sequence[Any]) -> List[str]:
+    names: List[str] = []
+    for i, h in enumerate(header):
+        base = re.sub(r"\s+", " ", str(h)).strip() if h is not None else ""
+        base = base or f"coluna_{i + 1}"
+        name, n = base, 2
+        while name in names:
+            name, n = f"{base}_{n}", n + 1
+        names.append(name)
+    return names
+
+
+class _SheetBuilder:
+    """Recebe blocos (DataFrame) de uma planilha e acumula prévia, estatísticas e DataFrame limitado."""
+
+    def __init__(self, name: str, limits: Dict[str, int]) -> None:
+        self.name = name
+        self.limits = limits
+        self.kinds: Optional[Dict[str, str]] = None
+        self.columns: List[str] = []
+        self.rows = 0
+        self.frames: List[Any] = []
+        self.kept = 0
+        self.preview: List[Any] = []
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def add(self, chunk: Any) -> None:
+        chunk = chunk.loc[~chunk.apply(_is_blank).all(axis=1)]
+        if chunk.empty:
+            return
+        if self.kinds is None:
+            self.kinds = _column_kinds(chunk)
+            self.columns = list(chunk.columns)
+        typed = _typed(chunk, self.kinds)
+        self.rows += len(typed)
+
+        room = self.limits["preview_rows"] - sum(len(p) for p in self.preview)
+        if room > 0:
+            self.preview.append(typed.head(room))
+        room = self.limits["max_rows"] - self.kept
+        if room > 0:
+            part = typed.head(room)
+            self.frames.append(part)
+            self.kept += len(part)
+
+        for name, kind in self.kinds.items():
+            if kind != "numero":
+                continue
+            col = typed[name].dropna()
+            if col.empty:
+                continue
+            st = self.stats.setdefault(name, {"soma": 0.0, "min": math.inf, "max": -math.inf, "n": 0})
+            st["soma"] += float(col.sum())
+            st["min"] = min(st["min"], float(col.min()))
+            st["max"] = max(st["max"], float(col.max()))
+            st["n"] += int(col.size)
+
+    def frame(self) -> Any:
+        import pandas as pd
+
+        if not self.frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(self.frames, ignore_index=True)
+
+    def sheet(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "rows": self.rows,
+            "columns": list(self.columns),
+            "kinds": dict(self.kinds or {}),
+            "truncated": self.kept < self.rows,
+            "frame": self.frame(),
+            "text": self.render(),
+        }
+
+    # ---- Texto
+    def render(self) -> str:
+        cols = self.columns[:MAX_TEXT_COLUMNS]
+        title = f'### Planilha "{self.name}" – {_fmt_int(self.rows)} linhas × {len(self.columns)} colunas'
+        lines = [title]
+        if len(self.columns) > len(cols):
+            lines.append(f"(exibidas as {len(cols)} primeiras colunas)")
+        lines.append("| " + " | ".join(_cell(c) for c in cols) + " |")
+        lines.append("|" + "---|" * len(cols))
+        shown = 0
+        for part in self.preview:
+            for row in part[cols].itertuples(index=False, name=None):
+                lines.append("| " + " | ".join(_cell(v) for v in row) + " |")
+                shown += 1
+        if self.rows > shown:
+            lines.append(f"(… {_fmt_int(self.rows - shown)} linhas omitidas)")
+        totals = [
+            f"{name}: soma {_fmt_number(st['soma'])}, mín. {_fmt_number(st['min'])}, máx. {_fmt_number(st['max'])}"
+            for name, st in self.stats.items()
+        ]
+        if totals:
+            lines.append("Colunas numéricas (todas as linhas): " + "; ".join(totals))
+        return "\n".join(lines)
+
+
+def _fmt_int(n: int) -> str:
+    return f"{n:,}".replace(",", ".")
+
+
+def _fmt_number(v: float) -> str:
+    if float(v).is_integer() and abs(v) < 1e15:
+        return _fmt_int(int(v))
+    return f"{v:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _cell(v: Any) -> str:
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return ""
+    if isinstance(v, float):
+        return _fmt_number(v)
+    if hasattr(v, "strftime"):
+        try:
+            return v.strftime("%d/%m/%Y") if not (v.hour or v.minute) else v.strftime("%d/%m/%Y %H:%M")
+        except (AttributeError, ValueError):
+            return ""
+    s = re.sub(r"\s+", " ", str(v)).strip().replace("|", "\\|")
+    return s if len(s) <= MAX_CELL_CHARS else s[:MAX_CELL_CHARS - 1] + "…"
+
+
+# -------------------------------
+# Leitores em fluxo
+# -------------------------------
+def _row_chunks(rows: Iterable[Sequence[Any]]) -> Iterator[Any]:
+    """Linhas (tuplas) → blocos DataFrame; a primeira linha não vazia é o cabeçalho."""
+    import pandas as pd
+
+    columns: Optional[List[str]] = None
+    buf: List[Sequence[Any]] = []
+    for row in rows:
+        if columns is None:
+            if row is None or all(v is None or (isinstance(v, str) and not v.strip()) for v in row):
+                continue
+            # colunas vazias à direita do cabeçalho são descartadas
+            header = list(row)
+            while header and (header[-1] is None or (isinstance(header[-1], str) and not header[-1].strip())):
+                header.pop()
+            columns = _column_names(header)
+            continue
+        values = list(row[:len(columns)])
+        buf.append(values + [None] * (len(columns) - len(values)))
+        if len(buf) >= CHUNK_ROWS:
+            yield pd.DataFrame(buf, columns=columns, dtype="object")
+            buf = []
+    if columns is not None and buf:
+        yield pd.DataFrame(buf, columns=columns, dtype="object")
+
+
+def _xlsx_chunks(data: bytes) -> Iterator[tuple]:
+    """(nome da planilha, blocos) de cada planilha, sem carregar a pasta inteira."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield ws.title, _row_chunks(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+def _csv_format(data: bytes) -> tuple:
+    """(encoding, separador) pelo início do arquivo."""
+    head = data[:65536]
+    encoding = "utf-8-sig"
+    try:
+        sample = head.decode(encoding)
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 4:  # não é só um caractere cortado no fim da amostra
+            encoding = "cp1252"
+        sample = head.decode(encoding, errors="ignore")
+    try:
+        sep = csv.Sniffer().sniff(sample[:16384], delimiters=";,\t|").delimiter
+    except csv.Error:
+        sep = ";" if sample.count(";") > sample.count(",") else ","
+    return encoding, sep
+
+
+def _csv_chunks(data: bytes) -> Iterator[Any]:
+    import pandas as pd
+
+    encoding, sep = _csv_format(data)
+    reader = pd.read_csv(
+        io.BytesIO(data), sep=sep, dtype=str, encoding=encoding, chunksize=CHUNK_ROWS,
+        keep_default_na=False, skip_blank_lines=True, on_bad_lines="skip",
+    )
+    with reader:
+        for chunk in reader:
+            chunk.columns = _column_names(list(chunk.columns))
+            yield chunk.astype("object")
+
+
+# -------------------------------
+# API
+# -------------------------------
+def read_tabular(
+    name: str,
+    data: bytes,
+    deadline: Optional[float] = None,
+    limits: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Lê XLSX/CSV em fluxo. Retorna {"text", "rows", "sheets", "timed_out"};
+    cada planilha: {"name", "rows", "columns", "kinds", "truncated", "frame", "text"}.
+    Levanta ImportError sem pandas/openpyxl.
+    """
+    limits = limits or table_limits()
+    if (name or "").lower().endswith(".csv"):
+        sources: Iterable[tuple] = [("CSV", _csv_chunks(data))]
+    else:
+        sources = _xlsx_chunks(data)
+
+    sheets: List[Dict[str, Any]] = []
+    timed_out = False
+    try:
+        for sheet_name, chunks in sources:
+            builder = _SheetBuilder(sheet_name, limits)
+            for chunk in chunks:
+                builder.add(chunk)
+                if deadline is not None and time.monotonic() > deadline:
+                    timed_out = True
+                    break
+            if builder.rows:
+                sheets.append(builder.sheet())
+            if timed_out:
+                break
+    finally:
+        close = getattr(sources, "close", None)
+        if close is not None:
+            close()  # fecha a pasta de trabalho (read_only mantém o arquivo aberto)
+
+    result = {
+        "text": "\n\n".join(s["text"] for s in sheets),
+        "rows": sum(s["rows"] for s in sheets),
+        "sheets": sheets,
+        "timed_out": timed_out,
+    }
+    if not timed_out:
+        _remember(hashlib.sha256(data).hexdigest(), sheets)
+    return result
+
+
+_FRAMES: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_FRAMES_LOCK = threading.Lock()
+
+
+def _remember(digest: str, sheets: List[Dict[str, Any]]) -> None:
+    with _FRAMES_LOCK:
+        _FRAMES[digest] = {s["name"]: s["frame"] for s in sheets}
+        _FRAMES.move_to_end(digest)
+        while len(_FRAMES) > MEMORY_ENTRIES:
+            _FRAMES.popitem(last=False)
+
+
+def extract_tables(name: str, data: bytes) -> Dict[str, Any]:
+    """
+    DataFrames tipados por planilha ({nome: DataFrame}), para verificações
+    numéricas. Reaproveita a leitura feita pela extração do upload.
+    """
+    with _FRAMES_LOCK:
+        hit = _FRAMES.get(hashlib.sha256(data).hexdigest())
+    if hit is not None:
+        return dict(hit)
+    return {s["name"]: s["frame"] for s in read_tabular(name, data)["sheets"]}
@@ -0,0 +1,507 @@
+# =========================================
+# utils/upload_extractor.py
+# =========================================
+# Extração de texto dos arquivos enviados no app (txt, pdf, docx, xlsx, csv).
+# Separada de synapse_chat.py para ser usada fora do Streamlit
+# (benchmarks, runners de homologação). Aceita qualquer objeto com
+# `.name` e `.read()` (UploadedFile do Streamlit, arquivos abertos etc.).
+#
+# Serviço de extração (um edital de 300 páginas travava a sessão por
+# dezenas de segundos, e cada rerun extraía tudo de novo):
+# - cache por conteúdo: sha256 dos bytes (+ versão do extrator e limite de
+#   páginas) → texto extraído, em memória e em disco; o mesmo arquivo
+#   reenviado ou um rerun do Streamlit não é relido;
+# - PDFs grandes: páginas extraídas em lotes num pool de processos e
+#   entregues ao chamador conforme ficam prontas (iter_pdf_pages); o PDF
+#   vai aos filhos uma vez, num arquivo temporário, e cada lote leva só o
+#   caminho e as páginas;
+# - arquivos do mesmo envio em paralelo (iter_extract_uploads), com eventos
+#   de progresso entregues na thread do chamador (barra de progresso no app);
+# - limites por arquivo: nº de páginas e tempo; o que passar do limite fica
+#   de fora e o resultado vem marcado (truncated / timed_out);
+# - XLSX/CSV: leitura em fluxo e texto compacto em tabela Markdown
+#   (tabular_extractor.py; DataFrames tipados via extract_tables).
+#
+# Configuração (variáveis de ambiente):
+#   SYNAPSE_CACHE_DIR            diretório do cache (textos em <dir>/uploads)
+#   SYNAPSE_UPLOAD_CACHE=0       desliga o cache de extração
+#   SYNAPSE_UPLOAD_CACHE_MAX_MB  tamanho máximo do cache em disco (padrão: 256)
+#   SYNAPSE_UPLOAD_MAX_PAGES     páginas extraídas por PDF (padrão: 500)
+#   SYNAPSE_UPLOAD_TIMEOUT       segundos por arquivo (padrão: 90)
+#   SYNAPSE_UPLOAD_WORKERS       processos para as páginas de PDF (padrão: até 4; 0 = sem pool)
+# =========================================
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from knowledge.validators.semantic_cache import DEFAULT_CACHE_DIR
+
+# Troque ao mudar a extração: textos em cache de outra versão são refeitos
+EXTRACTOR_VERSION = "2"
+DEFAULT_MAX_PAGES = 500
+DEFAULT_TIMEOUT = 90.0
+DEFAULT_CACHE_MAX_MB = 256
+DEFAULT_MAX_WORKERS = 4
+# PDFs com menos páginas são extraídos na própria thread (o pool não compensa)
+POOL_MIN_PAGES = 16
+MIN_BATCH_PAGES = 4
+MAX_BATCH_PAGES = 16
+MEMORY_ENTRIES = 32
+# Eviction por tamanho a cada N gravações
+_EVICT_EVERY = 16
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def upload_limits() -> Dict[str, Any]:
+    """Limites por arquivo conforme o ambiente."""
+    return {
+        "max_pages": max(1, int(_env_number("SYNAPSE_UPLOAD_MAX_PAGES", DEFAULT_MAX_PAGES))),
+        "timeout": max(1.0, _env_number("SYNAPSE_UPLOAD_TIMEOUT", DEFAULT_TIMEOUT)),
+    }
+
+
+def _file_kind(name: str) -> str:
+    name = (name or "").lower()
+    for ext in ("pdf", "docx", "xlsx", "csv", "txt"):
+        if name.endswith("." + ext):
+            return ext
+    return "other"
+
+
+# -------------------------------
+# PDF (páginas em paralelo)
+# -------------------------------
+def _pdf_reader(data: bytes) -> Any:
+    from PyPDF2 import PdfReader
+
+    return PdfReader(io.BytesIO(data))
+
+
+def _page_text(reader: Any, index: int) -> str:
+    try:
+        return reader.pages[index].extract_text() or ""
+    except Exception:
+        return ""
+
+
+# Leitores abertos no processo filho, por caminho do arquivo temporário
+_WORKER_READERS: "OrderedDict[str, Any]" = OrderedDict()
+_WORKER_READERS_MAX = 2
+
+
+def _worker_reader(path: str) -> Any:
+    reader = _WORKER_READERS.get(path)
+    if reader is None:
+        reader = _pdf_reader(Path(path).read_bytes())
+        _WORKER_READERS[path] = reader
+        while len(_WORKER_READERS) > _WORKER_READERS_MAX:
+            _WORKER_READERS.popitem(last=False)
+    else:
+        _WORKER_READERS.move_to_end(path)
+    return reader
+
+
+def _extract_pages(path: str, pages: Sequence[int]) -> List[Tuple[int, str]]:
+    """
+    Executa no processo filho: texto de um lote de páginas. O PDF é lido e
+    interpretado uma vez por processo; os lotes seguintes reusam o leitor.
+    """
+    reader = _worker_reader(path)
+    return [(i, _page_text(reader, i)) for i in pages]
+
+
+def _spool_pdf(data: bytes) -> str:
+    """Grava o PDF num arquivo temporário (caminho único) para os processos filhos."""
+    fd, path = tempfile.mkstemp(prefix="synapse-upload-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _max_workers() -> int:
+    default = min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)
+    return max(0, int(_env_number("SYNAPSE_UPLOAD_WORKERS", default)))
+
+
+def _page_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool de processos do módulo (None dentro de um processo filho ou com 0 workers)."""
+    global _POOL
+    if multiprocessing.parent_process() is not None:
+        return None  # já num filho (ex.: pool de batch_validate): sem pool aninhado
+    workers = _max_workers()
+    if workers < 1:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn: o processo do app tem threads (Streamlit, event loop do LLM)
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _batches(count: int, workers: int) -> List[List[int]]:
+    # lotes pequenos o bastante para o progresso andar e o pool ficar ocupado,
+    # sem que o envio de cada lote pese mais que a extração
+    size = min(MAX_BATCH_PAGES, max(MIN_BATCH_PAGES, -(-count // (workers * 4))))
+    return [list(range(i, min(i + size, count))) for i in range(0, count, size)]
+
+
+def iter_pdf_pages(
+    data: bytes,
+    page_count: int,
+    deadline: Optional[float] = None,
+    reader: Any = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    (índice, texto) das páginas 0..page_count-1 na ordem em que ficam
+    prontas. Para ao atingir `deadline` (time.monotonic()); as páginas que
+    faltarem simplesmente não são entregues.
+    """
+    def inline(pages: Sequence[int]) -> Iterator[Tuple[int, str]]:
+        nonlocal reader
+        reader = reader if reader is not None else _pdf_reader(data)
+        for i in pages:
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            yield i, _page_text(reader, i)
+
+    pool = _page_pool() if page_count >= POOL_MIN_PAGES else None
+    batches: Dict[Any, List[int]] = {}
+    spooled: Optional[str] = None
+    if pool is not None:
+        try:
+            spooled = _spool_pdf(data)
+            for batch in _batches(page_count, _max_workers()):
+                batches[pool.submit(_extract_pages, spooled, batch)] = batch
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            pool = None
+        except Exception:  # pool encerrado ou sem espaço para o temporário
+            pool = None
+        if pool is None:
+            for future in batches:
+                future.cancel()
+    if pool is None:
+        _unlink(spooled)
+        yield from inline(range(page_count))
+        return
+
+    pending = set(batches)
+    try:
+        while pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    pages = future.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        _discard_pool(pool)  # recriado na próxima chamada
+                    # lote que falhou no filho: extraído aqui mesmo
+                    yield from inline(batches[future])
+                    continue
+                yield from pages
+    finally:
+        for future in pending:
+            future.cancel()
+        _unlink(spooled)  # lote ainda em execução já leu o arquivo ou cai no inline
+
+
+def _unlink(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _iter_pdf(data: bytes, limits: Dict[str, Any], deadline: float) -> Iterator[Tuple[str, Any]]:
+    """Eventos ("page", (feitas, total)) e, ao fim, ("text", resultado parcial)."""
+    reader = _pdf_reader(data)
+    pages_total = len(reader.pages)
+    page_count = min(pages_total, limits["max_pages"])
+    texts: Dict[int, str] = {}
+    for i, text in iter_pdf_pages(data, page_count, deadline, reader):
+        texts[i] = text
+        yield "page", (len(texts), page_count)
+    yield "text", {
+        "text": "\n".join(texts.get(i, "") for i in range(page_count)),
+        "pages": len(texts),
+        "pages_total": pages_total,
+        "truncated": page_count < pages_total,
+        "timed_out": len(texts) < page_count,
+    }
+
+
+# -------------------------------
+# Cache por conteúdo
+# -------------------------------
+class _ExtractionCache:
+    """Textos extraídos por chave de conteúdo: LRU em memória + JSON em disco."""
+
+    def __init__(self) -> None:
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return os.getenv("SYNAPSE_UPLOAD_CACHE", "1") != "0"
+
+    @property
+    def directory(self) -> Path:
+        return Path(os.getenv("SYNAPSE_CACHE_DIR") or str(DEFAULT_CACHE_DIR)) / "uploads"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                self._memory.move_to_end(key)
+                return hit
+        path = self.directory / f"{key}.json"
+        try:
+            hit = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)  # recência para a eviction
+        except (OSError, ValueError):
+            return None
+        self._remember(key, hit)
+        return hit
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        self._remember(key, value)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{key}.json"
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(value, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            return  # cache é só otimização
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % _EVICT_EVERY == 0
+        if evict:
+            self._evict()
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        max_bytes = _env_number("SYNAPSE_UPLOAD_CACHE_MAX_MB", DEFAULT_CACHE_MAX_MB) * 1024 * 1024
+        try:
+            files = [(p.stat().st_mtime, p.stat().st_size, p) for p in self.directory.glob("*.json")]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
+_CACHE = _ExtractionCache()
+
+
+# -------------------------------
+# Extração de um arquivo
+# -------------------------------
+_CACHED_KINDS = ("pdf", "docx", "xlsx", "csv")
+
+
+def _variant(kind: str, limits: Dict[str, Any]) -> str:
+    """Parte da chave do cache que depende dos limites (o texto muda com eles)."""
+    if kind == "pdf":
+        return f"-p{limits['max_pages']}"
+    if kind in ("xlsx", "csv"):
+        from utils.tabular_extractor import table_limits
+
+        t = table_limits()
+        return f"-r{t['preview_rows']}"
+    return ""
+
+
+def _extract_docx(data: bytes) -> str:
+    import docx
+
+    doc = docx.Document(io.BytesIO(data))
+    return "\n".join([p.text for p in doc.paragraphs])
+
+
+def _extract_tabular(name: str, data: bytes, deadline: float) -> Dict[str, Any]:
+    from utils.tabular_extractor import read_tabular
+
+    # linhas além da prévia já vêm resumidas no texto: não contam como truncamento
+    tab = read_tabular(name, data, deadline)
+    return {"text": tab["text"], "rows": tab["rows"], "timed_out": tab["timed_out"]}
+
+
+def _iter_extract(name: str, data: bytes, limits: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """Eventos ("page", (feitas, total)) e, por último, ("file", resultado)."""
+    started = time.monotonic()
+    kind = _file_kind(name)
+    digest = hashlib.sha256(data).hexdigest()
+    result: Dict[str, Any] = {
+        "name": name,
+        "sha256": digest,
+        "kind": kind,
+        "text": "",
+        "pages": None,
+        "pages_total": None,
+        "rows": None,
+        "truncated": False,
+        "timed_out": False,
+        "cached": False,
+        "error": None,
+    }
+    key = f"{digest}-{kind}-v{EXTRACTOR_VERSION}" + _variant(kind, limits)
+
+    hit = _CACHE.get(key) if kind in _CACHED_KINDS else None
+    if hit is not None:
+        result.update(hit, cached=True)
+    elif kind in _CACHED_KINDS:
+        deadline = started + limits["timeout"]
+        try:
+            if kind == "pdf":
+                for event, payload in _iter_pdf(data, limits, deadline):
+                    if event == "page":
+                        yield "page", payload
+                    else:
+                        result.update(payload)
+            elif kind == "docx":
+                result["text"] = _extract_docx(data)
+            else:
+                result.update(_extract_tabular(name, data, deadline))
+        except ImportError as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            if kind == "csv":
+                # sem pandas: CSV ainda é texto legível
+                result["text"] = data.decode("utf-8", errors="ignore")
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        if not result["error"] and not result["timed_out"]:
+            _CACHE.put(key, {k: result[k] for k in ("text", "pages", "pages_total", "rows", "truncated")})
+    else:
+        # txt e demais formatos: tenta decodificar como texto
+        result["text"] = data.decode("utf-8", errors="ignore")
+
+    result["seconds"] = round(time.monotonic() - started, 3)
+    yield "file", result
+
+
+def extract_upload(name: str, data: bytes) -> Dict[str, Any]:
+    """
+    Extrai um arquivo com cache e limites. Retorna {"name", "sha256", "kind",
+    "text", "pages", "pages_total", "rows", "truncated", "timed_out", "cached",
+    "error", "seconds"}.
+    """
+    result: Dict[str, Any] = {}
+    for event, payload in _iter_extract(name, data, upload_limits()):
+        if event == "file":
+            result = payload
+    return result
+
+
+# -------------------------------
+# Vários arquivos (API usada pelo app)
+# -------------------------------
+def iter_extract_uploads(files) -> Iterator[Tuple[str, int, Any]]:
+    """
+    Extrai os arquivos em paralelo. Eventos (tipo, posição do arquivo, dados),
+    sempre na thread do chamador:
+      ("page", i, (feitas, total))  — páginas de PDF conforme ficam prontas
+      ("file", i, resultado)        — arquivo concluído (ver extract_upload)
+    """
+    uploads = [((f.name or ""), f.read()) for f in (files or [])]
+    if not uploads:
+        return
+    limits = upload_limits()
+    events: "queue.Queue[Tuple[str, int, Any]]" = queue.Queue()
+
+    def work(index: int, name: str, data: bytes) -> None:
+        try:
+            for event, payload in _iter_extract(name, data, limits):
+                events.put((event, index, payload))
+        except Exception as e:
+            events.put(("file", index, {"name": name, "text": "", "error": f"{type(e).__name__}: {e}"}))
+
+    with ThreadPoolExecutor(max_workers=min(len(uploads), 8), thread_name_prefix="synapse-upload") as pool:
+        for index, (name, data) in enumerate(uploads):
+            pool.submit(work, index, name, data)
+        remaining = len(uploads)
+        while remaining:
+            event = events.get()
+            remaining -= event[0] == "file"
+            yield event
+
+
+def extract_uploads(files, on_progress: Optional[ProgressCallback] = None) -> List[Dict[str, Any]]:
+    """
+    Resultados de extract_upload na ordem de `files`. `on_progress(nome,
+    páginas feitas, total)` é chamado na thread do chamador.
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    names = [(f.name or "") for f in (files or [])]
+    for event, index, payload in iter_extract_uploads(files):
+        if event == "page" and on_progress is not None:
+            on_progress(names[index], *payload)
+        elif event == "file":
+            results[index] = payload
+    return [results[i] for i in sorted(results)]
+
+
+def extract_text_from_uploads(files, on_progress: Optional[ProgressCallback] = None):
+    """
+    Extrai texto básico de arquivos comuns (txt, pdf, docx). Planilhas/CSV
+    viram tabelas Markdown compactas (tabular_extractor.py).
+    """
+    if not files:
+        return ""
+    texts = [r.get("text") or "" for r in extract_uploads(files, on_progress)]
+    return "\n\n".join(texts).strip()
@@ -4,13 +4,20 @@ validator_engine_vNext.py
 POC Synapse.IA – Engine de Validação e Geração de Rascunho
 -------------------------------------------------------------------------------
 Principais melhorias
-- Leitura contextual da biblioteca local (knowledge_base/) por tipo de artefato.
+- Leitura contextual da biblioteca local (knowledge_base/): trechos mais
+  relevantes ao documento, por índice BM25 persistente ou vetorial local
+  (SYNAPSE_KB_RETRIEVER=vector; knowledge/retrieval).
 - Prompt tuning com injeção de contextos (top-k snippets).
+- Prompt com prefixo estável por tipo de documento (cache de prompt do
+  provedor): parte fixa primeiro, contexto da base e documento por último.
 - Supressão de duplicidades: se as lacunas já estão listadas, não repetir
   na seção de “Marcadores para preenchimento”.
 - Estrutura de retorno unificada para o front-end (sinapse_chat).
 - Compatível com OpenAI (client passado pelo chamador) e seleção de modelo
   por variável de ambiente (OPENAI_MODEL), com fallback seguro.
+- Chamadas ao modelo via llm_call (prazo, backoff, hedging, circuit breaker).
+- Resposta em streaming (iter_validate_document): cada item das listas
+  rígida/semântica é entregue assim que o seu objeto JSON fecha.
 
 Estrutura do retorno de validate_document():
 {
@@ -32,7 +39,11 @@ import glob
 import math
 import json
 import pathlib
-from typing import Dict, List, Tuple, Any
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple, Any
+
+from knowledge.validators.json_stream import JsonItemStream
+from knowledge.validators.llm_call import LLMCallError, call_chat, is_retryable
 
 # ---------------------------------------------------------------------------
 # (1) utilitários de I/O
@@ -41,53 +52,37 @@ from typing import Dict, List, Tuple, Any
 REPO_ROOT = pathlib.Path(__file__).resolve().parent
 KB_ROOT = REPO_ROOT / "knowledge_base"
 
-def _read_text_file(fp: pathlib.Path) -> str:
-    try:
-        return fp.read_text(encoding="utf-8", errors="ignore")
-    except Exception:
-        try:
-            return fp.read_text(encoding="latin-1", errors="ignore")
-        except Exception:
-            return ""
+# Nome por extenso do artefato, somado à consulta (o documento pode não citá-lo)
+_DOC_TYPE_TERMS = {
+    "ETP": "estudo técnico preliminar",
+    "DFD": "documento de formalização da demanda",
+    "TR": "termo de referência",
+    "EDITAL": "edital licitação",
+    "CONTRATO": "contrato administrativo",
+}
 
-def _gather_kb_snippets(doc_type: str, topk: int = 10, max_chars: int = 6000) -> Tuple[str, List[str]]:
+def _kb_retriever() -> str:
+    """SYNAPSE_KB_RETRIEVER: bm25 (padrão) ou vector (NumPy, knowledge/retrieval/vector_index.py)."""
+    return (os.getenv("SYNAPSE_KB_RETRIEVER") or "bm25").strip().lower()
+
+def _gather_kb_snippets(doc_type: str, topk: int = 10, max_chars: int = 6000,
+                        query: str = "", retriever: str = "") -> Tuple[str, List[str]]:
     """
-    Lê textos de knowledge_base/<pasta_do_tipo> e seleciona os N primeiros por ordem de nome,
-    concatenando até o limite de caracteres.
+    Trechos de knowledge_base/ mais relevantes ao documento (índice BM25
+    persistente ou vetorial local), até max_chars no total.
     """
-    used_files: List[str] = []
     if not KB_ROOT.exists():
-        return "", used_files
-
-    # Mapeamento simples de tipo -> pasta. Se não houver match, usa raiz.
-    folder_map = {
-        "ETP": "ETP",
-        "DFD": "DFD",
-        "TR": "TR",
-        "EDITAL": "instrucoes_normativas",
-        "CONTRATO": "manuais_modelos"
-    }
-    folder = folder_map.get(doc_type.upper(), "")
-    search_dir = KB_ROOT / folder if folder else KB_ROOT
-
-    files = sorted(search_dir.rglob("*.txt")) + sorted(search_dir.rglob("*.md"))
-    buff, count = [], 0
-    size = 0
-    for f in files:
-        if count >= topk:
-            break
-        txt = _read_text_file(f)
-        if not txt.strip():
-            continue
-        would = size + len(txt)
-        buff.append(txt)
-        used_files.append(str(f.relative_to(KB_ROOT)))
-        size = would
-        count += 1
-        if size >= max_chars:
-            break
+        return "", []
+    from knowledge.retrieval.kb_index import gather_context, get_kb_index
 
-    return "\n\n---\n".join(buff), used_files
+    q = f"{doc_type} {_DOC_TYPE_TERMS.get(doc_type.upper(), '')}\n{query or ''}"
+    if (retriever or _kb_retriever()) == "vector":
+        try:
+            from knowledge.retrieval.vector_index import get_vector_index
+            return gather_context(get_vector_index(KB_ROOT), q, max_chars=max_chars, topk=topk)
+        except RuntimeError:
+            pass  # sem numpy: segue com o BM25
+    return gather_context(get_kb_index(KB_ROOT), q, max_chars=max_chars, topk=topk)
 
 # ---------------------------------------------------------------------------
 # (2) prompts
@@ -143,20 +138,25 @@ def _pick_model() -> str:
 
 def _chat_completion(client, messages: List[Dict[str, str]], temperature: float = 0.2) -> str:
     """
-    Compatível com SDKs recentes. Tenta .chat.completions e faz fallback para .responses se existir.
+    Compatível com SDKs recentes. Usa .chat.completions via llm_call (prazo,
+    backoff, hedging e circuit breaker) e só recorre a .responses quando a
+    interface chat não atende o modelo — erros transitórios não disparam o
+    fallback (evita dobrar a latência de cauda).
     """
     model = _pick_model()
     # Tentativa 1 – interface chat tradicional
     try:
-        resp = client.chat.completions.create(
+        resp = call_chat(
+            client,
             model=model,
             messages=messages,
             temperature=temperature,
             response_format={"type": "json_object"},
         )
         return resp.choices[0].message.content
-    except Exception:
-        pass
+    except Exception as e:
+        if isinstance(e, LLMCallError) or is_retryable(e):
+            raise RuntimeError(f"Falha ao consultar o modelo: {e}")
 
     # Tentativa 2 – interface responses (modelos novos)
     try:
@@ -170,11 +170,46 @@ def _chat_completion(client, messages: List[Dict[str, str]], temperature: float
     except Exception as e:
         raise RuntimeError(f"Falha ao consultar o modelo: {e}")
 
+def _chat_completion_stream(client, messages: List[Dict[str, str]], temperature: float = 0.2) -> Iterator[str]:
+    """
+    Como _chat_completion, mas com stream=True: gera os pedaços do conteúdo
+    à medida que chegam. Sem streaming disponível, gera a resposta inteira.
+    """
+    model = _pick_model()
+    try:
+        stream = call_chat(
+            client,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            response_format={"type": "json_object"},
+            stream=True,
+        )
+    except Exception as e:
+        if isinstance(e, LLMCallError) or is_retryable(e):
+            raise RuntimeError(f"Falha ao consultar o modelo: {e}")
+        yield _chat_completion(client, messages, temperature=temperature)
+        return
+    for chunk in stream:
+        if not getattr(chunk, "choices", None):
+            continue
+        delta = getattr(chunk.choices[0], "delta", None)
+        piece = getattr(delta, "content", None)
+        if piece:
+            yield piece
+
 # ---------------------------------------------------------------------------
 # (4) montagem do prompt e pós-processamento
 # ---------------------------------------------------------------------------
 
-def _build_user_prompt(doc_type: str, raw_text: str, kb_context: str) -> str:
+@lru_cache(maxsize=32)
+def _prompt_prefix(doc_type: str) -> str:
+    """
+    Parte fixa do prompt por tipo de documento (checklist, guia, tarefa e
+    schema), serializada uma vez e idêntica byte a byte entre chamadas: é o
+    prefixo que o cache de prompt do provedor reaproveita. Tudo o que depende
+    do documento (contexto da base e o próprio texto) vem depois.
+    """
     checklist = RIGID_CHECKLIST_ETP if doc_type.upper() == "ETP" else RIGID_CHECKLIST_ETP
     checklist_json = json.dumps(checklist, ensure_ascii=False, indent=2)
     schema_json = json.dumps(RESPONSE_SCHEMA, ensure_ascii=False)
@@ -189,7 +224,12 @@ def _build_user_prompt(doc_type: str, raw_text: str, kb_context: str) -> str:
         "3) Calcular semantic_score = média das notas adequacao_nota (0..100).\n"
         "4) Retornar JSON estritamente aderente ao SCHEMA abaixo (sem comentários).\n\n"
         f"JSON_SCHEMA:\n{schema_json}\n\n"
-        "=== CONTEXTO DE REFERÊNCIA (trechos relevantes da base local) ===\n"
+    )
+
+def _build_user_prompt(doc_type: str, raw_text: str, kb_context: str) -> str:
+    return (
+        _prompt_prefix(doc_type)
+        + "=== CONTEXTO DE REFERÊNCIA (trechos relevantes da base local) ===\n"
         f"{kb_context}\n"
         "=== FIM DO CONTEXTO ===\n\n"
         "=== TEXTO DO USUÁRIO ===\n"
@@ -197,6 +237,13 @@ def _build_user_prompt(doc_type: str, raw_text: str, kb_context: str) -> str:
         "=== FIM DO TEXTO ==="
     )
 
+def _build_messages(doc_type: str, raw_text: str, kb_context: str) -> List[Dict[str, str]]:
+    """Mensagens da validação: sistema e prefixo fixos primeiro, documento por último."""
+    return [
+        {"role": "system", "content": BASE_SYSTEM},
+        {"role": "user", "content": _build_user_prompt(doc_type, raw_text, kb_context)},
+    ]
+
 def _safe_json_loads(s: str) -> Dict[str, Any]:
     try:
         return json.loads(s)
@@ -303,16 +350,28 @@ def validate_document(raw_text: str, doc_type: str, client) -> Dict[str, Any]:
     """
     Executa a validação rígida e semântica e gera rascunho orientado (markdown).
     """
+    result: Dict[str, Any] = {}
+    for kind, data in iter_validate_document(raw_text, doc_type, client):
+        if kind == "done":
+            result = data
+    return result
+
+def iter_validate_document(raw_text: str, doc_type: str, client) -> Iterator[Tuple[str, Any]]:
+    """
+    validate_document com a resposta em streaming, para exibição progressiva:
+      ("rigid_item", item) / ("semantic_item", item) — assim que cada objeto
+      da lista correspondente fecha no JSON; ("done", resultado) ao final.
+    """
     # contextos da KB
-    kb_text, used_files = _gather_kb_snippets(doc_type, topk=12, max_chars=9000)
-    user_prompt = _build_user_prompt(doc_type, raw_text, kb_text)
-    messages = [
-        {"role": "system", "content": BASE_SYSTEM},
-        {"role": "user", "content": user_prompt},
-    ]
+    kb_text, used_files = _gather_kb_snippets(doc_type, topk=12, max_chars=9000, query=raw_text)
+    messages = _build_messages(doc_type, raw_text, kb_text)
 
-    content = _chat_completion(client, messages, temperature=0.1)
-    parsed = _safe_json_loads(content)
+    parser = JsonItemStream(keys=["rigid_result", "semantic_result"])
+    for piece in _chat_completion_stream(client, messages, temperature=0.1):
+        for key, item in parser.feed(piece):
+            if isinstance(item, dict):
+                yield ("rigid_item" if key == "rigid_result" else "semantic_item"), item
+    parsed = _safe_json_loads(parser.text)
 
     # sanitização mínima
     rigid_result = parsed.get("rigid_result", [])
@@ -323,7 +382,7 @@ def validate_document(raw_text: str, doc_type: str, client) -> Dict[str, Any]:
     # markdown guiado (sem repetições)
     guided_md, title = _build_guided_markdown(doc_type, raw_text, semantic_result)
 
-    return {
+    yield "done", {
         "rigid_score": max(0.0, min(100.0, rigid_score)),
         "semantic_score": max(0.0, min(100.0, semantic_score)),
         "rigid_result": rigid_result,